@@ -1,39 +1,32 @@
-import json
+import argparse
+import asyncio
 import os
-import time
+import sys
 import logging
+import threading
 import requests
-from PIL import Image, ImageDraw, ImageFont
+from contextlib import asynccontextmanager
+from PIL import Image
 from io import BytesIO
-from icrawler.builtin import GoogleImageCrawler
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
 from datetime import datetime
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('download_imagens.log'),
-        logging.StreamHandler()
-    ]
-)
-
-# Mapeamento de marcas para seus sites oficiais
-MARCAS_SITES = {
-    'ROYAL CANIN': 'https://www.royalcanin.com/br',
-    'PEDIGREE': 'https://www.pedigree.com.br',
-    'WHISKAS': 'https://www.whiskas.com.br',
-    'HILLS': 'https://www.hillspet.com.br',
-    'PREMIER': 'https://www.premierpet.com.br',
-    'GOLDEN': 'https://www.goldenpet.com.br',
-    'FARMINHA': 'https://www.farmina.com.br',
-    'NUTRIENCE': 'https://www.nutrience.com.br',
-    'PROPLAN': 'https://www.purina.com.br/proplan',
-    'FORTICEE': 'https://www.forticee.com.br',
-    'VITAMINADOG': 'https://www.vitaminadog.com.br',
-    'VITAMINACAT': 'https://www.vitaminacat.com.br'
-}
+# Módulos compartilhados com os scripts em scripts/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+import diario_execucao
+from busca_google import BuscadorGoogle
+from busca_paralela import primeira_valida_async
+from catalogo import ler_catalogo
+from catalogo_incremental import CatalogoIncremental
+from configuracao_log import configurar_log
+from cache_imagens import obter_cache
+from deduplicacao import obter_deduplicador, registrar_relatorio
+from placeholder import salvar_placeholder
+from diario_execucao import DiarioExecucao
+from disjuntor import CircuitoAberto
+from marcas import obter_indice
+from metricas import obter_metricas
+from retentativas import ORCAMENTO, espera_backoff, prazo
 
 # Sites de pet shops para busca alternativa
 PET_SHOPS = [
@@ -44,286 +37,420 @@ PET_SHOPS = [
 ]
 
 # Configurações
-MAX_RETRIES = 3
-RETRY_DELAY = 5  # segundos
+MAX_RETRIES = 3  # tentativas de uma fonte, repetidas só depois de falhas transitórias
+RETRY_DELAY = 2  # segundos; base do backoff exponencial entre as tentativas de uma fonte
+PRAZO_POR_PRODUTO = 90  # segundos de busca por produto; esgotado, as tentativas restantes são canceladas
 MIN_IMAGE_SIZE = 300
-DOWNLOAD_DELAY = 2  # segundos entre downloads
-IMAGEM_ERRO_WIDTH = 800
-IMAGEM_ERRO_HEIGHT = 800
-IMAGEM_ERRO_BG_COLOR = (255, 255, 255)  # Branco
-IMAGEM_ERRO_TEXT_COLOR = (0, 0, 0)  # Preto
+DOWNLOAD_DELAY = float(os.environ.get('DOWNLOAD_DELAY', 2))  # segundos entre downloads
+MAX_PRODUTOS_SIMULTANEOS = 8  # produtos processados ao mesmo tempo
+MAX_BUSCAS_SIMULTANEAS = 8  # limite global de buscas em andamento
+MAX_REQUISICOES_POR_HOST = 2  # requisições simultâneas a um mesmo host (Google e sites das imagens)
+CATALOGO_PATH = 'produtos_importados.json'  # array JSON ou um produto por linha (NDJSON)
+DIARIO_PATH = 'download_imagens_diario.jsonl'  # diário das tentativas, usado para retomar a execução
+INSTANTANEO_PATH = 'download_imagens_catalogo.json'  # catálogo da última execução, para o modo incremental
+BUSCADOR_GOOGLE = BuscadorGoogle(max_por_host=MAX_REQUISICOES_POR_HOST)  # reaproveitado por todas as buscas no Google
 
 def criar_imagem_erro(nome_produto, slug):
     """Cria uma imagem de erro com fundo branco e o nome do produto"""
     try:
-        # Criar imagem branca
-        imagem = Image.new('RGB', (IMAGEM_ERRO_WIDTH, IMAGEM_ERRO_HEIGHT), IMAGEM_ERRO_BG_COLOR)
-        draw = ImageDraw.Draw(imagem)
-        
-        # Tentar carregar uma fonte do sistema
-        try:
-            font = ImageFont.truetype("arial.ttf", 40)
-        except:
-            try:
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 40)
-            except:
-                font = ImageFont.load_default()
-        
-        # Calcular posição do texto
-        texto = f"Imagem não disponível\n{nome_produto}"
-        bbox = draw.textbbox((0, 0), texto, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        x = (IMAGEM_ERRO_WIDTH - text_width) / 2
-        y = (IMAGEM_ERRO_HEIGHT - text_height) / 2
-        
-        # Desenhar texto
-        draw.text((x, y), texto, font=font, fill=IMAGEM_ERRO_TEXT_COLOR, align="center")
-        
-        # Salvar imagem
         caminho_arquivo = os.path.join('public/images/produtos', f"{slug}.jpg")
-        imagem.save(caminho_arquivo, 'JPEG', quality=95)
+        with obter_metricas().cronometrar('imagem_erro'):
+            salvar_placeholder(nome_produto, caminho_arquivo)
         logging.info(f"Imagem de erro gerada para {nome_produto}")
         return True
     except Exception as e:
         logging.error(f"Erro ao gerar imagem de erro para {nome_produto}: {str(e)}")
         return False
 
+def salvar_imagem(imagem_data, caminho_arquivo):
+    """Grava a imagem de forma atômica e a troca por um hardlink se já houver uma quase idêntica"""
+    # Nome único por thread: produtos com o mesmo slug podem ser gravados em paralelo
+    temporario = f"{caminho_arquivo}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with obter_metricas().cronometrar('gravacao'):
+        with open(temporario, 'wb') as f:
+            f.write(imagem_data)
+        # Substituir em vez de sobrescrever: o caminho pode ser um hardlink compartilhado com outros slugs
+        os.replace(temporario, caminho_arquivo)
+    canonico = obter_deduplicador().deduplicar(caminho_arquivo)
+    if canonico:
+        logging.info(f"Imagem idêntica a {os.path.basename(canonico)}, gravada como hardlink")
+
 def validar_imagem(imagem_data):
     """Valida se a imagem é adequada para o produto"""
+    metricas = obter_metricas()
     try:
-        img = Image.open(BytesIO(imagem_data))
+        with metricas.cronometrar('validacao'):
+            img = Image.open(BytesIO(imagem_data))
         # Verificar tamanho mínimo
         if img.size[0] < MIN_IMAGE_SIZE or img.size[1] < MIN_IMAGE_SIZE:
             logging.warning(f"Imagem muito pequena: {img.size}")
+            metricas.registrar_rejeicao('muito_pequena')
             return False
         # Verificar se é uma imagem colorida
         if img.mode in ('L', '1'):  # Imagem em escala de cinza ou preto e branco
             logging.warning(f"Imagem em escala de cinza ou preto e branco: {img.mode}")
+            metricas.registrar_rejeicao('escala_de_cinza')
             return False
         return True
     except Exception as e:
         logging.error(f"Erro ao validar imagem: {str(e)}")
+        metricas.registrar_rejeicao('imagem_invalida')
         return False
 
-def tentar_download(func, *args, **kwargs):
-    """Tenta executar uma função com retry"""
-    for tentativa in range(MAX_RETRIES):
-        try:
-            resultado = func(*args, **kwargs)
-            if resultado:
-                return resultado
-            if tentativa < MAX_RETRIES - 1:
-                logging.info(f"Tentativa {tentativa + 1} falhou, tentando novamente em {RETRY_DELAY} segundos...")
-                time.sleep(RETRY_DELAY)
-        except Exception as e:
-            if tentativa < MAX_RETRIES - 1:
-                logging.warning(f"Erro na tentativa {tentativa + 1}: {str(e)}")
-                time.sleep(RETRY_DELAY)
-            else:
-                logging.error(f"Todas as tentativas falharam: {str(e)}")
-    return None
+def buscar_imagens_google(query):
+    """Executa uma busca no Google Imagens e retorna os bytes das imagens .jpg baixadas"""
+    imagens = BUSCADOR_GOOGLE.buscar(query, max_num=1, filters={'size': 'large'})
+    return [imagem_data for nome, imagem_data in imagens if nome.endswith('.jpg')]
 
 def buscar_imagem_site_oficial(nome_produto, marca):
     """Busca imagem no site oficial da marca"""
-    if marca not in MARCAS_SITES:
+    site = obter_indice().site(marca)
+    if not site:
         return None
     
-    site = MARCAS_SITES[marca]
-    try:
-        # Buscar no Google com site específico
-        google_crawler = GoogleImageCrawler(
-            storage={'root_dir': 'temp'},
-            downloader_threads=1
-        )
-        
-        query = f"{nome_produto} site:{site}"
-        logging.info(f"Buscando no site oficial {site}: {query}")
-        
-        google_crawler.crawl(
-            keyword=query,
-            max_num=1,
-            filters={'size': 'large'}
+    # Buscar no Google com site específico
+    query = f"{nome_produto} site:{site}"
+    logging.info(f"Buscando no site oficial {site}: {query}")
+    
+    # Verificar se encontrou imagem
+    for imagem_data in buscar_imagens_google(query):
+        if validar_imagem(imagem_data):
+            return imagem_data
+    return None
+
+def buscar_imagem_pet_shop(nome_produto, site):
+    """Busca imagem em um site de pet shop"""
+    query = f"{nome_produto} {site}"
+    logging.info(f"Buscando em {site}: {query}")
+    
+    for imagem_data in buscar_imagens_google(query):
+        if validar_imagem(imagem_data):
+            return imagem_data
+    return None
+
+def buscar_imagem_google(nome_produto):
+    """Busca imagem no Google"""
+    logging.info(f"Buscando no Google: {nome_produto}")
+    
+    for imagem_data in buscar_imagens_google(nome_produto):
+        if validar_imagem(imagem_data):
+            return imagem_data
+    return None
+
+def fonte_do_site(fonte):
+    """Nome da fonte no diário e nas métricas: o host do filtro site: da busca"""
+    if fonte.startswith('site:'):
+        fonte = fonte[len('site:'):]
+    if '://' in fonte:
+        fonte = urlparse(fonte).netloc
+    return fonte.lower().removeprefix('www.')
+
+class LimitesConcorrencia:
+    """Limita as buscas em andamento
+
+    Todas as fontes são buscas no Google Imagens: o limite por host fica nas requisições
+    do BuscadorGoogle, que conhecem o host realmente contatado. A vaga de uma busca só é
+    devolvida quando a thread dela termina; cancelar a corrotina (prazo esgotado ou outra
+    fonte venceu) não interrompe a requisição em curso, que continua contando no limite.
+    """
+
+    def __init__(self, max_global=MAX_BUSCAS_SIMULTANEAS):
+        self.global_ = asyncio.Semaphore(max_global)
+
+    async def executar(self, func, *args):
+        """Executa uma busca bloqueante em uma thread, respeitando o limite"""
+        await self.global_.acquire()
+        tarefa = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        tarefa.add_done_callback(self._liberar)
+        return await asyncio.shield(tarefa)
+
+    def _liberar(self, tarefa):
+        self.global_.release()
+        if not tarefa.cancelled():
+            tarefa.exception()  # marca a exceção como lida quando ninguém mais espera a tarefa
+
+class Execucao:
+    """Estado compartilhado pelos produtos processados em uma mesma execução"""
+
+    def __init__(self, diario, incremental, repetir_transitorios=False):
+        self.limites = LimitesConcorrencia()
+        self.diario = diario
+        self.incremental = incremental
+        self.repetir_transitorios = repetir_transitorios
+        self._travas = {}  # slug -> [asyncio.Lock, produtos usando a trava]
+
+    @asynccontextmanager
+    async def exclusivo(self, slug):
+        """Um produto por slug de cada vez
+
+        O catálogo tem slugs repetidos, em sequência; processados juntos, gravariam o mesmo
+        arquivo e as mesmas entradas do diário ao mesmo tempo.
+        """
+        trava = self._travas.setdefault(slug, [asyncio.Lock(), 0])
+        trava[1] += 1
+        try:
+            async with trava[0]:
+                yield
+        finally:
+            trava[1] -= 1
+            if not trava[1]:
+                del self._travas[slug]
+
+    def reabrir(self, produto):
+        """Produtos que ficaram com imagem de erro por falhas transitórias podem ser refeitos"""
+        return (
+            self.repetir_transitorios
+            and self.diario.resultado_final(produto.slug) == 'imagem_erro'
+            and self.diario.teve_falha_transitoria(produto.slug)
         )
-        
-        # Verificar se encontrou imagem
-        arquivos = os.listdir('temp')
-        for arquivo in arquivos:
-            if arquivo.endswith('.jpg'):
-                caminho_temp = os.path.join('temp', arquivo)
-                with open(caminho_temp, 'rb') as f:
-                    imagem_data = f.read()
-                os.remove(caminho_temp)
-                
-                if validar_imagem(imagem_data):
-                    return imagem_data
-        return None
-    except Exception as e:
-        logging.error(f"Erro ao buscar no site oficial: {str(e)}")
-        return None
 
-def buscar_imagem_pet_shops(nome_produto):
-    """Busca imagem em sites de pet shops"""
-    for site in PET_SHOPS:
+def chave_produto(produto):
+    """Chave do produto no instantâneo do catálogo: o código ou, sem ele, o slug"""
+    return produto.codigo or produto.slug
+
+def produtos_pendentes(produtos, execucao):
+    """Filtra o catálogo (lido aos poucos) para os produtos novos, alterados ou sem imagem
+
+    Os reabertos por --repetir-transitorios também passam.
+    """
+    for produto in produtos:
+        pendente = execucao.incremental.pendente(chave_produto(produto), produto.slug, produto.nome, produto.marca)
+        if pendente or execucao.reabrir(produto):
+            yield produto
+
+async def tentar_download_async(func, *args):
+    """Tenta uma fonte de busca, repetindo só as tentativas que falharam por motivo transitório
+
+    func recebe o número da tentativa e retorna (resultado, estado, executada), em que estado
+    é o resultado registrado no diário. "Sem imagem" é definitivo: repetir a mesma busca não
+    muda a resposta. As esperas seguem backoff exponencial com jitter e consomem o orçamento
+    global de retentativas; tentativas puladas por já constarem no diário não geram espera.
+    Com o disjuntor do host aberto não há nova tentativa.
+    """
+    for tentativa in range(MAX_RETRIES):
         try:
-            google_crawler = GoogleImageCrawler(
-                storage={'root_dir': 'temp'},
-                downloader_threads=1
-            )
-            
-            query = f"{nome_produto} {site}"
-            logging.info(f"Buscando em {site}: {query}")
-            
-            google_crawler.crawl(
-                keyword=query,
-                max_num=1,
-                filters={'size': 'large'}
-            )
-            
-            arquivos = os.listdir('temp')
-            for arquivo in arquivos:
-                if arquivo.endswith('.jpg'):
-                    caminho_temp = os.path.join('temp', arquivo)
-                    with open(caminho_temp, 'rb') as f:
-                        imagem_data = f.read()
-                    os.remove(caminho_temp)
-                    
-                    if validar_imagem(imagem_data):
-                        return imagem_data
+            resultado, estado, executada = await func(tentativa, *args)
+        except CircuitoAberto as e:
+            logging.info(f"Desistindo da fonte: {str(e)}")
+            return None
         except Exception as e:
-            logging.error(f"Erro ao buscar em {site}: {str(e)}")
-            continue
+            logging.error(f"Erro na tentativa {tentativa + 1}: {str(e)}")
+            return None
+        if resultado:
+            return resultado
+        if estado != diario_execucao.ERRO or tentativa == MAX_RETRIES - 1:
+            return None
+        if executada:
+            if not ORCAMENTO.consumir():
+                logging.warning("Orçamento de retentativas esgotado, desistindo da fonte")
+                return None
+            espera = espera_backoff(tentativa, base=RETRY_DELAY)
+            logging.info(f"Tentativa {tentativa + 1} falhou, tentando novamente em {espera:.1f} segundos...")
+            await asyncio.sleep(espera)
     return None
 
-def buscar_imagem_google(nome_produto):
-    """Busca imagem no Google"""
+async def buscar_fonte(execucao, slug, fonte, tentativa, func, *args):
+    """Executa uma tentativa de busca em uma fonte e registra o resultado no diário
+
+    Retorna (imagem_data, resultado, executada), com o resultado registrado no diário.
+    Tentativas já registradas em uma execução anterior são puladas, exceto falhas
+    transitórias quando execucao.repetir_transitorios. CircuitoAberto é repassado sem
+    registro no diário, para a tentativa ser feita na próxima execução. As tentativas
+    executadas entram nas métricas da fonte (tempo e resultado).
+    """
+    diario = execucao.diario
+    if diario.pular(slug, fonte, tentativa, execucao.repetir_transitorios):
+        logging.info(f"Pulando {fonte} (tentativa {tentativa + 1}) para {slug}: já registrada no diário")
+        return None, diario.tentativas[(slug, fonte, tentativa)], False
+    metricas = obter_metricas()
     try:
-        google_crawler = GoogleImageCrawler(
-            storage={'root_dir': 'temp'},
-            downloader_threads=1
-        )
+        with metricas.cronometrar(f"busca:{fonte}"):
+            imagem_data = await execucao.limites.executar(func, *args)
+    except CircuitoAberto:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao buscar em {fonte}: {str(e)}")
+        diario.registrar(slug, fonte, diario_execucao.ERRO, tentativa)
+        metricas.registrar_fonte(fonte, diario_execucao.ERRO)
+        return None, diario_execucao.ERRO, True
+    resultado = diario_execucao.ENCONTRADA if imagem_data else diario_execucao.SEM_IMAGEM
+    diario.registrar(slug, fonte, resultado, tentativa)
+    metricas.registrar_fonte(fonte, resultado)
+    return imagem_data, resultado, True
+
+async def buscar_site_oficial_async(tentativa, execucao, produto, marca):
+    return await buscar_fonte(
+        execucao, produto.slug, 'site_oficial', tentativa,
+        buscar_imagem_site_oficial, produto.nome, marca
+    )
+
+async def buscar_pet_shop_async(tentativa, execucao, produto, site):
+    return await buscar_fonte(
+        execucao, produto.slug, fonte_do_site(site), tentativa,
+        buscar_imagem_pet_shop, produto.nome, site
+    )
+
+async def buscar_google_async(tentativa, execucao, produto):
+    return await buscar_fonte(
+        execucao, produto.slug, 'google', tentativa,
+        buscar_imagem_google, produto.nome
+    )
+
+async def buscar_imagem_produto(execucao, produto):
+    """Busca a imagem nas fontes em ordem de prioridade: site oficial, pet shops e Google
+
+    As fontes correm em paralelo (busca_paralela.primeira_valida_async): cada uma começa
+    quando as anteriores falham ou demoram, e vence a de maior prioridade que encontrar
+    imagem dentro da janela; as demais são canceladas. Executada dentro do prazo do
+    produto, que também vale para as threads das buscas.
+    """
+    with prazo(PRAZO_POR_PRODUTO):
+        # Identificar a marca do produto (índice de marcas, uma passada pelo nome)
+        marca = obter_indice().marca_do_produto(produto.nome, produto.marca)
         
-        logging.info(f"Buscando no Google: {nome_produto}")
+        # Fontes em ordem de prioridade; cada site de pet shop é uma fonte, com suas retentativas
+        fontes = []
+        if obter_indice().site(marca):
+            fontes.append(lambda: tentar_download_async(buscar_site_oficial_async, execucao, produto, marca))
+        for site in PET_SHOPS:
+            fontes.append(lambda site=site: tentar_download_async(buscar_pet_shop_async, execucao, produto, site))
+        fontes.append(lambda: tentar_download_async(buscar_google_async, execucao, produto))
+        return await primeira_valida_async(fontes)
+
+async def processar_produto(execucao, produto):
+    """Busca e salva a imagem de um produto; retorna 'processado', 'sem_imagem' ou 'erro'"""
+    diario = execucao.diario
+    try:
+        # Usar o slug do produto para o nome do arquivo
+        nome_arquivo = f"{produto.slug}.jpg"
+        caminho_arquivo = os.path.join('public/images/produtos', nome_arquivo)
+
+        # Reabertos e alterados no catálogo buscam de novo, sem aproveitar a imagem anterior
+        refazer = execucao.reabrir(produto) or execucao.incremental.alterado(chave_produto(produto))
         
-        google_crawler.crawl(
-            keyword=nome_produto,
-            max_num=1,
-            filters={'size': 'large'}
-        )
+        if os.path.exists(caminho_arquivo) and not refazer:
+            # Verificar se a imagem é válida
+            with open(caminho_arquivo, 'rb') as f:
+                if validar_imagem(f.read()):
+                    logging.info(f"Imagem já existe e é válida para {produto.nome}")
+                    return 'processado'
+                else:
+                    logging.info(f"Imagem existente é inválida para {produto.nome}, baixando novamente")
+                    os.remove(caminho_arquivo)
+
+        # Reaproveitar a imagem de origem já encontrada em uma execução anterior
+        imagem_data = None if refazer else obter_cache().obter_escolha(produto.slug)
+        if imagem_data and validar_imagem(imagem_data):
+            await asyncio.to_thread(salvar_imagem, imagem_data, caminho_arquivo)
+            logging.info(f"Imagem restaurada do cache para {produto.nome}")
+            diario.registrar_final(produto.slug, 'imagem')
+            return 'processado'
+
+        logging.info(f"Buscando imagem para: {produto.nome}")
+        try:
+            imagem_data = await asyncio.wait_for(buscar_imagem_produto(execucao, produto), PRAZO_POR_PRODUTO)
+        except asyncio.TimeoutError:
+            logging.warning(f"Prazo de {PRAZO_POR_PRODUTO}s esgotado para {produto.nome}, buscas restantes canceladas")
+            # Registrado como falha transitória, para --repetir-transitorios refazer o produto
+            diario.registrar(produto.slug, 'prazo', diario_execucao.ERRO)
+            imagem_data = None
         
-        arquivos = os.listdir('temp')
-        for arquivo in arquivos:
-            if arquivo.endswith('.jpg'):
-                caminho_temp = os.path.join('temp', arquivo)
-                with open(caminho_temp, 'rb') as f:
-                    imagem_data = f.read()
-                os.remove(caminho_temp)
-                
-                if validar_imagem(imagem_data):
-                    return imagem_data
-        return None
+        # Salvar imagem se encontrada
+        if imagem_data:
+            obter_cache().registrar_escolha(produto.slug, imagem_data)
+            await asyncio.to_thread(salvar_imagem, imagem_data, caminho_arquivo)
+            logging.info(f"Imagem salva com sucesso para {produto.nome}")
+            diario.registrar_final(produto.slug, 'imagem')
+            resultado = 'processado'
+        else:
+            logging.warning(f"❌ Não foi possível encontrar uma imagem adequada para {produto.nome} - Gerando imagem de erro")
+            if await asyncio.to_thread(criar_imagem_erro, produto.nome, produto.slug):
+                diario.registrar_final(produto.slug, 'imagem_erro')
+                resultado = 'processado'
+            else:
+                diario.registrar_final(produto.slug, 'sem_imagem')
+                resultado = 'sem_imagem'
+
+        # Pequena pausa para não sobrecarregar
+        await asyncio.sleep(DOWNLOAD_DELAY)
+        return resultado
+
     except Exception as e:
-        logging.error(f"Erro ao buscar no Google: {str(e)}")
-        return None
+        logging.error(f"Erro ao processar {produto.nome}: {str(e)}")
+        return 'erro'
+
+async def processar_produtos(produtos, execucao, max_simultaneos=MAX_PRODUTOS_SIMULTANEOS):
+    """Processa os produtos em paralelo e retorna a contagem de cada resultado"""
+    contagem = {'processado': 0, 'sem_imagem': 0, 'erro': 0}
+    fila = iter(produtos)
+
+    async def trabalhador():
+        # O iterador é compartilhado: cada trabalhador pega o próximo produto livre
+        for produto in fila:
+            async with execucao.exclusivo(produto.slug):
+                resultado = await processar_produto(execucao, produto)
+            if resultado == 'processado':
+                execucao.incremental.concluir(chave_produto(produto))
+            contagem[resultado] += 1
+
+    await asyncio.gather(*(trabalhador() for _ in range(max_simultaneos)))
+    return contagem
 
-def main():
+def main(repetir_transitorios=False, completo=False):
     # Criar diretório para imagens se não existir
     os.makedirs('public/images/produtos', exist_ok=True)
-    os.makedirs('temp', exist_ok=True)
     
-    # Ler o arquivo JSON
+    # Abrir o catálogo; os produtos são lidos aos poucos, conforme os trabalhadores ficam livres
     try:
-        with open('produtos_importados.json', 'r', encoding='utf-8') as f:
-            produtos = json.load(f)
-        logging.info(f"Carregados {len(produtos)} produtos do arquivo JSON")
+        produtos = ler_catalogo(CATALOGO_PATH)
     except Exception as e:
         logging.error(f"Erro ao ler arquivo JSON: {str(e)}")
         return
 
-    # Processar cada produto
-    produtos_processados = 0
-    produtos_com_erro = 0
-    produtos_sem_imagem = 0
-    
-    for produto in produtos:
-        try:
-            # Usar o slug do produto para o nome do arquivo
-            nome_arquivo = f"{produto['slug']}.jpg"
-            caminho_arquivo = os.path.join('public/images/produtos', nome_arquivo)
-            
-            if os.path.exists(caminho_arquivo):
-                # Verificar se a imagem é válida
-                with open(caminho_arquivo, 'rb') as f:
-                    if validar_imagem(f.read()):
-                        logging.info(f"Imagem já existe e é válida para {produto['nome']}")
-                        produtos_processados += 1
-                        continue
-                    else:
-                        logging.info(f"Imagem existente é inválida para {produto['nome']}, baixando novamente")
-                        os.remove(caminho_arquivo)
-
-            logging.info(f"Buscando imagem para: {produto['nome']}")
-            
-            # Identificar a marca do produto
-            marca = None
-            for marca_conhecida in MARCAS_SITES.keys():
-                if marca_conhecida in produto['nome'].upper():
-                    marca = marca_conhecida
-                    break
-            
-            # Tentar diferentes fontes de imagem
-            imagem_data = None
-            
-            # 1. Tentar site oficial
-            if marca:
-                logging.info(f"Tentando site oficial da marca {marca}")
-                imagem_data = tentar_download(buscar_imagem_site_oficial, produto['nome'], marca)
-            
-            # 2. Tentar sites de pet shops
-            if not imagem_data:
-                logging.info("Tentando sites de pet shops")
-                imagem_data = tentar_download(buscar_imagem_pet_shops, produto['nome'])
-            
-            # 3. Tentar Google
-            if not imagem_data:
-                logging.info("Tentando Google")
-                imagem_data = tentar_download(buscar_imagem_google, produto['nome'])
-            
-            # Salvar imagem se encontrada
-            if imagem_data:
-                with open(caminho_arquivo, 'wb') as f:
-                    f.write(imagem_data)
-                logging.info(f"Imagem salva com sucesso para {produto['nome']}")
-                produtos_processados += 1
-            else:
-                logging.warning(f"❌ Não foi possível encontrar uma imagem adequada para {produto['nome']} - Gerando imagem de erro")
-                if criar_imagem_erro(produto['nome'], produto['slug']):
-                    produtos_processados += 1
-                else:
-                    produtos_sem_imagem += 1
-
-            # Pequena pausa para não sobrecarregar
-            time.sleep(DOWNLOAD_DELAY)
-
-        except Exception as e:
-            logging.error(f"Erro ao processar {produto['nome']}: {str(e)}")
-            produtos_com_erro += 1
-
-    # Limpar diretório temporário
+    # Processar em paralelo só os produtos pendentes, retomando do diário da execução anterior
+    diario = DiarioExecucao(DIARIO_PATH)
+    incremental = CatalogoIncremental(INSTANTANEO_PATH, 'public/images/produtos', completo)
+    metricas = obter_metricas()
+    metricas.iniciar_exportacao()
+    catalogo_lido = False
     try:
-        for arquivo in os.listdir('temp'):
-            os.remove(os.path.join('temp', arquivo))
-        os.rmdir('temp')
-    except:
-        pass
+        execucao = Execucao(diario, incremental, repetir_transitorios)
+        contagem = asyncio.run(processar_produtos(produtos_pendentes(produtos, execucao), execucao))
+        catalogo_lido = True
+    finally:
+        # Imagens de produtos excluídos só são removidas se o catálogo foi lido até o fim
+        removidas = incremental.finalizar(catalogo_lido)
+        # Execução completa: o diário não é mais necessário para retomar
+        if catalogo_lido:
+            diario.encerrar()
+        else:
+            diario.fechar()
+        obter_deduplicador().salvar()
+        metricas.finalizar()
+    produtos_processados = contagem['processado']
+    produtos_sem_imagem = contagem['sem_imagem']
+    produtos_com_erro = contagem['erro']
 
     # Resumo final
     logging.info("\n=== Resumo do Processo ===")
-    logging.info(f"Total de produtos: {len(produtos)}")
+    logging.info(f"Total de produtos: {incremental.total()}")
     logging.info(f"Produtos processados com sucesso: {produtos_processados}")
     logging.info(f"Produtos sem imagem encontrada: {produtos_sem_imagem}")
     logging.info(f"Produtos com erro: {produtos_com_erro}")
+    logging.info(f"Produtos processados nesta execução: {sum(contagem.values())}")
+    logging.info(f"Catálogo em relação à execução anterior: {incremental.resumo()}")
+    logging.info(f"Imagens de produtos excluídos removidas: {len(removidas)}")
+    registrar_relatorio(obter_deduplicador().relatorio())
+    logging.info(f"Métricas gravadas em {metricas.caminho_json} e {metricas.caminho_prom}")
     logging.info("Processo de download concluído!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Configurar logging (em fila, com rotação e UTF-8), só ao rodar como script
+    configurar_log('download_imagens.log')
+    parser = argparse.ArgumentParser(description="Baixa as imagens dos produtos")
+    parser.add_argument('--repetir-transitorios', action='store_true',
+                        help="refaz apenas as fontes que falharam por motivo transitório nas execuções anteriores")
+    parser.add_argument('--completo', action='store_true',
+                        help="processa todo o catálogo, e não só os produtos novos, alterados ou sem imagem")
+    args = parser.parse_args()
+    main(repetir_transitorios=args.repetir_transitorios, completo=args.completo) 
\ No newline at end of file
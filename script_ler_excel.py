@@ -1,7 +1,12 @@
-import pandas as pd
+import os
+import sys
 
-# Ler o arquivo Excel
-df = pd.read_excel('produtos_completos_com_descricao_atualizado.xlsx')
+# Módulos compartilhados com os scripts em scripts/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from cache_catalogo import carregar_tabela
+
+# Ler o arquivo Excel (convertido uma vez para o cache colunar)
+df = carregar_tabela('produtos_completos_com_descricao_atualizado.xlsx')
 
 # Mostrar as colunas
 print("Colunas no arquivo:")
@@ -0,0 +1,132 @@
+"""Benchmark offline dos scripts de imagens contra o servidor falso (servidor_falso.py)
+
+Cria um diretório de trabalho com um catálogo sintético, inicia o servidor falso e executa
+o script escolhido com SERVIDOR_FALSO apontando para ele (sem pausas entre produtos).
+Relata produtos por segundo, bytes servidos por produto e o pico de memória (RSS) do script
+(no Linux, o maior entre o script e os processos filhos que ele aguardou, como o pool de transcodificação).
+
+Uso: python scripts/benchmark.py download_racoes --produtos 50 --latencia-ms 80 --taxa-403 0.1
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from slugify import slugify
+
+from servidor_falso import adicionar_argumentos, falhas_dos_argumentos, iniciar_servidor
+
+# Configurações
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = {
+    'download_imagens': os.path.join(RAIZ, 'download_imagens.py'),
+    'download_racoes': os.path.join(RAIZ, 'scripts', 'download_racoes.py'),
+    'generate_product_images': os.path.join(RAIZ, 'scripts', 'generate_product_images.py'),
+}
+MARCAS = ['GOLDEN', 'SPECIAL DOG', 'MAGNUS', 'PREMIER', 'ROYAL CANIN', 'PEDIGREE', 'WHISKAS', 'FARMINA']
+LINHAS = ['Adulto', 'Filhote', 'Senior', 'Light', 'Castrado']
+SABORES = ['Frango', 'Carne', 'Salmão', 'Cordeiro']
+PESOS = ['1kg', '3kg', '10,1kg', '15kg']
+
+def produtos_sinteticos(quantidade):
+    """Catálogo determinístico de rações, com marca, linha, sabor e peso variados"""
+    produtos = []
+    for i in range(quantidade):
+        marca = MARCAS[i % len(MARCAS)]
+        nome = (f"RACAO {marca} {LINHAS[i // len(MARCAS) % len(LINHAS)]} "
+                f"{SABORES[i // 3 % len(SABORES)]} {PESOS[i % len(PESOS)]} {i:04d}")
+        produtos.append({'codigo': str(10000 + i), 'nome': nome, 'marca': marca})
+    return produtos
+
+def preparar_diretorio(diretorio, produtos):
+    """Grava as entradas dos três scripts: produtos_importados.json e racoes_atualizadas_com_imagens.csv"""
+    os.makedirs(os.path.join(diretorio, 'public', 'images', 'produtos'), exist_ok=True)
+    with open(os.path.join(diretorio, 'produtos_importados.json'), 'w', encoding='utf-8') as f:
+        json.dump([
+            {'codigo': p['codigo'], 'nome': p['nome'], 'slug': slugify(p['nome']), 'categoria': 'Rações'}
+            for p in produtos
+        ], f, ensure_ascii=False)
+    pd.DataFrame({
+        'Produto': [p['nome'] for p in produtos],
+        'Marca': [p['marca'] for p in produtos],
+        'Imagem': '',
+    }).to_csv(os.path.join(diretorio, 'racoes_atualizadas_com_imagens.csv'), index=False)
+
+def executar(script, diretorio, servidor, pausa, saida):
+    """Executa o script no diretório; retorna (segundos, código de saída, pico de RSS em bytes ou None)"""
+    env = {
+        **os.environ,
+        'SERVIDOR_FALSO': servidor.url,
+        'DOWNLOAD_DELAY': str(pausa),
+        'METRICAS_DIR': os.path.join(diretorio, '.cache', 'metricas'),
+        'PYTHONPATH': os.pathsep.join(filter(None, [os.path.join(RAIZ, 'scripts'), os.environ.get('PYTHONPATH')])),
+    }
+    inicio = time.perf_counter()
+    processo = subprocess.Popen([sys.executable, SCRIPTS[script]], cwd=diretorio, env=env, stdout=saida, stderr=saida)
+    if hasattr(os, 'wait4'):
+        _, status, uso = os.wait4(processo.pid, 0)
+        processo.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        pico_rss = uso.ru_maxrss if sys.platform == 'darwin' else uso.ru_maxrss * 1024
+    else:
+        processo.wait()
+        pico_rss = None
+    return time.perf_counter() - inicio, processo.returncode, pico_rss
+
+def metricas_do_script(diretorio, script):
+    """Relatório de métricas gravado pelo próprio script (metricas.py), se houver"""
+    try:
+        with open(os.path.join(diretorio, '.cache', 'metricas', f"{script}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline dos scripts de imagens")
+    parser.add_argument('script', choices=sorted(SCRIPTS))
+    parser.add_argument('--produtos', type=int, default=50, help="tamanho do catálogo sintético")
+    parser.add_argument('--pausa', type=float, default=0, help="DOWNLOAD_DELAY usado pelo script")
+    parser.add_argument('--diretorio', help="diretório de trabalho (padrão: temporário, apagado no fim)")
+    parser.add_argument('--historico', help="arquivo JSONL ao qual o resultado é acrescentado")
+    parser.add_argument('--mostrar-saida', action='store_true', help="mostra a saída do script em vez de descartá-la")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    diretorio = args.diretorio or tempfile.mkdtemp(prefix='benchmark_')
+    servidor = iniciar_servidor(falhas_dos_argumentos(args))
+    try:
+        preparar_diretorio(diretorio, produtos_sinteticos(args.produtos))
+        saida = None if args.mostrar_saida else subprocess.DEVNULL
+        segundos, codigo, pico_rss = executar(args.script, diretorio, servidor, args.pausa, saida)
+        contadores = dict(servidor.contadores)
+        resultado = {
+            'script': args.script,
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'produtos': args.produtos,
+            'falhas': {chave: valor for chave, valor in vars(args).items()
+                       if chave.startswith(('latencia', 'variacao', 'taxa', 'atraso', 'semente'))},
+            'codigo_saida': codigo,
+            'segundos': round(segundos, 2),
+            'produtos_por_segundo': round(args.produtos / segundos, 3),
+            'bytes_por_produto': round(contadores.get('bytes', 0) / args.produtos),
+            'pico_rss_mb': round(pico_rss / 1024 / 1024, 1) if pico_rss else None,
+            'servidor': contadores,
+            'metricas': metricas_do_script(diretorio, args.script),
+        }
+    finally:
+        servidor.shutdown()
+        if not args.diretorio:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    if args.historico:
+        with open(args.historico, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Busca no Google Imagens com o icrawler, sem threads por consulta e sem passar pelo disco"""
+import logging
+import queue
+import threading
+from contextlib import nullcontext
+from urllib.parse import urlencode
+
+import requests
+
+from icrawler.builtin import GoogleImageCrawler
+from icrawler.storage import BaseStorage
+
+from cache_imagens import obter_cache
+from cliente_http import redirecionado
+from disjuntor import CircuitoAberto, host_da_url, obter_disjuntores
+from metricas import obter_metricas
+from retentativas import PrazoEsgotado, repetir, resposta_transitoria, verificar_prazo
+
+# Configurações
+TIMEOUT_BUSCA = (3, 10)  # segundos: conexão, leitura
+
+# Interrupções esperadas (prazo, cancelamento, disjuntor), que o downloader do icrawler engoliria
+INTERRUPCOES = (PrazoEsgotado, CircuitoAberto)
+
+class FiltroInterrupcoes(logging.Filter):
+    """Descarta o erro que o downloader do icrawler registra para uma interrupção esperada
+
+    A interrupção é repassada por BuscadorGoogle.buscar; o registro seria um falso erro.
+    """
+
+    def filter(self, record):
+        return not (isinstance(record.args, tuple)
+                    and any(isinstance(arg, INTERRUPCOES) for arg in record.args))
+
+class LimitesHosts:
+    """Limita as requisições simultâneas a cada host, somando as de todas as threads
+
+    A vaga é ocupada pela thread que faz a requisição até a resposta chegar, então uma
+    busca cancelada no meio não a libera antes da hora.
+    """
+
+    def __init__(self, max_por_host):
+        self.max_por_host = max_por_host
+        self._semaforos = {}
+        self._lock = threading.Lock()
+
+    def semaforo(self, host):
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.max_por_host)
+            return self._semaforos[host]
+
+def _get_medido(get, url, limites=None, **kwargs):
+    """GET da sessão do crawler medido como estágio 'requisicao' do host, com os bytes recebidos
+
+    Com limites, espera uma vaga do host antes de enviar a requisição.
+    """
+    metricas = obter_metricas()
+    host = host_da_url(url)
+    with limites.semaforo(host) if limites else nullcontext(), metricas.cronometrar('requisicao', host):
+        response = get(url, **kwargs)
+    metricas.registrar_bytes(host, len(response.content))
+    return response
+
+class ArmazenamentoMemoria(BaseStorage):
+    """Backend de armazenamento do icrawler que guarda as imagens em memória"""
+
+    def __init__(self):
+        self._imagens = []
+        self._lock = threading.Lock()
+
+    def write(self, id, data):
+        with self._lock:
+            self._imagens.append((id, data))
+
+    def exists(self, id):
+        # Nada é persistido, então nunca há arquivo a pular
+        return False
+
+    def max_file_idx(self):
+        return 0
+
+    def retirar(self):
+        """Retorna e remove as imagens guardadas, como uma lista de (nome, bytes)"""
+        with self._lock:
+            imagens, self._imagens = self._imagens, []
+        return imagens
+
+class BuscadorGoogle:
+    """Executa buscas no Google Imagens reaproveitando um GoogleImageCrawler por thread
+
+    O feeder, o parser e o downloader do crawler são chamados diretamente na thread que
+    faz a busca, em vez de iniciar as threads do icrawler a cada consulta. Cada thread tem
+    seu próprio crawler e armazenamento, então buscas simultâneas não se misturam. Com
+    max_por_host, as requisições de todas as threads a um mesmo host (as páginas do
+    Google e os sites das imagens) ficam limitadas a esse número.
+    """
+
+    def __init__(self, log_level=logging.INFO, max_por_host=None):
+        self.log_level = log_level
+        self.limites = LimitesHosts(max_por_host) if max_por_host else None
+        self._local = threading.local()
+
+    def _crawler(self):
+        crawler = getattr(self._local, 'crawler', None)
+        if crawler is None:
+            crawler = GoogleImageCrawler(storage=ArmazenamentoMemoria(), log_level=self.log_level)
+            # Fila simples no lugar da CachedQueue, que descartaria URLs já vistas em buscas anteriores
+            crawler.feeder.out_queue = queue.Queue()
+            # Páginas de resultado e imagens passam pelo disjuntor do host e são repetidas com backoff
+            get_protegido = obter_disjuntores().protegido(redirecionado(crawler.session.get))
+            crawler.session.get = lambda url, **kwargs: self._get(get_protegido, url, **kwargs)
+            crawler.downloader.logger.addFilter(FiltroInterrupcoes())
+            self._local.crawler = crawler
+        return crawler
+
+    def _get(self, get_protegido, url, **kwargs):
+        """GET da sessão do crawler; guarda a interrupção, que o downloader não repassaria"""
+        try:
+            return repetir(
+                lambda: _get_medido(get_protegido, url, self.limites, **kwargs),
+                (requests.ConnectionError, requests.Timeout), resposta_transitoria
+            )
+        except INTERRUPCOES as e:
+            logging.debug(f"Busca interrompida em {url}: {type(e).__name__}")
+            self._local.interrupcao = e
+            raise
+
+    def candidatos(self, query, max_num=1, filters=None):
+        """Busca a query e retorna as URLs das imagens nas páginas de resultado, em ordem"""
+        crawler = self._crawler()
+        feeder, parser = crawler.feeder, crawler.parser
+        urls = []
+        with obter_metricas().cronometrar('busca_google'):
+            feeder.feed(keyword=query, offset=0, max_num=max_num, filters=filters)
+            while not feeder.out_queue.empty():
+                pagina = feeder.out_queue.get_nowait()
+                verificar_prazo()
+                parser.logger.info(f"parsing result page {pagina}")
+                response = crawler.session.get(pagina, timeout=TIMEOUT_BUSCA)
+                response.raise_for_status()
+                urls.extend(tarefa['file_url'] for tarefa in parser.parse(response) or [])
+        return urls
+
+    def buscar(self, query, max_num=1, filters=None):
+        """Busca a query e retorna até max_num imagens baixadas, como uma lista de (nome, bytes)
+
+        As URLs candidatas vêm do cache de buscas quando a mesma consulta já foi feita;
+        só então as páginas de resultado do Google são baixadas. PrazoEsgotado (e
+        BuscaCancelada) é repassado, assim como CircuitoAberto nas páginas do Google.
+        """
+        crawler = self._crawler()
+        downloader = crawler.downloader
+        crawler.signal.reset()
+        downloader.clear_status()
+        downloader.max_num = max_num
+        crawler.storage.retirar()
+        disjuntores = obter_disjuntores()
+        self._local.interrupcao = None
+
+        fonte = 'google' + (f"?{urlencode(sorted(filters.items()))}" if filters else '')
+        urls = obter_cache().buscar_com_cache(fonte, query, lambda: self.candidatos(query, max_num, filters))
+        for url in urls:
+            if downloader.reach_max_num():
+                break
+            if disjuntores.bloqueado(host_da_url(url)):
+                continue
+            verificar_prazo()
+            # As retentativas ficam na sessão, com backoff; as do icrawler seriam imediatas
+            downloader.download({'file_url': url}, 'jpg', TIMEOUT_BUSCA, max_retry=1)
+            # Prazo e cancelamento chegam ao chamador, e não como um download que falhou; um
+            # disjuntor aberto no meio do download só pula a imagem, como um host já bloqueado
+            interrupcao, self._local.interrupcao = self._local.interrupcao, None
+            if isinstance(interrupcao, PrazoEsgotado):
+                crawler.storage.retirar()
+                raise interrupcao
+        return crawler.storage.retirar()
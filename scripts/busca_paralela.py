@@ -0,0 +1,161 @@
+"""Busca em várias fontes ao mesmo tempo, respeitando a prioridade entre elas
+
+As fontes são iniciadas em ordem de prioridade: a próxima começa quando todas as já
+iniciadas terminaram sem imagem, ou após ATRASO_HEDGE segundos sem resposta (hedge).
+Quando uma fonte encontra a imagem, as de maior prioridade ainda em andamento têm até
+JANELA_PRIORIDADE segundos para responder; vence a de maior prioridade que tiver imagem,
+e as demais são canceladas. Há uma versão para asyncio e outra para threads.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from retentativas import cancelamento
+
+# Configurações
+ATRASO_HEDGE = 2.0  # segundos sem resposta antes de iniciar também a próxima fonte
+JANELA_PRIORIDADE = 1.0  # segundos de espera pelas fontes de maior prioridade depois da primeira imagem
+MAX_THREADS = 16  # threads compartilhadas pelas buscas da versão com threads
+
+_PENDENTE = object()
+
+class _Corrida:
+    """Estado comum às duas versões: resultados por prioridade e os prazos de hedge e da janela"""
+
+    def __init__(self, fontes, atraso, janela):
+        self.fontes = iter(fontes)
+        self.atraso = atraso
+        self.janela = janela
+        self.resultados = []  # um por fonte iniciada, em ordem de prioridade
+        self.esgotadas = False
+        self.proximo_inicio = time.monotonic()
+        self.fim_janela = None
+
+    def pendentes(self):
+        return any(r is _PENDENTE for r in self.resultados)
+
+    def decidir(self, agora):
+        """Retorna (terminou, resultado) conforme os resultados até agora"""
+        for indice, resultado in enumerate(self.resultados):
+            if resultado is _PENDENTE or resultado is None:
+                continue
+            if not any(r is _PENDENTE for r in self.resultados[:indice]):
+                return True, resultado
+            if self.fim_janela is None:
+                self.fim_janela = agora + self.janela
+            return agora >= self.fim_janela, resultado
+        return self.esgotadas and not self.pendentes(), None
+
+    def proxima_fonte(self, agora):
+        """Próxima fonte a iniciar agora, ou None; marca as fontes como esgotadas no fim"""
+        if self.esgotadas or self.fim_janela is not None:
+            return None
+        if self.pendentes() and agora < self.proximo_inicio:
+            return None
+        try:
+            fonte = next(self.fontes)
+        except StopIteration:
+            self.esgotadas = True
+            return None
+        self.resultados.append(_PENDENTE)
+        self.proximo_inicio = time.monotonic() + self.atraso
+        return fonte
+
+    def espera(self, agora):
+        """Segundos até o próximo evento de tempo (hedge ou fim da janela), ou None"""
+        prazos = []
+        if self.fim_janela is not None:
+            prazos.append(self.fim_janela)
+        elif not self.esgotadas:
+            prazos.append(self.proximo_inicio)
+        return max(0, min(prazos) - agora) if prazos else None
+
+async def primeira_valida_async(fontes, atraso=ATRASO_HEDGE, janela=JANELA_PRIORIDADE):
+    """Executa as fontes (funções async sem argumentos, em ordem de prioridade) e retorna a imagem escolhida
+
+    Cada fonte retorna a imagem já validada, ou None. As buscas perdedoras são canceladas:
+    a tarefa recebe CancelledError e as threads iniciadas por ela (asyncio.to_thread)
+    param na próxima requisição, em retentativas.verificar_prazo.
+    """
+    corrida = _Corrida(fontes, atraso, janela)
+    tarefas = []  # (tarefa, evento de cancelamento), em ordem de prioridade
+
+    async def executar(fonte, evento):
+        with cancelamento(evento):
+            return await fonte()
+
+    try:
+        while True:
+            agora = time.monotonic()
+            terminou, resultado = corrida.decidir(agora)
+            if terminou:
+                return resultado
+            fonte = corrida.proxima_fonte(agora)
+            if fonte is not None:
+                evento = threading.Event()
+                tarefas.append((asyncio.create_task(executar(fonte, evento)), evento))
+                continue
+            pendentes = [tarefa for tarefa, _ in tarefas if not tarefa.done()]
+            if pendentes:
+                await asyncio.wait(pendentes, timeout=corrida.espera(agora), return_when=asyncio.FIRST_COMPLETED)
+            for indice, (tarefa, _) in enumerate(tarefas):
+                if tarefa.done() and corrida.resultados[indice] is _PENDENTE:
+                    corrida.resultados[indice] = None if tarefa.cancelled() or tarefa.exception() else tarefa.result()
+    finally:
+        for tarefa, evento in tarefas:
+            if not tarefa.done():
+                evento.set()
+                tarefa.cancel()
+
+_executor = None
+_lock = threading.Lock()
+
+def obter_executor():
+    """Pool de threads compartilhado pelas buscas de primeira_valida"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix='busca')
+    return _executor
+
+def primeira_valida(fontes, atraso=ATRASO_HEDGE, janela=JANELA_PRIORIDADE):
+    """Versão com threads de primeira_valida_async; as fontes são funções comuns sem argumentos
+
+    fontes pode ser um gerador: a próxima fonte só é obtida quando chega a vez de iniciá-la,
+    na thread que chamou (ex.: a dona de um navegador, que carrega a página de busca
+    enquanto as fontes anteriores baixam as imagens). O prazo do produto vale nas threads.
+    """
+    corrida = _Corrida(fontes, atraso, janela)
+    futuros = []  # (futuro, evento de cancelamento), em ordem de prioridade
+
+    def executar(fonte, evento):
+        with cancelamento(evento):
+            return fonte()
+
+    try:
+        while True:
+            agora = time.monotonic()
+            terminou, resultado = corrida.decidir(agora)
+            if terminou:
+                return resultado
+            fonte = corrida.proxima_fonte(agora)
+            if fonte is not None:
+                evento = threading.Event()
+                # Cada fonte leva uma cópia do contexto (prazo do produto) para a thread
+                futuro = obter_executor().submit(contextvars.copy_context().run, executar, fonte, evento)
+                futuros.append((futuro, evento))
+                continue
+            pendentes = [futuro for futuro, _ in futuros if not futuro.done()]
+            if pendentes:
+                wait(pendentes, timeout=corrida.espera(agora), return_when=FIRST_COMPLETED)
+            for indice, (futuro, _) in enumerate(futuros):
+                if futuro.done() and corrida.resultados[indice] is _PENDENTE:
+                    corrida.resultados[indice] = None if futuro.cancelled() or futuro.exception() else futuro.result()
+    finally:
+        for futuro, evento in futuros:
+            if not futuro.done():
+                evento.set()
+                futuro.cancel()
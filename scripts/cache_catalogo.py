@@ -0,0 +1,99 @@
+"""Cache colunar (Arrow IPC) das planilhas de catálogo, para não reprocessar CSV/XLSX a cada execução"""
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+# Configurações
+CACHE_DIR = os.environ.get('CACHE_CATALOGO_DIR', '.cache/catalogos')
+TAMANHO_BLOCO = 1024 * 1024
+
+def _hash_arquivo(caminho):
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+def _ler_origem(caminho, colunas=None):
+    """Lê a planilha de origem com o pandas (CSV ou Excel)"""
+    if os.path.splitext(caminho)[1].lower() in ('.xlsx', '.xls'):
+        return pd.read_excel(caminho, usecols=colunas)
+    return pd.read_csv(caminho, usecols=colunas)
+
+def _caminhos_cache(caminho):
+    """Arquivo Arrow e metadados do cache de uma planilha (nome + hash do caminho absoluto)"""
+    chave = hashlib.sha1(os.path.abspath(caminho).encode('utf-8')).hexdigest()[:12]
+    base = os.path.join(CACHE_DIR, f"{os.path.basename(caminho)}.{chave}")
+    return f"{base}.arrow", f"{base}.json"
+
+def _cache_valido(caminho, caminho_meta, estado):
+    """Confere o cache pela data e tamanho da origem; se só a data mudou, confere o hash do conteúdo"""
+    try:
+        with open(caminho_meta, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta['tamanho'] != estado.st_size:
+        return None
+    if meta['mtime'] == estado.st_mtime:
+        return meta
+    sha256 = _hash_arquivo(caminho)
+    if sha256 != meta['sha256']:
+        return None
+    # Mesmo conteúdo com data nova (checkout, cópia): atualizar a data e manter o cache
+    meta['mtime'] = estado.st_mtime
+    _gravar_json(caminho_meta, meta)
+    return meta
+
+def _gravar_json(caminho, dados):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f)
+    os.replace(temporario, caminho)
+
+def _converter(caminho, caminho_arrow, caminho_meta, estado):
+    """Lê a planilha inteira e grava o cache Arrow sem compressão (pode ser mapeado em memória)"""
+    sha256 = _hash_arquivo(caminho)
+    df = _ler_origem(caminho)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temporario = f"{caminho_arrow}.{os.getpid()}.tmp"
+        feather.write_feather(df, temporario, compression='uncompressed')
+        os.replace(temporario, caminho_arrow)
+        _gravar_json(caminho_meta, {
+            'origem': os.path.abspath(caminho),
+            'tamanho': estado.st_size,
+            'mtime': estado.st_mtime,
+            'sha256': sha256
+        })
+    except (pa.ArrowException, OSError) as e:
+        logging.warning(f"Não foi possível gravar o cache de {caminho}: {str(e)}")
+    return df
+
+def carregar_tabela(caminho, colunas=None):
+    """Carrega uma planilha (CSV ou XLSX) como DataFrame, usando o cache colunar quando válido
+
+    Na primeira carga (ou quando a planilha muda) ela é convertida para Arrow IPC; nas
+    seguintes o arquivo Arrow é mapeado em memória e só as colunas pedidas são lidas.
+    Sem o pyarrow instalado, a planilha é lida diretamente com o pandas.
+    """
+    if pa is None:
+        return _ler_origem(caminho, colunas)
+
+    estado = os.stat(caminho)
+    caminho_arrow, caminho_meta = _caminhos_cache(caminho)
+    if os.path.exists(caminho_arrow) and _cache_valido(caminho, caminho_meta, estado):
+        tabela = feather.read_table(caminho_arrow, columns=colunas, memory_map=True)
+        return tabela.to_pandas()
+
+    df = _converter(caminho, caminho_arrow, caminho_meta, estado)
+    return df[colunas] if colunas is not None else df
@@ -0,0 +1,259 @@
+"""Cache local das imagens baixadas, endereçado pelo SHA-256 do conteúdo"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+# Configurações
+CACHE_DIR = os.environ.get('CACHE_IMAGENS_DIR', '.cache/imagens')
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_IMAGENS_MAX_MB', '2048')) * 1024 * 1024
+BUSCAS_TTL = float(os.environ.get('CACHE_BUSCAS_TTL_DIAS', '7')) * 24 * 60 * 60  # segundos
+BUSCAS_VAZIAS_TTL = float(os.environ.get('CACHE_BUSCAS_VAZIAS_TTL_HORAS', '1')) * 60 * 60  # buscas sem candidatas
+BUSCAS_MAX = int(os.environ.get('CACHE_BUSCAS_MAX', '50000'))  # resultados de busca guardados
+
+def normalizar_consulta(consulta):
+    """Normaliza a consulta para a chave do cache: Unicode NFKC, minúsculas e espaços simples"""
+    return ' '.join(unicodedata.normalize('NFKC', consulta).casefold().split())
+
+class CacheImagens:
+    """Guarda cada imagem uma única vez (nome = SHA-256) e indexa URL -> hash em SQLite
+
+    A tabela `escolhas` registra qual imagem foi usada para cada slug, o que permite
+    gerar novamente os arquivos finais a partir do cache, sem nova busca na web. A tabela
+    `buscas` guarda, por (fonte, consulta normalizada), a lista ordenada de URLs candidatas
+    que a busca retornou, com validade de BUSCAS_TTL e no máximo BUSCAS_MAX entradas. Uma
+    busca sem candidatas (página fora do ar, bloqueio, layout mudado) vale só por
+    BUSCAS_VAZIAS_TTL.
+    """
+
+    def __init__(self, diretorio=CACHE_DIR, max_bytes=CACHE_MAX_BYTES,
+                 buscas_ttl=BUSCAS_TTL, buscas_max=BUSCAS_MAX, buscas_vazias_ttl=BUSCAS_VAZIAS_TTL):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.buscas_ttl = buscas_ttl
+        self.buscas_vazias_ttl = buscas_vazias_ttl
+        self.buscas_max = buscas_max
+        self.bytes_reaproveitados = 0  # bytes lidos do cache em vez de baixados nesta execução
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(diretorio, 'indice.sqlite'), check_same_thread=False)
+        self._db.executescript('''
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                tamanho INTEGER NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                baixado_em REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS escolhas (
+                slug TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buscas (
+                fonte TEXT NOT NULL,
+                consulta TEXT NOT NULL,
+                urls TEXT NOT NULL,
+                buscado_em REAL NOT NULL,
+                PRIMARY KEY (fonte, consulta)
+            );
+            CREATE INDEX IF NOT EXISTS idx_blobs_acesso ON blobs(ultimo_acesso);
+            CREATE INDEX IF NOT EXISTS idx_buscas_data ON buscas(buscado_em);
+            -- Tamanho total dos blobs, mantido pelos gatilhos para não somar a tabela a cada escrita
+            CREATE TABLE IF NOT EXISTS meta (
+                chave TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (chave, valor)
+                SELECT 'total_bytes', COALESCE(SUM(tamanho), 0) FROM blobs;
+            CREATE TRIGGER IF NOT EXISTS blobs_total_inserir AFTER INSERT ON blobs BEGIN
+                UPDATE meta SET valor = valor + NEW.tamanho WHERE chave = 'total_bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS blobs_total_remover AFTER DELETE ON blobs BEGIN
+                UPDATE meta SET valor = valor - OLD.tamanho WHERE chave = 'total_bytes';
+            END;
+        ''')
+
+    def _caminho(self, sha256):
+        return os.path.join(self.diretorio, sha256[:2], sha256)
+
+    @contextmanager
+    def _escrita(self):
+        """Transação de escrita exclusiva, também entre processos (BEGIN IMMEDIATE)
+
+        Gravar um blob e removê-lo passam por ela, junto com as linhas que apontam para
+        ele: a remoção não apaga um arquivo que outra gravação acabou de registrar.
+        """
+        with self._lock, self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            yield
+
+    def _apagar_linhas(self, sha256):
+        """Remove o blob do índice, com as URLs e escolhas que apontam para ele"""
+        self._db.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+        self._db.execute('DELETE FROM urls WHERE sha256 = ?', (sha256,))
+        self._db.execute('DELETE FROM escolhas WHERE sha256 = ?', (sha256,))
+
+    def _ler(self, sha256):
+        """Lê um blob e atualiza seu último acesso; retorna None se o arquivo sumiu"""
+        try:
+            with open(self._caminho(sha256), 'rb') as f:
+                dados = f.read()
+        except FileNotFoundError:
+            with self._escrita():
+                # Pode ter sido gravado de novo entre a leitura e a transação
+                if not os.path.exists(self._caminho(sha256)):
+                    self._apagar_linhas(sha256)
+            return None
+        with self._lock, self._db:
+            self._db.execute('UPDATE blobs SET ultimo_acesso = ? WHERE sha256 = ?', (time.time(), sha256))
+            self.bytes_reaproveitados += len(dados)
+        return dados
+
+    def obter(self, url):
+        """Retorna os bytes guardados para a URL, ou None se não estiver no cache"""
+        with self._lock:
+            linha = self._db.execute('SELECT sha256 FROM urls WHERE url = ?', (url,)).fetchone()
+        return self._ler(linha[0]) if linha else None
+
+    def guardar(self, dados, url=None):
+        """Guarda os bytes (uma vez por conteúdo) e associa a URL, se informada; retorna o hash"""
+        sha256 = hashlib.sha256(dados).hexdigest()
+        caminho = self._caminho(sha256)
+        agora = time.time()
+        with self._escrita():
+            if not os.path.exists(caminho):
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                # Escrita atômica: um processo interrompido nunca deixa um blob pela metade
+                temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temporario, 'wb') as f:
+                    f.write(dados)
+                os.replace(temporario, caminho)
+            # Blob já conhecido só tem o acesso atualizado (o REPLACE apagaria a linha sem passar pelo gatilho)
+            self._db.execute(
+                'INSERT INTO blobs (sha256, tamanho, ultimo_acesso) VALUES (?, ?, ?) '
+                'ON CONFLICT(sha256) DO UPDATE SET ultimo_acesso = excluded.ultimo_acesso',
+                (sha256, len(dados), agora)
+            )
+            if url:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO urls (url, sha256, baixado_em) VALUES (?, ?, ?)',
+                    (url, sha256, agora)
+                )
+        self.remover_excesso()
+        return sha256
+
+    def registrar_escolha(self, slug, dados):
+        """Registra a imagem de origem usada para o slug"""
+        sha256 = self.guardar(dados)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO escolhas (slug, sha256) VALUES (?, ?)', (slug, sha256))
+        return sha256
+
+    def obter_escolha(self, slug):
+        """Retorna os bytes da imagem de origem usada para o slug, ou None"""
+        with self._lock:
+            linha = self._db.execute('SELECT sha256 FROM escolhas WHERE slug = ?', (slug,)).fetchone()
+        return self._ler(linha[0]) if linha else None
+
+    def escolhas(self):
+        """Itera sobre (slug, bytes) de todas as imagens de origem registradas"""
+        with self._lock:
+            slugs = [linha[0] for linha in self._db.execute('SELECT slug FROM escolhas ORDER BY slug')]
+        for slug in slugs:
+            dados = self.obter_escolha(slug)
+            if dados is not None:
+                yield slug, dados
+
+    def obter_busca(self, fonte, consulta):
+        """Retorna a lista de URLs candidatas guardada para a busca, ou None se não houver ou tiver expirado
+
+        Listas vazias expiram em buscas_vazias_ttl.
+        """
+        agora = time.time()
+        with self._lock:
+            linha = self._db.execute(
+                'SELECT urls FROM buscas WHERE fonte = ? AND consulta = ? AND buscado_em > ? '
+                "AND (urls != '[]' OR buscado_em > ?)",
+                (fonte, normalizar_consulta(consulta), agora - self.buscas_ttl, agora - self.buscas_vazias_ttl)
+            ).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def guardar_busca(self, fonte, consulta, urls):
+        """Guarda a lista ordenada de URLs candidatas retornada pela busca"""
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO buscas (fonte, consulta, urls, buscado_em) VALUES (?, ?, ?, ?)',
+                (fonte, normalizar_consulta(consulta), json.dumps(list(urls)), time.time())
+            )
+            # Expiradas primeiro, depois as mais antigas além do limite de entradas
+            self._db.execute('DELETE FROM buscas WHERE buscado_em <= ?', (time.time() - self.buscas_ttl,))
+            self._db.execute(
+                'DELETE FROM buscas WHERE rowid IN ('
+                'SELECT rowid FROM buscas ORDER BY buscado_em DESC LIMIT -1 OFFSET ?)',
+                (self.buscas_max,)
+            )
+
+    def buscar_com_cache(self, fonte, consulta, buscar):
+        """Retorna as URLs candidatas da busca, chamando buscar() só se não estiverem no cache
+
+        Se buscar() lançar uma exceção, nada é guardado e a exceção é repassada.
+        """
+        urls = self.obter_busca(fonte, consulta)
+        if urls is None:
+            urls = list(buscar())
+            self.guardar_busca(fonte, consulta, urls)
+        return urls
+
+    def remover_excesso(self):
+        """Remove os blobs usados há mais tempo até o cache caber em max_bytes
+
+        As linhas (blob, URLs e escolhas) e os arquivos saem na mesma transação de escrita.
+        """
+        with self._lock:
+            total = self._db.execute("SELECT valor FROM meta WHERE chave = 'total_bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        with self._escrita():
+            # Relido dentro da transação: outro processo pode ter removido ou gravado blobs
+            total = self._db.execute("SELECT valor FROM meta WHERE chave = 'total_bytes'").fetchone()[0]
+            removidos = []
+            for sha256, tamanho in self._db.execute('SELECT sha256, tamanho FROM blobs ORDER BY ultimo_acesso'):
+                if total <= self.max_bytes:
+                    break
+                removidos.append(sha256)
+                total -= tamanho
+            for sha256 in removidos:
+                self._apagar_linhas(sha256)
+                try:
+                    os.remove(self._caminho(sha256))
+                except FileNotFoundError:
+                    pass
+        return len(removidos)
+
+    def fechar(self):
+        with self._lock:
+            self._db.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def bytes_reaproveitados():
+    """Bytes que o cache compartilhado poupou de baixar nesta execução (0 se não foi usado)"""
+    return _cache.bytes_reaproveitados if _cache is not None else 0
+
+def obter_cache():
+    """Retorna o cache compartilhado, criando-o na primeira chamada"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheImagens()
+    return _cache
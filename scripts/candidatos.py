@@ -0,0 +1,176 @@
+"""Escolha da imagem do produto entre as candidatas de uma página de busca
+
+As candidatas são ordenadas por indícios da própria marcação: maior largura do srcset,
+width/height declarados, padrões da URL (logos, banners, ícones e pixels de rastreamento
+perdem pontos) e as palavras do alt em comum com o nome do produto. As melhores são
+sondadas em paralelo com requisições Range, que trazem só o cabeçalho da imagem; só a
+mais bem colocada entre as aprovadas é baixada inteira.
+"""
+import contextvars
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+from slugify import slugify
+
+import cliente_http
+from retentativas import PrazoEsgotado, verificar_prazo
+
+# Configurações
+CANDIDATAS_POR_RODADA = 4  # candidatas sondadas em paralelo de cada vez
+MAX_THREADS = 8
+EXTENSOES = ('.jpg', '.jpeg', '.png', '.webp')
+LADO_MINIMO = 300  # lados declarados menores que isso indicam miniatura ou ícone
+ATRIBUTOS_SRC = ('src', 'data-src', 'data-lazy', 'data-original', 'data-zoom-image')
+PADRAO_DESCARTE = re.compile(
+    r'logo|banner|icon|icone|sprite|pixel|tracking|placeholder|avatar|selo|badge|'
+    r'loading|spinner|blank|spacer|bandeira|pagamento|\.gif|\.svg', re.IGNORECASE)
+PADRAO_PRODUTO = re.compile(r'produto|product|/p/|catalog|zoom|large|grande|original|\d{3,4}x\d{3,4}', re.IGNORECASE)
+
+def _palavras(texto):
+    """Palavras normalizadas (sem acentos, minúsculas) com mais de duas letras"""
+    return {palavra for palavra in slugify(texto or '').split('-') if len(palavra) > 2}
+
+def _inteiro(valor):
+    try:
+        return int(str(valor).strip().removesuffix('px'))
+    except (TypeError, ValueError):
+        return None
+
+def _maior_do_srcset(srcset):
+    """(url, largura) da maior opção do srcset; largura é None para descritores 'x' ou ausentes"""
+    melhor, largura_melhor, fator_melhor = None, None, 0
+    for opcao in srcset.split(','):
+        partes = opcao.split()
+        if not partes:
+            continue
+        descritor = partes[1] if len(partes) > 1 else '1x'
+        if descritor.endswith('w'):
+            largura = _inteiro(descritor[:-1])
+            fator = largura or 0
+        else:
+            try:
+                largura, fator = None, float(descritor[:-1])
+            except ValueError:
+                continue
+        if melhor is None or fator > fator_melhor:
+            melhor, largura_melhor, fator_melhor = partes[0], largura, fator
+    return melhor, largura_melhor
+
+def pontuar(url, largura=None, altura=None, alt=None, palavras_produto=frozenset()):
+    """Pontuação da candidata: quanto maior, mais provável que seja a foto do produto"""
+    pontos = 0.0
+    if PADRAO_DESCARTE.search(url) or PADRAO_DESCARTE.search(alt or ''):
+        pontos -= 10
+    if PADRAO_PRODUTO.search(url):
+        pontos += 2
+    lados = [lado for lado in (largura, altura) if lado]
+    if lados:
+        pontos += 3 if min(lados) >= LADO_MINIMO else -5
+        if largura and altura and max(largura, altura) > 3 * min(largura, altura):
+            pontos -= 3  # faixa estreita: banner ou barra
+    if palavras_produto:
+        comuns = _palavras(alt) | _palavras(os.path.basename(urlsplit(url).path))
+        pontos += 5 * len(comuns & palavras_produto) / len(palavras_produto)
+    return pontos
+
+def candidata_da_img(img):
+    """(url, largura, altura, alt) de um elemento <img> (BeautifulSoup ou lxml), ou None
+
+    Considera os atributos de carregamento tardio e, havendo srcset, a maior opção dele.
+    """
+    url = next((img.get(atributo) for atributo in ATRIBUTOS_SRC if img.get(atributo)), None)
+    largura = _inteiro(img.get('width'))
+    srcset = img.get('srcset') or img.get('data-srcset')
+    if srcset:
+        url_srcset, largura_srcset = _maior_do_srcset(srcset)
+        if url_srcset:
+            url, largura = url_srcset, largura_srcset or largura
+    if not url or url.startswith('data:'):
+        return None
+    return url.strip(), largura, _inteiro(img.get('height')), img.get('alt')
+
+def ordenar(candidatas, nome_produto):
+    """Ordena candidatas (url, largura, altura, alt, bônus) pela pontuação somada ao bônus
+
+    Retorna as URLs sem repetição; empates mantêm a ordem de entrada. As de pontuação
+    negativa (logos, banners, miniaturas) são descartadas.
+    """
+    palavras_produto = _palavras(nome_produto)
+    pontuadas = {}
+    for posicao, (url, largura, altura, alt, bonus) in enumerate(candidatas):
+        pontos = bonus + pontuar(url, largura, altura, alt, palavras_produto)
+        if url not in pontuadas or pontuadas[url][0] < pontos:
+            pontuadas[url] = (pontos, -posicao)
+    return sorted((url for url in pontuadas if pontuadas[url][0] >= 0), key=pontuadas.get, reverse=True)
+
+def ordenar_candidatas(imgs, nome_produto, base=None):
+    """URLs dos elementos <img>, da mais à menos provável de ser a foto do produto
+
+    Com base (busca em um site), só valem as extensões de EXTENSOES e caminhos relativos
+    são completados com a base; sem base (Google), valem as URLs absolutas.
+    """
+    def candidatas():
+        for img in imgs:
+            candidata = candidata_da_img(img)
+            if candidata is None:
+                continue
+            url, largura, altura, alt = candidata
+            if base is None:
+                if not url.startswith('http'):
+                    continue
+            else:
+                if not urlsplit(url).path.lower().endswith(EXTENSOES):
+                    continue
+                url = urljoin(base + '/', url)
+            yield url, largura, altura, alt, 0
+    return ordenar(candidatas(), nome_produto)
+
+_executor = None
+_lock = threading.Lock()
+
+def obter_executor():
+    """Pool de threads compartilhado pelas sondagens"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix='sondagem')
+    return _executor
+
+def _sondar(url, validar_cabecalho):
+    try:
+        return cliente_http.sondar_imagem(url, validar_cabecalho)
+    except PrazoEsgotado:
+        raise
+    except Exception:
+        return False
+
+def baixar_melhor(urls, validar_cabecalho=None, validar_imagem=None, por_rodada=CANDIDATAS_POR_RODADA):
+    """Sonda as candidatas (já ordenadas) em rodadas paralelas e baixa só a melhor aprovada
+
+    Em cada rodada, as aprovadas pelo cabeçalho são baixadas em ordem de pontuação até
+    uma passar por validar_imagem; as de sondagem inconclusiva vêm depois delas. Retorna
+    os bytes da imagem, ou None.
+    """
+    for inicio in range(0, len(urls), por_rodada):
+        verificar_prazo()
+        rodada = urls[inicio:inicio + por_rodada]
+        # Cada sondagem leva uma cópia do contexto (prazo e cancelamento da busca) para a thread
+        futuros = [obter_executor().submit(contextvars.copy_context().run, _sondar, url, validar_cabecalho)
+                   for url in rodada]
+        resultados = [futuro.result() for futuro in futuros]
+        aprovadas = [url for url, resultado in zip(rodada, resultados) if resultado is True]
+        aprovadas += [url for url, resultado in zip(rodada, resultados) if resultado is None]
+        for url in aprovadas:
+            try:
+                imagem_data = cliente_http.baixar_com_cache(url, validar_cabecalho)
+            except PrazoEsgotado:
+                raise
+            except Exception:
+                continue
+            if imagem_data and (validar_imagem is None or validar_imagem(imagem_data)):
+                return imagem_data
+    return None
@@ -0,0 +1,103 @@
+"""Leitura em streaming do catálogo de produtos (array JSON ou JSON por linha)"""
+import json
+import logging
+import re
+import sys
+
+# Configurações
+TAMANHO_BLOCO = 64 * 1024
+CAMPOS = ('codigo', 'nome', 'slug', 'categoria', 'marca')
+
+_SEPARADORES = re.compile(r'[\s,]*')
+
+class Produto:
+    """Registro compacto de um produto, só com os campos usados na busca de imagens"""
+    __slots__ = CAMPOS
+
+    def __init__(self, codigo, nome, slug, categoria=None, marca=None):
+        self.codigo = codigo
+        self.nome = nome
+        self.slug = slug
+        # Categorias e marcas se repetem em milhares de produtos: uma única string para cada
+        self.categoria = sys.intern(categoria) if categoria else categoria
+        self.marca = sys.intern(marca) if marca else marca
+
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(*(dados.get(campo) for campo in CAMPOS))
+
+    def __repr__(self):
+        return f"Produto({self.codigo!r}, {self.nome!r}, {self.slug!r})"
+
+def _objetos_array(buffer, arquivo):
+    """Decodifica os elementos de um array JSON um por vez, lendo o arquivo em blocos
+
+    buffer é o conteúdo já lido logo depois do '[' inicial.
+    """
+    decoder = json.JSONDecoder()
+    posicao = 0
+    fim_arquivo = False
+    while True:
+        posicao = _SEPARADORES.match(buffer, posicao).end()
+        if buffer.startswith(']', posicao):
+            return
+        try:
+            objeto, posicao_fim = decoder.raw_decode(buffer, posicao)
+        except json.JSONDecodeError:
+            # Elemento incompleto no fim do bloco: ler mais e tentar de novo
+            if fim_arquivo:
+                raise
+            bloco = arquivo.read(TAMANHO_BLOCO)
+            fim_arquivo = not bloco
+            buffer, posicao = buffer[posicao:] + bloco, 0
+            continue
+        yield objeto
+        posicao = posicao_fim
+
+def _objetos_linhas(inicio, arquivo):
+    """Decodifica um objeto JSON por linha; linhas inválidas são ignoradas com aviso"""
+    # O primeiro bloco pode terminar no meio de uma linha: completá-la antes de seguir pelo arquivo
+    primeiras = (inicio + arquivo.readline()).splitlines()
+    for numero, linha in enumerate(_encadear(primeiras, arquivo), 1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            yield json.loads(linha)
+        except json.JSONDecodeError:
+            logging.warning(f"Linha {numero} do catálogo ignorada: JSON inválido")
+
+def _encadear(primeiras, arquivo):
+    yield from primeiras
+    yield from arquivo
+
+def _produtos(arquivo):
+    with arquivo:
+        inicio = arquivo.read(TAMANHO_BLOCO)
+        conteudo = inicio.lstrip()
+        if not conteudo:
+            return
+        if conteudo.startswith('['):
+            objetos = _objetos_array(conteudo[1:], arquivo)
+        else:
+            objetos = _objetos_linhas(inicio, arquivo)
+        ignorados = 0
+        for posicao, objeto in enumerate(objetos, 1):
+            # Sem slug não há nome de arquivo para a imagem (viraria None.jpg)
+            if not isinstance(objeto, dict) or not objeto.get('slug'):
+                ignorados += 1
+                nome = objeto.get('nome') if isinstance(objeto, dict) else None
+                logging.warning(f"Produto {posicao} do catálogo ignorado: sem slug ({nome!r})")
+                continue
+            yield Produto.de_dict(objeto)
+        if ignorados:
+            logging.error(f"{ignorados} produto(s) do catálogo ignorado(s) por não terem slug")
+
+def ler_catalogo(caminho):
+    """Itera sobre os produtos do catálogo sem carregar o arquivo inteiro
+
+    Aceita um array JSON (como produtos_importados.json) ou um objeto JSON por linha
+    (NDJSON). O arquivo é aberto na chamada, então um caminho inválido falha de imediato.
+    Produtos sem slug são ignorados, com aviso, e contados no log ao fim da leitura.
+    """
+    return _produtos(open(caminho, 'r', encoding='utf-8'))
@@ -0,0 +1,140 @@
+"""Modo incremental: compara o catálogo com o instantâneo da execução anterior
+
+O instantâneo guarda, para cada produto (pelo código ou, sem ele, pelo slug), o slug e um
+hash do nome e da marca. Só são processados os produtos novos, os alterados (nome ou
+marca) e os que estão sem imagem; no fim, as imagens dos produtos que saíram do catálogo
+(e as dos slugs antigos dos renomeados) são removidas. Funciona com o catálogo lido aos
+poucos: cada produto é classificado ao passar por pendente().
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+def assinatura(nome, marca=None):
+    """Hash do nome e da marca do produto; muda quando um dos dois muda"""
+    texto = f"{str(nome or '').strip()}\x1f{str(marca or '').strip()}"
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).hexdigest()
+
+class CatalogoIncremental:
+    """Instantâneo do catálogo e o plano da execução atual
+
+    caminho é o JSON do instantâneo; diretorio, o das imagens ({slug}.jpg). Com
+    completo=True todos os produtos são processados, mas o instantâneo e as remoções
+    funcionam do mesmo jeito.
+    """
+
+    def __init__(self, caminho, diretorio, completo=False):
+        self.caminho = caminho
+        self.diretorio = diretorio
+        self.completo = completo
+        self.anterior = self._carregar()
+        self._atual = {}  # chave -> {'slug', 'hash'} dos produtos vistos nesta execução
+        self._concluidos = set()
+        self._alterados = set()
+        self._imagens = set(os.listdir(diretorio)) if os.path.isdir(diretorio) else set()
+        self.contagem = {'novo': 0, 'alterado': 0, 'sem_imagem': 0, 'inalterado': 0}
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Instantâneo {self.caminho} ignorado, catálogo processado por inteiro: {str(e)}")
+            return {}
+
+    def classificar(self, chave, slug, nome, marca=None):
+        """'novo', 'alterado', 'sem_imagem' ou 'inalterado', e registra o produto como visto"""
+        hash_atual = assinatura(nome, marca)
+        with self._lock:
+            self._atual[chave] = {'slug': slug, 'hash': hash_atual}
+            anterior = self.anterior.get(chave)
+            if anterior is None:
+                situacao = 'novo'
+            elif anterior['hash'] != hash_atual or anterior['slug'] != slug:
+                situacao = 'alterado'
+                self._alterados.add(chave)
+            elif f"{slug}.jpg" not in self._imagens:
+                situacao = 'sem_imagem'
+            else:
+                situacao = 'inalterado'
+            self.contagem[situacao] += 1
+        return situacao
+
+    def pendente(self, chave, slug, nome, marca=None):
+        """Indica se o produto precisa ser processado nesta execução"""
+        situacao = self.classificar(chave, slug, nome, marca)
+        if situacao == 'inalterado':
+            with self._lock:
+                self._concluidos.add(chave)
+            return self.completo
+        return True
+
+    def alterado(self, chave):
+        """Indica se o produto mudou (nome, marca ou slug) desde a execução anterior
+
+        A imagem que ele já tem, ou a escolhida antes para o mesmo slug, não vale mais.
+        """
+        with self._lock:
+            return chave in self._alterados
+
+    def concluir(self, chave):
+        """Marca o produto como processado; ele entra no instantâneo com o nome e a marca atuais"""
+        with self._lock:
+            self._concluidos.add(chave)
+
+    def _gravar(self, instantaneo):
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(instantaneo, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+
+    def finalizar(self, catalogo_completo=True):
+        """Grava o instantâneo e, com o catálogo lido por inteiro, remove as imagens que sobraram
+
+        Produtos vistos mas não concluídos mantêm a entrada anterior (ou nenhuma), para
+        serem refeitos na próxima execução. Uma imagem só é removida se o slug dela não
+        for usado por nenhum produto do catálogo atual. Retorna os arquivos removidos.
+        """
+        with self._lock:
+            instantaneo = {}
+            for chave, entrada in self._atual.items():
+                if chave in self._concluidos:
+                    instantaneo[chave] = entrada
+                elif chave in self.anterior:
+                    instantaneo[chave] = self.anterior[chave]
+
+            removidos = []
+            if catalogo_completo:
+                slugs_atuais = {entrada['slug'] for entrada in self._atual.values()}
+                # Saíram do catálogo, ou foram renomeados e já têm a imagem do slug novo
+                obsoletos = {
+                    entrada['slug'] for chave, entrada in self.anterior.items()
+                    if chave not in self._atual or chave in self._concluidos
+                }
+                for slug in sorted(obsoletos - slugs_atuais):
+                    caminho = os.path.join(self.diretorio, f"{slug}.jpg")
+                    try:
+                        os.remove(caminho)
+                        removidos.append(caminho)
+                    except FileNotFoundError:
+                        pass
+            else:
+                # Sem ver o catálogo inteiro, quem não apareceu continua no instantâneo
+                for chave, entrada in self.anterior.items():
+                    instantaneo.setdefault(chave, entrada)
+
+        self._gravar(instantaneo)
+        return removidos
+
+    def total(self):
+        """Produtos do catálogo vistos nesta execução, processados ou não"""
+        with self._lock:
+            return sum(self.contagem.values())
+
+    def resumo(self):
+        return ', '.join(f"{situacao}: {quantidade}" for situacao, quantidade in self.contagem.items())
@@ -1,7 +1,7 @@
-import pandas as pd
+from cache_catalogo import carregar_tabela
 
-# Lê o CSV
-df = pd.read_csv('racoes_atualizadas_com_imagens.csv')
+# Lê o CSV (pelo cache colunar, quando válido)
+df = carregar_tabela('racoes_atualizadas_com_imagens.csv')
 
 # Mostra as colunas
 print("Colunas do CSV:")
@@ -0,0 +1,375 @@
+"""Cliente HTTP compartilhado pelos scripts de download de imagens"""
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+import cache_imagens
+from disjuntor import host_da_url, obter_disjuntores
+from metricas import obter_metricas
+from retentativas import STATUS_TRANSITORIOS, repetir, resposta_transitoria, tempo_restante
+
+try:
+    import httpx
+    import h2  # noqa: F401 - necessário para o HTTP/2 do httpx
+except ImportError:
+    httpx = None
+
+# Configurações
+HEADERS_PADRAO = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8'
+}
+TIMEOUT_CONEXAO = 3  # segundos para abrir a conexão
+TIMEOUT_LEITURA = 10  # segundos sem receber dados
+MAX_HOSTS = 32  # quantidade de hosts com pool de conexões mantido
+MAX_CONEXOES_POR_HOST = 8  # conexões keep-alive mantidas em cada pool
+MAX_BYTES_IMAGEM = 15 * 1024 * 1024  # corpo maior que isso é descartado
+MAX_BYTES_CABECALHO = 256 * 1024  # se o cabeçalho não for reconhecido até aqui, a imagem é descartada
+BYTES_SONDA = 16 * 1024  # bytes pedidos na sondagem (Range); costumam bastar para o cabeçalho de JPEG e PNG
+LIMITE_MEMORIA = 1024 * 1024  # corpos maiores que isso vão para um arquivo temporário
+TAMANHO_BLOCO = 64 * 1024
+# Com o endereço de um servidor local (ex.: o de benchmark.py), todas as requisições vão para ele
+SERVIDOR_FALSO = os.environ.get('SERVIDOR_FALSO')
+
+_cliente = None
+_lock = threading.Lock()
+
+def criar_cliente(http2=True):
+    """Cria um cliente com pool de conexões por host e headers padrão
+
+    Usa httpx com HTTP/2 quando disponível; caso contrário, uma requests.Session.
+    Os dois clientes podem ser usados por várias threads ao mesmo tempo.
+    """
+    if http2 and httpx is not None:
+        return httpx.Client(
+            http2=True,
+            headers=HEADERS_PADRAO,
+            timeout=httpx.Timeout(TIMEOUT_LEITURA, connect=TIMEOUT_CONEXAO),
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=MAX_HOSTS * MAX_CONEXOES_POR_HOST,
+                max_keepalive_connections=MAX_HOSTS * MAX_CONEXOES_POR_HOST
+            )
+        )
+
+    sessao = requests.Session()
+    sessao.headers.update(HEADERS_PADRAO)
+    adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=MAX_CONEXOES_POR_HOST)
+    sessao.mount('http://', adapter)
+    sessao.mount('https://', adapter)
+    return sessao
+
+def obter_cliente():
+    """Retorna o cliente compartilhado, criando-o na primeira chamada"""
+    global _cliente
+    if _cliente is None:
+        with _lock:
+            if _cliente is None:
+                _cliente = criar_cliente()
+    return _cliente
+
+def redirecionar(url):
+    """Reescreve a URL para o SERVIDOR_FALSO, se configurado, levando o host original no caminho
+
+    Disjuntor, métricas e cache continuam vendo a URL original; só o transporte muda.
+    """
+    if not SERVIDOR_FALSO:
+        return url
+    partes = urlsplit(url)
+    consulta = f"?{partes.query}" if partes.query else ''
+    return f"{SERVIDOR_FALSO.rstrip('/')}/{partes.netloc}{partes.path or '/'}{consulta}"
+
+def redirecionado(get):
+    """Envolve uma função get(url, ...) para passar por redirecionar"""
+    if not SERVIDOR_FALSO:
+        return get
+    return lambda url, *args, **kwargs: get(redirecionar(url), *args, **kwargs)
+
+# Falhas de rede que valem uma nova tentativa
+ERROS_TRANSITORIOS = (requests.ConnectionError, requests.Timeout)
+if httpx is not None:
+    ERROS_TRANSITORIOS += (httpx.TransportError,)
+
+class RespostaTransitoria(Exception):
+    """Resposta com status que justifica repetir a requisição (429 ou 5xx)"""
+
+def _timeout():
+    """Timeouts de conexão e leitura, limitados ao que resta do prazo do produto"""
+    conexao, leitura = TIMEOUT_CONEXAO, TIMEOUT_LEITURA
+    restante = tempo_restante()
+    if restante is not None:
+        conexao, leitura = min(conexao, restante), min(leitura, restante)
+    if httpx is not None and isinstance(obter_cliente(), httpx.Client):
+        return httpx.Timeout(leitura, connect=conexao)
+    return (conexao, leitura)
+
+def get(url, **kwargs):
+    """Faz um GET reutilizando as conexões do cliente compartilhado
+
+    Falhas de rede e respostas 429/5xx são repetidas com backoff (retentativas.repetir).
+    Lança disjuntor.CircuitoAberto se o host estiver bloqueado pelo disjuntor. Cada
+    tentativa é medida como estágio 'requisicao' do host.
+    """
+    get_protegido = obter_disjuntores().protegido(redirecionado(obter_cliente().get))
+    metricas = obter_metricas()
+    host = host_da_url(url)
+
+    def tentativa():
+        with metricas.cronometrar('requisicao', host):
+            response = get_protegido(url, **{'timeout': _timeout(), **kwargs})
+        metricas.registrar_bytes(host, len(response.content))
+        return response
+
+    return repetir(tentativa, ERROS_TRANSITORIOS, resposta_transitoria)
+
+@contextmanager
+def abrir_stream(url, **kwargs):
+    """Abre um GET sem ler o corpo; retorna (response, iterador de blocos)
+
+    Sair do bloco fecha a resposta, interrompendo a transferência. O status da resposta
+    é registrado no disjuntor do host.
+    """
+    kwargs.setdefault('timeout', _timeout())
+    disjuntores = obter_disjuntores()
+    host = disjuntores.verificar(url)
+    cliente = obter_cliente()
+    registrado = False
+    try:
+        if httpx is not None and isinstance(cliente, httpx.Client):
+            with cliente.stream('GET', redirecionar(url), **kwargs) as response:
+                disjuntores.registrar(host, response.status_code)
+                registrado = True
+                yield response, response.iter_bytes(TAMANHO_BLOCO)
+        else:
+            response = cliente.get(redirecionar(url), stream=True, **kwargs)
+            disjuntores.registrar(host, response.status_code)
+            registrado = True
+            try:
+                yield response, response.iter_content(TAMANHO_BLOCO)
+            finally:
+                response.close()
+    except Exception:
+        if not registrado:
+            disjuntores.registrar(host)
+        raise
+
+class CabecalhoWebP:
+    """Formato, dimensões e modo de uma WebP, lidos dos cabeçalhos dos chunks RIFF
+
+    O plugin WebP do Pillow decodifica o arquivo inteiro ao abri-lo, então uma WebP
+    recebida pela metade nunca seria reconhecida por Image.open.
+    """
+    format = 'WEBP'
+
+    def __init__(self, largura, altura, alfa):
+        self.size = (largura, altura)
+        self.mode = 'RGBA' if alfa else 'RGB'
+
+def _cabecalho_webp(inicio):
+    """Lê o cabeçalho de uma WebP (chunk VP8, VP8L ou VP8X) nos primeiros 30 bytes
+
+    Retorna CabecalhoWebP, None se os bytes ainda não bastam, ou False se não for WebP
+    ou se o cabeçalho for inválido.
+    """
+    if len(inicio) < 12 or inicio[:4] != b'RIFF' or inicio[8:12] != b'WEBP':
+        return False if len(inicio) >= 12 else None
+    if len(inicio) < 30:
+        return None
+    chunk = inicio[12:16]
+    if chunk == b'VP8 ':
+        # Quadro-chave: 3 bytes de tag, código de início 9d 01 2a e dimensões de 14 bits
+        if inicio[23:26] != b'\x9d\x01\x2a':
+            return False
+        largura = int.from_bytes(inicio[26:28], 'little') & 0x3fff
+        altura = int.from_bytes(inicio[28:30], 'little') & 0x3fff
+        return CabecalhoWebP(largura, altura, False)
+    if chunk == b'VP8L':
+        if inicio[20] != 0x2f:
+            return False
+        bits = int.from_bytes(inicio[21:25], 'little')
+        return CabecalhoWebP((bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1, bool(bits >> 28 & 1))
+    if chunk == b'VP8X':
+        largura = int.from_bytes(inicio[24:27], 'little') + 1
+        altura = int.from_bytes(inicio[27:30], 'little') + 1
+        return CabecalhoWebP(largura, altura, bool(inicio[20] & 0x10))
+    return False
+
+def _ler_cabecalho(arquivo):
+    """Tenta identificar a imagem pelos bytes já recebidos; retorna None se ainda não for possível"""
+    posicao = arquivo.tell()
+    try:
+        arquivo.seek(0)
+        webp = _cabecalho_webp(arquivo.read(30))
+        if webp is not False:
+            return webp
+        arquivo.seek(0)
+        # Image.open só lê o cabeçalho (formato, dimensões e modo), sem decodificar os pixels
+        return Image.open(arquivo)
+    except Exception:
+        return None
+    finally:
+        arquivo.seek(posicao)
+
+def baixar_imagem_stream(url, validar_cabecalho=None, max_bytes=MAX_BYTES_IMAGEM):
+    """Baixa uma imagem em blocos, abortando assim que ela se mostrar inadequada
+
+    validar_cabecalho recebe a imagem (só com o cabeçalho lido) e retorna se ela serve;
+    a transferência é interrompida se retornar False, se o corpo passar de max_bytes ou
+    se o cabeçalho não for reconhecido. Corpos grandes ficam em arquivo temporário
+    durante a transferência. Hosts bloqueados pelo disjuntor nem são consultados, e
+    falhas de rede ou respostas 429/5xx são repetidas com backoff. Os motivos de descarte
+    são contados nas métricas; o de uma imagem recusada fica a cargo de validar_cabecalho.
+    Retorna os bytes da imagem, ou None.
+    """
+    host = host_da_url(url)
+    if obter_disjuntores().bloqueado(host):
+        obter_metricas().registrar_rejeicao('host_bloqueado')
+        return None
+    try:
+        return repetir(
+            lambda: _baixar_imagem_stream(url, host, validar_cabecalho, max_bytes),
+            ERROS_TRANSITORIOS + (RespostaTransitoria,)
+        )
+    except RespostaTransitoria:
+        return None
+
+def _baixar_imagem_stream(url, host, validar_cabecalho, max_bytes):
+    metricas = obter_metricas()
+    with metricas.cronometrar('download', host), abrir_stream(url) as (response, blocos):
+        if response.status_code in STATUS_TRANSITORIOS:
+            metricas.registrar_rejeicao(f"status_{response.status_code}")
+            raise RespostaTransitoria(response.status_code)
+        if response.status_code != 200:
+            metricas.registrar_rejeicao(f"status_{response.status_code}")
+            return None
+        tamanho_declarado = int(response.headers.get('Content-Length') or 0)
+        if tamanho_declarado > max_bytes:
+            logging.warning(f"Imagem grande demais ({tamanho_declarado} bytes): {url}")
+            metricas.registrar_rejeicao('grande_demais')
+            return None
+
+        with tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA) as corpo:
+            cabecalho_ok = validar_cabecalho is None
+            total = 0
+            try:
+                for bloco in blocos:
+                    total += len(bloco)
+                    if total > max_bytes:
+                        logging.warning(f"Imagem passou de {max_bytes} bytes, download interrompido: {url}")
+                        metricas.registrar_rejeicao('grande_demais')
+                        return None
+                    corpo.write(bloco)
+
+                    if not cabecalho_ok:
+                        img = _ler_cabecalho(corpo)
+                        if img is not None:
+                            if not validar_cabecalho(img):
+                                return None
+                            cabecalho_ok = True
+                        elif total > MAX_BYTES_CABECALHO:
+                            logging.warning(f"Cabeçalho de imagem não reconhecido: {url}")
+                            metricas.registrar_rejeicao('cabecalho_invalido')
+                            return None
+            finally:
+                metricas.registrar_bytes(host, total)
+
+            if not cabecalho_ok:
+                img = _ler_cabecalho(corpo)
+                if img is None:
+                    metricas.registrar_rejeicao('cabecalho_invalido')
+                    return None
+                if not validar_cabecalho(img):
+                    return None
+
+            corpo.seek(0)
+            return corpo.read()
+
+def sondar_imagem(url, validar_cabecalho=None, bytes_sonda=BYTES_SONDA):
+    """Lê só o início da imagem (requisição Range) e diz se ela serve, sem baixá-la inteira
+
+    Retorna True se o cabeçalho foi lido e aprovado por validar_cabecalho, False se a
+    imagem foi recusada (status, tamanho declarado acima do limite, cabeçalho inválido)
+    e None se o cabeçalho não coube em bytes_sonda: só o download completo decide.
+    Imagens já no cache são avaliadas sem requisição. Servidores que ignoram o Range
+    respondem 200; a leitura para em bytes_sonda do mesmo jeito.
+    """
+    dados = cache_imagens.obter_cache().obter(url)
+    if dados is not None:
+        img = _ler_cabecalho(BytesIO(dados))
+        return img is not None and (validar_cabecalho is None or validar_cabecalho(img))
+    host = host_da_url(url)
+    if obter_disjuntores().bloqueado(host):
+        obter_metricas().registrar_rejeicao('host_bloqueado')
+        return False
+    try:
+        return repetir(
+            lambda: _sondar_imagem(url, host, validar_cabecalho, bytes_sonda),
+            ERROS_TRANSITORIOS + (RespostaTransitoria,)
+        )
+    except RespostaTransitoria:
+        return False
+
+def _sondar_imagem(url, host, validar_cabecalho, bytes_sonda):
+    metricas = obter_metricas()
+    cabecalhos = {'Range': f"bytes=0-{bytes_sonda - 1}"}
+    with metricas.cronometrar('sondagem', host), abrir_stream(url, headers=cabecalhos) as (response, blocos):
+        if response.status_code in STATUS_TRANSITORIOS:
+            metricas.registrar_rejeicao(f"status_{response.status_code}")
+            raise RespostaTransitoria(response.status_code)
+        if response.status_code not in (200, 206):
+            metricas.registrar_rejeicao(f"status_{response.status_code}")
+            return False
+        # Content-Range: bytes 0-65535/123456 traz o tamanho total; sem Range, vale o Content-Length
+        total_declarado = response.headers.get('Content-Range', '').rpartition('/')[2]
+        if response.status_code == 200 or not total_declarado.isdigit():
+            total_declarado = response.headers.get('Content-Length') or '0'
+        if int(total_declarado) > MAX_BYTES_IMAGEM:
+            logging.warning(f"Imagem grande demais ({total_declarado} bytes): {url}")
+            metricas.registrar_rejeicao('grande_demais')
+            return False
+
+        corpo = BytesIO()
+        try:
+            for bloco in blocos:
+                corpo.write(bloco[:bytes_sonda - corpo.tell()])
+                img = _ler_cabecalho(corpo)
+                if img is not None:
+                    return validar_cabecalho is None or validar_cabecalho(img)
+                if corpo.tell() >= bytes_sonda:
+                    return None
+        finally:
+            metricas.registrar_bytes(host, corpo.tell())
+        # Corpo inteiro recebido sem cabeçalho reconhecível
+        metricas.registrar_rejeicao('cabecalho_invalido')
+        return False
+
+def baixar_com_cache(url, validar_cabecalho=None):
+    """Retorna os bytes da imagem, consultando o cache local antes de baixar
+
+    O download é feito por baixar_imagem_stream; imagens rejeitadas não são guardadas.
+    """
+    cache = cache_imagens.obter_cache()
+    dados = cache.obter(url)
+    if dados is not None:
+        return dados
+    dados = baixar_imagem_stream(url, validar_cabecalho)
+    if dados is None:
+        return None
+    cache.guardar(dados, url)
+    return dados
+
+def fechar_cliente():
+    """Fecha as conexões do cliente compartilhado"""
+    global _cliente
+    with _lock:
+        if _cliente is not None:
+            _cliente.close()
+            _cliente = None
@@ -0,0 +1,98 @@
+"""Codificação JPEG/WebP em memória com qualidade ajustada a um limite de bytes"""
+import json
+import os
+import threading
+from io import BytesIO
+
+# Configurações
+QUALIDADE_MAX = 95
+QUALIDADE_MIN = 10
+MEMORIA_PATH = os.environ.get('MEMORIA_QUALIDADE_PATH', '.cache/qualidades.json')
+
+FORMATOS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.webp': 'WEBP'}
+
+def codificar(img, formato='JPEG', quality=QUALIDADE_MAX):
+    """Codifica a imagem em memória e retorna os bytes"""
+    buffer = BytesIO()
+    if formato == 'WEBP':
+        img.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def codificar_no_limite(img, max_bytes, formato='JPEG', qualidade_inicial=None,
+                        qualidade_min=QUALIDADE_MIN, qualidade_max=QUALIDADE_MAX):
+    """Busca binária pela maior qualidade cujo resultado cabe em max_bytes
+
+    Retorna (bytes, qualidade). Se nem a qualidade mínima couber, retorna a codificação
+    na qualidade mínima. Com qualidade_inicial (ex.: a usada na execução anterior), a
+    busca começa por ela e costuma terminar em duas codificações.
+    """
+    baixo, alto = qualidade_min, qualidade_max
+    melhor = None
+    tentativa = qualidade_max if qualidade_inicial is None else max(baixo, min(alto, qualidade_inicial))
+    primeira = True
+    while baixo <= alto:
+        dados = codificar(img, formato, tentativa)
+        if len(dados) <= max_bytes:
+            melhor = (dados, tentativa)
+            baixo = tentativa + 1
+        else:
+            alto = tentativa - 1
+        if primeira and qualidade_inicial is not None:
+            # Confere primeiro a qualidade vizinha, que normalmente encerra a busca
+            tentativa = baixo if melhor else alto
+        else:
+            tentativa = (baixo + alto + 1) // 2
+        primeira = False
+    if melhor is None:
+        return codificar(img, formato, qualidade_min), qualidade_min
+    return melhor
+
+class MemoriaQualidade:
+    """Lembra a qualidade escolhida para cada slug e formato entre execuções (arquivo JSON)"""
+
+    def __init__(self, caminho=MEMORIA_PATH):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                self._qualidades = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._qualidades = {}
+
+    def obter(self, slug, formato):
+        return self._qualidades.get(slug, {}).get(formato)
+
+    def guardar(self, slug, formato, quality):
+        with self._lock:
+            self._qualidades.setdefault(slug, {})[formato] = quality
+
+    def salvar(self):
+        """Grava a memória no disco de forma atômica"""
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._lock:
+            temporario = f"{self.caminho}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self._qualidades, f)
+            os.replace(temporario, self.caminho)
+
+def salvar_no_limite(img, caminho, max_bytes, slug=None, memoria=None):
+    """Codifica a imagem dentro de max_bytes e grava o arquivo uma única vez
+
+    O formato vem da extensão do caminho (.jpg/.jpeg ou .webp). Se slug e memoria forem
+    informados, a busca começa pela qualidade usada antes e a nova é lembrada.
+    Retorna a qualidade usada.
+    """
+    formato = FORMATOS.get(os.path.splitext(caminho)[1].lower(), 'JPEG')
+    qualidade_inicial = memoria.obter(slug, formato) if memoria and slug else None
+    dados, quality = codificar_no_limite(img, max_bytes, formato, qualidade_inicial)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+    if memoria and slug:
+        memoria.guardar(slug, formato, quality)
+    return quality
@@ -0,0 +1,137 @@
+"""Configuração de log compartilhada: fila com thread de escrita, rotação por tamanho e amostragem
+
+As chamadas de log só enfileiram o registro; a escrita no arquivo (UTF-8, com rotação)
+e no console acontece em uma thread de fundo, fora do laço dos downloads.
+"""
+import atexit
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Configurações
+FORMATO = '%(asctime)s - %(levelname)s - %(message)s'
+NIVEL_PADRAO = os.environ.get('LOG_NIVEL', 'INFO')
+MAX_BYTES_LOG = 5 * 1024 * 1024  # tamanho de cada arquivo de log antes da rotação
+ARQUIVOS_ROTACAO = 3  # arquivos antigos mantidos (.1, .2, .3)
+# Níveis por logger; os do icrawler (feeder, parser, downloader) repetem uma linha por imagem
+NIVEIS_LOGGERS = {
+    'icrawler': logging.WARNING,
+    'feeder': logging.WARNING,
+    'parser': logging.WARNING,
+    'downloader': logging.WARNING,
+    'urllib3': logging.WARNING,
+    'httpx': logging.WARNING,
+    'httpcore': logging.WARNING,
+    'hpack': logging.WARNING,
+    'PIL': logging.INFO,
+}
+# Mensagens repetitivas amostradas: por padrão, as primeiras passam e depois uma a cada AMOSTRAGEM
+PADROES_REPETITIVOS = [
+    re.compile(r'\b403\b'),
+    re.compile(r'\b429\b'),
+    re.compile(r'Imagem muito pequena'),
+    re.compile(r'Imagem em escala de cinza'),
+    re.compile(r'Pulando .* já registrada no diário'),
+]
+LIVRES_POR_JANELA = 5  # ocorrências de cada padrão registradas integralmente por janela
+AMOSTRAGEM = 50  # depois disso, registra uma a cada AMOSTRAGEM ocorrências
+JANELA_SEGUNDOS = 60
+
+class FiltroRepetidas(logging.Filter):
+    """Amostra as mensagens que casam com um dos padrões repetitivos
+
+    A contagem é por padrão e recomeça a cada janela; a mensagem que passa depois de
+    outras suprimidas informa quantas foram omitidas.
+    """
+
+    def __init__(self, padroes=PADROES_REPETITIVOS, livres=LIVRES_POR_JANELA,
+                 amostragem=AMOSTRAGEM, janela=JANELA_SEGUNDOS):
+        super().__init__()
+        self.padroes = padroes
+        self.livres = livres
+        self.amostragem = amostragem
+        self.janela = janela
+        self._contagens = {}  # padrão -> [início da janela, ocorrências, suprimidas]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        mensagem = record.getMessage()
+        padrao = next((p for p in self.padroes if p.search(mensagem)), None)
+        if padrao is None:
+            return True
+        agora = time.monotonic()
+        with self._lock:
+            estado = self._contagens.get(padrao.pattern)
+            if estado is None or agora - estado[0] > self.janela:
+                estado = self._contagens[padrao.pattern] = [agora, 0, 0]
+            estado[1] += 1
+            ocorrencias = estado[1]
+            if ocorrencias > self.livres and (ocorrencias - self.livres) % self.amostragem:
+                estado[2] += 1
+                return False
+            suprimidas, estado[2] = estado[2], 0
+        if suprimidas:
+            record.msg = f"{mensagem} (+{suprimidas} mensagens semelhantes suprimidas)"
+            record.args = None
+        return True
+
+def _niveis_ambiente():
+    """Níveis extras no formato LOG_NIVEIS="icrawler=ERROR,httpx=INFO" """
+    niveis = {}
+    for item in os.environ.get('LOG_NIVEIS', '').split(','):
+        if '=' in item:
+            nome, nivel = item.split('=', 1)
+            niveis[nome.strip()] = nivel.strip().upper()
+    return niveis
+
+_listener = None
+_lock = threading.Lock()
+
+def configurar_log(arquivo, nivel=NIVEL_PADRAO, niveis=None):
+    """Direciona o log do processo para a fila e inicia a thread que grava arquivo e console
+
+    arquivo é rotacionado ao passar de MAX_BYTES_LOG; niveis complementa NIVEIS_LOGGERS
+    (e LOG_NIVEIS, do ambiente, tem a palavra final). Pode ser chamada mais de uma vez:
+    só a primeira configura.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        formatador = logging.Formatter(FORMATO)
+        arquivo_log = RotatingFileHandler(arquivo, maxBytes=MAX_BYTES_LOG, backupCount=ARQUIVOS_ROTACAO, encoding='utf-8')
+        if hasattr(sys.stderr, 'reconfigure'):
+            # Em consoles que não são UTF-8 (Windows), caracteres sem representação viram '?' em vez de erro
+            sys.stderr.reconfigure(errors='replace')
+        console = logging.StreamHandler(sys.stderr)
+        for handler in (arquivo_log, console):
+            handler.setFormatter(formatador)
+
+        fila = queue.SimpleQueue()
+        handler_fila = QueueHandler(fila)
+        handler_fila.addFilter(FiltroRepetidas())
+
+        raiz = logging.getLogger()
+        for antigo in raiz.handlers[:]:
+            raiz.removeHandler(antigo)
+        raiz.addHandler(handler_fila)
+        raiz.setLevel(nivel)
+        for nome, nivel_logger in {**NIVEIS_LOGGERS, **(niveis or {}), **_niveis_ambiente()}.items():
+            logging.getLogger(nome).setLevel(nivel_logger)
+
+        _listener = QueueListener(fila, arquivo_log, console, respect_handler_level=True)
+        _listener.start()
+        atexit.register(encerrar_log)
+
+def encerrar_log():
+    """Grava os registros ainda na fila e para a thread de escrita"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
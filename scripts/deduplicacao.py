@@ -0,0 +1,225 @@
+"""Deduplicação das imagens de produto por hash perceptual (dHash), com hardlinks
+
+Uso: python scripts/deduplicacao.py [diretorio]
+"""
+import json
+import logging
+import os
+import sys
+import threading
+
+from PIL import Image, ImageChops, ImageStat
+
+import cache_imagens
+from metricas import obter_metricas
+from placeholder import COMENTARIO_PLACEHOLDER
+
+# Configurações
+DIRETORIO_IMAGENS = 'public/images/produtos'
+INDICE_PATH = os.environ.get('DEDUPLICACAO_INDICE_PATH', '.cache/deduplicacao.json')
+DISTANCIA_MAXIMA = 2  # bits diferentes (de 64) no dHash para duas imagens serem candidatas
+DIFERENCA_MAXIMA = 1.0  # diferença média dos pixels (0-255), em 64x64, para confirmar a duplicata
+TOLERANCIA_CINZA = 8  # diferença entre canais abaixo da qual a imagem é considerada preto e branco
+FAIXAS = 4  # o hash é dividido em faixas de 16 bits para achar candidatos sem comparar todos os pares
+
+def dhash(img):
+    """Hash perceptual de 64 bits: compara o brilho de pixels vizinhos da imagem reduzida a 9x8"""
+    pixels = img.convert('L').resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    valor = 0
+    for y in range(8):
+        for x in range(8):
+            valor = (valor << 1) | (pixels[y * 9 + x] > pixels[y * 9 + x + 1])
+    return valor
+
+def abrir(caminho):
+    """Abre a imagem decodificando JPEG já em escala reduzida, que basta para o hash"""
+    img = Image.open(caminho)
+    if img.format == 'JPEG':
+        img.draft('RGB', (64, 64))
+    return img
+
+def miniatura(img):
+    return img.convert('L').resize((64, 64), Image.Resampling.BILINEAR)
+
+def eh_placeholder(img):
+    """Indica se é uma imagem de erro (texto preto no branco), que nunca deve ser deduplicada
+
+    Imagens de erro com nomes parecidos têm o mesmo hash; juntá-las mostraria o nome errado.
+    """
+    if img.info.get('comment') == COMENTARIO_PLACEHOLDER:
+        return True
+    r, g, b = img.convert('RGB').resize((64, 64)).split()
+    diferenca = max(ImageChops.difference(r, g).getextrema()[1], ImageChops.difference(g, b).getextrema()[1])
+    return diferenca <= TOLERANCIA_CINZA
+
+def _faixas(valor):
+    return [(i, (valor >> (16 * i)) & 0xFFFF) for i in range(FAIXAS)]
+
+class DeduplicadorImagens:
+    """Mantém um índice dHash das imagens do diretório e troca duplicatas por hardlinks
+
+    Cada imagem única fica gravada uma vez; os slugs com imagem quase idêntica passam a ser
+    hardlinks para ela e ficam registrados como aliases (arquivo -> arquivo canônico). O
+    índice guarda tamanho e mtime de cada arquivo, então a varredura só recalcula o que mudou.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_IMAGENS, caminho_indice=INDICE_PATH):
+        self.diretorio = diretorio
+        self.caminho_indice = caminho_indice
+        self._lock = threading.Lock()
+        try:
+            with open(caminho_indice, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            indice = {}
+        self.imagens = indice.get('imagens', {})  # arquivo -> {'hash', 'tamanho', 'mtime'}
+        self.aliases = indice.get('aliases', {})  # arquivo -> arquivo canônico
+        self._faixas = {}
+        for arquivo, dados in self.imagens.items():
+            if dados['hash'] and arquivo not in self.aliases:
+                self._indexar(arquivo, int(dados['hash'], 16))
+
+    def _indexar(self, arquivo, valor):
+        for faixa in _faixas(valor):
+            self._faixas.setdefault(faixa, set()).add(arquivo)
+
+    def _desindexar(self, arquivo):
+        dados = self.imagens.pop(arquivo, None)
+        self.aliases.pop(arquivo, None)
+        if dados and dados['hash']:
+            for faixa in _faixas(int(dados['hash'], 16)):
+                self._faixas.get(faixa, set()).discard(arquivo)
+
+    def _candidatos(self, valor):
+        candidatos = set()
+        for faixa in _faixas(valor):
+            candidatos |= self._faixas.get(faixa, set())
+        return [
+            arquivo for arquivo in candidatos
+            if bin(int(self.imagens[arquivo]['hash'], 16) ^ valor).count('1') <= DISTANCIA_MAXIMA
+        ]
+
+    def _atualizado(self, arquivo, estado):
+        dados = self.imagens.get(arquivo)
+        return dados is not None and dados['tamanho'] == estado.st_size and dados['mtime'] == estado.st_mtime
+
+    def deduplicar(self, caminho):
+        """Indexa a imagem; se já houver uma quase idêntica, troca o arquivo por um hardlink para ela
+
+        Retorna o caminho canônico quando o arquivo virou hardlink, ou None.
+        """
+        arquivo = os.path.basename(caminho)
+        with obter_metricas().cronometrar('deduplicacao'), self._lock:
+            estado = os.stat(caminho)
+            if self._atualizado(arquivo, estado):
+                canonico = self.aliases.get(arquivo)
+                return os.path.join(self.diretorio, canonico) if canonico else None
+            self._desindexar(arquivo)
+
+            with abrir(caminho) as img:
+                if eh_placeholder(img):
+                    self.imagens[arquivo] = {'hash': None, 'tamanho': estado.st_size, 'mtime': estado.st_mtime}
+                    return None
+                valor = dhash(img)
+                mini = None
+                for candidato in self._candidatos(valor):
+                    caminho_candidato = os.path.join(self.diretorio, candidato)
+                    try:
+                        estado_candidato = os.stat(caminho_candidato)
+                        if not self._atualizado(candidato, estado_candidato):
+                            continue
+                        if mini is None:
+                            mini = miniatura(img)
+                        with abrir(caminho_candidato) as outra:
+                            diferenca = ImageStat.Stat(ImageChops.difference(mini, miniatura(outra))).mean[0]
+                    except OSError:
+                        continue
+                    if diferenca <= DIFERENCA_MAXIMA:
+                        self._ligar(caminho_candidato, caminho)
+                        self.imagens[arquivo] = {
+                            'hash': f"{valor:016x}",
+                            'tamanho': estado_candidato.st_size,
+                            'mtime': estado_candidato.st_mtime
+                        }
+                        self.aliases[arquivo] = candidato
+                        return caminho_candidato
+
+            self.imagens[arquivo] = {'hash': f"{valor:016x}", 'tamanho': estado.st_size, 'mtime': estado.st_mtime}
+            self._indexar(arquivo, valor)
+            return None
+
+    @staticmethod
+    def _ligar(canonico, caminho):
+        """Substitui caminho por um hardlink para o arquivo canônico, de forma atômica"""
+        if os.path.samefile(canonico, caminho):
+            return
+        temporario = f"{caminho}.{os.getpid()}.lnk"
+        os.link(canonico, temporario)
+        os.replace(temporario, caminho)
+
+    def varrer(self):
+        """Deduplica todas as imagens .jpg do diretório; retorna o relatório"""
+        arquivos = sorted(a for a in os.listdir(self.diretorio) if a.endswith('.jpg'))
+        with self._lock:
+            for arquivo in set(self.imagens) - set(arquivos):
+                self._desindexar(arquivo)
+        for arquivo in arquivos:
+            try:
+                self.deduplicar(os.path.join(self.diretorio, arquivo))
+            except Exception as e:
+                logging.error(f"Erro ao deduplicar {arquivo}: {str(e)}")
+        return self.relatorio()
+
+    def relatorio(self):
+        """Conta arquivos, imagens únicas e bytes economizados no disco e na rede
+
+        No disco, os dos hardlinks do diretório; na rede, os das imagens que esta execução
+        leu do cache de imagens em vez de baixá-las de novo.
+        """
+        inodes = {}
+        for arquivo in os.listdir(self.diretorio):
+            if arquivo.endswith('.jpg'):
+                estado = os.stat(os.path.join(self.diretorio, arquivo))
+                inodes.setdefault((estado.st_dev, estado.st_ino), []).append(estado.st_size)
+        return {
+            'arquivos': sum(len(tamanhos) for tamanhos in inodes.values()),
+            'imagens_unicas': len(inodes),
+            'bytes_economizados': sum(tamanhos[0] * (len(tamanhos) - 1) for tamanhos in inodes.values()),
+            'bytes_rede_economizados': cache_imagens.bytes_reaproveitados()
+        }
+
+    def salvar(self):
+        """Grava o índice (hashes e aliases) de forma atômica"""
+        diretorio = os.path.dirname(self.caminho_indice)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._lock:
+            temporario = f"{self.caminho_indice}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump({'imagens': self.imagens, 'aliases': self.aliases}, f)
+            os.replace(temporario, self.caminho_indice)
+
+_deduplicador = None
+_lock = threading.Lock()
+
+def obter_deduplicador():
+    """Retorna o deduplicador compartilhado pelo processo, carregando o índice salvo"""
+    global _deduplicador
+    if _deduplicador is None:
+        with _lock:
+            if _deduplicador is None:
+                _deduplicador = DeduplicadorImagens()
+    return _deduplicador
+
+def registrar_relatorio(relatorio):
+    logging.info(
+        f"Deduplicação: {relatorio['arquivos']} arquivos, {relatorio['imagens_unicas']} imagens únicas, "
+        f"{relatorio['bytes_economizados'] / 1024 / 1024:.1f} MB economizados em disco, "
+        f"{relatorio['bytes_rede_economizados'] / 1024 / 1024:.1f} MB de downloads evitados pelo cache"
+    )
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    deduplicador = DeduplicadorImagens(sys.argv[1] if len(sys.argv) > 1 else DIRETORIO_IMAGENS)
+    registrar_relatorio(deduplicador.varrer())
+    deduplicador.salvar()
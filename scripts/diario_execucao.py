@@ -0,0 +1,122 @@
+"""Diário append-only (JSON lines) das tentativas de busca de cada produto"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+# Configurações
+VALIDADE = timedelta(days=7)  # registros mais antigos são ignorados; a mesma validade das buscas em cache
+
+# Resultados de uma tentativa em uma fonte
+ENCONTRADA = 'encontrada'
+SEM_IMAGEM = 'sem_imagem'
+ERRO = 'erro'  # falha transitória (exceção, rede, bloqueio); pode ser repetida
+
+# Fonte usada para o registro final de cada produto
+FONTE_PRODUTO = 'produto'
+
+class DiarioExecucao:
+    """Registra cada tentativa (slug, fonte, tentativa) e o resultado final de cada produto
+
+    Cada registro é gravado e sincronizado com o disco antes de a busca seguir, então uma
+    execução interrompida pode ser retomada exatamente na fonte em que parou. Uma última
+    linha incompleta, deixada por uma queda no meio da escrita, é ignorada na leitura, assim
+    como os registros com mais de validade. Ao fim de uma execução completa, encerrar()
+    deixa no diário só o necessário para --repetir-transitorios.
+    """
+
+    def __init__(self, caminho, validade=VALIDADE):
+        self.caminho = caminho
+        self.validade = validade
+        self.tentativas = {}  # (slug, fonte, tentativa) -> resultado
+        self.finais = {}  # slug -> resultado final do produto
+        self.erros = {}  # slug -> {(fonte, tentativa)} que falharam por motivo transitório
+        self._lock = threading.Lock()
+        if os.path.exists(caminho):
+            self._carregar()
+        self._arquivo = open(caminho, 'a', encoding='utf-8')
+
+    def _ler(self):
+        """Registros do arquivo ainda dentro da validade"""
+        limite = (datetime.now() - self.validade).isoformat(timespec='seconds')
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue
+                if registro.get('em', '') >= limite:
+                    yield registro
+
+    def _carregar(self):
+        for registro in self._ler():
+            self._aplicar(registro)
+
+    def _aplicar(self, registro):
+        if registro['fonte'] == FONTE_PRODUTO:
+            self.finais[registro['slug']] = registro['resultado']
+        else:
+            slug, fonte, tentativa = registro['slug'], registro['fonte'], registro['tentativa']
+            self.tentativas[(slug, fonte, tentativa)] = registro['resultado']
+            erros = self.erros.setdefault(slug, set())
+            if registro['resultado'] == ERRO:
+                erros.add((fonte, tentativa))
+            else:
+                erros.discard((fonte, tentativa))
+
+    def registrar(self, slug, fonte, resultado, tentativa=None):
+        """Acrescenta um registro ao diário e o grava no disco imediatamente"""
+        registro = {
+            'slug': slug,
+            'fonte': fonte,
+            'tentativa': tentativa,
+            'resultado': resultado,
+            'em': datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            self._arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._aplicar(registro)
+
+    def registrar_final(self, slug, resultado):
+        """Registra o resultado final de um produto"""
+        self.registrar(slug, FONTE_PRODUTO, resultado)
+
+    def pular(self, slug, fonte, tentativa, repetir_transitorios=False):
+        """Indica se a tentativa já foi feita em uma execução anterior e não deve ser repetida"""
+        resultado = self.tentativas.get((slug, fonte, tentativa))
+        if resultado is None or resultado == ENCONTRADA:
+            # Uma imagem encontrada fica no cache; se não estiver mais lá, a busca é refeita
+            return False
+        return not (repetir_transitorios and resultado == ERRO)
+
+    def teve_falha_transitoria(self, slug):
+        """Indica se alguma fonte do produto falhou por motivo transitório"""
+        return bool(self.erros.get(slug))
+
+    def resultado_final(self, slug):
+        return self.finais.get(slug)
+
+    def fechar(self):
+        with self._lock:
+            self._arquivo.close()
+
+    def encerrar(self):
+        """Fecha o diário de uma execução que chegou ao fim, sem nada para retomar
+
+        Só ficam os registros dos produtos que terminaram com imagem de erro por falhas
+        transitórias, para --repetir-transitorios; os demais seriam pulados nas próximas
+        execuções, que voltam a buscá-los (respeitando o cache de buscas).
+        """
+        self.fechar()
+        reabriveis = {
+            slug for slug, resultado in self.finais.items()
+            if resultado == 'imagem_erro' and self.erros.get(slug)
+        }
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            for registro in self._ler():
+                if registro['slug'] in reabriveis:
+                    f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        os.replace(temporario, self.caminho)
@@ -0,0 +1,141 @@
+"""Disjuntor (circuit breaker) por host, para parar de insistir em hosts que recusam as requisições"""
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# Configurações
+DISJUNTORES_PATH = os.environ.get('DISJUNTORES_PATH', '.cache/disjuntores.json')
+LIMITE_FALHAS = 5  # falhas seguidas que abrem o disjuntor
+PAUSA_INICIAL = 5 * 60  # segundos sem requisições ao host depois de abrir
+PAUSA_MAXIMA = 6 * 60 * 60  # a pausa dobra a cada teste que falha, até este limite
+STATUS_FALHA = {403, 429}  # além dos 5xx
+
+class CircuitoAberto(Exception):
+    """Requisição não feita porque o disjuntor do host está aberto"""
+
+    def __init__(self, host):
+        super().__init__(f"Disjuntor aberto para {host}")
+        self.host = host
+
+def host_da_url(url):
+    """Retorna o host de uma URL, sem 'www.'"""
+    return urlparse(url).netloc.lower().removeprefix('www.')
+
+def eh_falha(status):
+    """Indica se a resposta conta como falha do host; status None é erro de conexão ou timeout"""
+    return status is None or status in STATUS_FALHA or status >= 500
+
+class Disjuntores:
+    """Estado dos disjuntores de cada host, gravado em JSON para valer entre execuções
+
+    Depois de LIMITE_FALHAS respostas 403/429/5xx seguidas o host fica bloqueado durante a
+    pausa. Terminada a pausa, uma única requisição de teste é liberada: se der certo o
+    disjuntor fecha; se falhar, ele abre de novo com o dobro da pausa.
+    """
+
+    def __init__(self, caminho=DISJUNTORES_PATH):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._testando = set()
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                self._hosts = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._hosts = {}
+
+    def bloqueado(self, host):
+        """Indica, sem reservar o teste, se uma requisição ao host seria recusada agora"""
+        with self._lock:
+            estado = self._hosts.get(host)
+            if not estado or not estado['aberto_ate']:
+                return False
+            return time.time() < estado['aberto_ate'] or host in self._testando
+
+    def permitir(self, host):
+        """Indica se a requisição pode ser feita; com a pausa vencida, reserva o teste do host"""
+        with self._lock:
+            estado = self._hosts.get(host)
+            if not estado or not estado['aberto_ate']:
+                return True
+            if time.time() < estado['aberto_ate'] or host in self._testando:
+                return False
+            self._testando.add(host)
+            return True
+
+    def verificar(self, url):
+        """Retorna o host da URL, ou lança CircuitoAberto se a requisição não puder ser feita"""
+        host = host_da_url(url)
+        if not self.permitir(host):
+            raise CircuitoAberto(host)
+        return host
+
+    def registrar(self, host, status=None):
+        """Registra o resultado de uma requisição ao host (status None para erro de conexão)"""
+        with self._lock:
+            testando = host in self._testando
+            self._testando.discard(host)
+            estado = self._hosts.get(host)
+
+            if not eh_falha(status):
+                if estado:
+                    del self._hosts[host]
+                    if estado['aberto_ate']:
+                        logging.info(f"Disjuntor fechado para {host}")
+                        self._salvar()
+                return
+
+            if estado is None:
+                estado = self._hosts[host] = {'falhas': 0, 'aberto_ate': 0, 'pausa': 0}
+            estado['falhas'] += 1
+            if testando:
+                pausa = min(estado['pausa'] * 2, PAUSA_MAXIMA)
+            elif not estado['aberto_ate'] and estado['falhas'] >= LIMITE_FALHAS:
+                pausa = PAUSA_INICIAL
+            else:
+                return
+            estado['pausa'] = pausa
+            estado['aberto_ate'] = time.time() + pausa
+            logging.warning(f"Disjuntor aberto para {host} por {pausa}s (status {status})")
+            self._salvar()
+
+    def protegido(self, get):
+        """Envolve uma função get(url, **kwargs): recusa hosts bloqueados e registra cada resposta"""
+        def get_protegido(url, **kwargs):
+            host = self.verificar(url)
+            try:
+                response = get(url, **kwargs)
+            except Exception:
+                self.registrar(host)
+                raise
+            self.registrar(host, response.status_code)
+            return response
+        return get_protegido
+
+    def _salvar(self):
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self._hosts, f)
+        os.replace(temporario, self.caminho)
+
+    def salvar(self):
+        """Grava o estado dos disjuntores no disco de forma atômica"""
+        with self._lock:
+            self._salvar()
+
+_disjuntores = None
+_lock = threading.Lock()
+
+def obter_disjuntores():
+    """Retorna os disjuntores compartilhados pelo processo, carregando o estado salvo"""
+    global _disjuntores
+    if _disjuntores is None:
+        with _lock:
+            if _disjuntores is None:
+                _disjuntores = Disjuntores()
+    return _disjuntores
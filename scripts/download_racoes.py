@@ -1,33 +1,30 @@
 import os
 import time
 import logging
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 from io import BytesIO
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import quote
 from datetime import datetime
 from slugify import slugify
 import re
+import argparse
 import traceback
 
-# Configurar logging com mais detalhes
-logging.basicConfig(
-    level=logging.DEBUG,  # Mudado para DEBUG
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('download_racoes.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-
-# Mapeamento de marcas para seus sites oficiais
-MARCAS_SITES = {
-    'GOLDEN': 'https://www.goldenpet.com.br',
-    'SPECIAL DOG': 'https://www.specialdog.com.br',
-    'MAGNUS': 'https://www.magnuspet.com.br'
-}
+import cliente_http
+from candidatos import baixar_melhor
+from configuracao_log import configurar_log
+from cache_catalogo import carregar_tabela
+from cache_imagens import obter_cache
+from catalogo_incremental import CatalogoIncremental
+from deduplicacao import obter_deduplicador, registrar_relatorio
+from disjuntor import CircuitoAberto
+from extratores import extrair_candidatas
+from marcas import obter_indice
+from metricas import obter_metricas
+from retentativas import PrazoEsgotado, prazo, verificar_prazo
+from placeholder import salvar_placeholder
+from registro_resultados import RegistroResultados, mesclar_em_arquivo
+from transcodificacao import EstagioTranscodificacao
 
 # Sites de pet shops para busca alternativa
 PET_SHOPS = [
@@ -38,119 +35,102 @@ PET_SHOPS = [
 ]
 
 # Configurações
-MAX_RETRIES = 3
-RETRY_DELAY = 5  # segundos
+PRAZO_POR_PRODUTO = 90  # segundos de busca por produto; esgotado, as buscas restantes são canceladas
 MIN_IMAGE_SIZE = 300
-DOWNLOAD_DELAY = 2  # segundos entre downloads
-IMAGEM_ERRO_WIDTH = 800
-IMAGEM_ERRO_HEIGHT = 800
-IMAGEM_ERRO_BG_COLOR = (255, 255, 255)  # Branco
-IMAGEM_ERRO_TEXT_COLOR = (0, 0, 0)  # Preto
+DOWNLOAD_DELAY = float(os.environ.get('DOWNLOAD_DELAY', 2))  # segundos entre downloads
+CATALOGO_CSV = 'racoes_atualizadas_com_imagens.csv'
+SAIDA_CSV = 'racoes_com_imagens_final.csv'
+RESULTADOS_PATH = 'download_racoes_resultados.jsonl'  # registro append-only, mesclado em SAIDA_CSV no fim
+INSTANTANEO_PATH = 'download_racoes_catalogo.json'  # catálogo da última execução, para o modo incremental
 
 def criar_imagem_erro(nome_produto, slug):
     """Cria uma imagem de erro com fundo branco e o nome do produto"""
     try:
-        # Criar imagem branca
-        imagem = Image.new('RGB', (IMAGEM_ERRO_WIDTH, IMAGEM_ERRO_HEIGHT), IMAGEM_ERRO_BG_COLOR)
-        draw = ImageDraw.Draw(imagem)
-        
-        # Tentar carregar uma fonte do sistema
-        try:
-            font = ImageFont.truetype("arial.ttf", 40)
-        except:
-            try:
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 40)
-            except:
-                font = ImageFont.load_default()
-        
-        # Calcular posição do texto
-        texto = f"Imagem não disponível\n{nome_produto}"
-        bbox = draw.textbbox((0, 0), texto, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        x = (IMAGEM_ERRO_WIDTH - text_width) / 2
-        y = (IMAGEM_ERRO_HEIGHT - text_height) / 2
-        
-        # Desenhar texto
-        draw.text((x, y), texto, font=font, fill=IMAGEM_ERRO_TEXT_COLOR, align="center")
-        
-        # Salvar imagem
         caminho_arquivo = os.path.join('public/images/produtos', f"{slug}.jpg")
-        imagem.save(caminho_arquivo, 'JPEG', quality=95)
+        with obter_metricas().cronometrar('imagem_erro'):
+            salvar_placeholder(nome_produto, caminho_arquivo)
         logging.info(f"Imagem de erro gerada para {nome_produto}")
         return True
     except Exception as e:
         logging.error(f"Erro ao gerar imagem de erro para {nome_produto}: {str(e)}")
         return False
 
+def validar_cabecalho(img):
+    """Valida dimensões e modo de cor, que já são conhecidos pelo cabeçalho da imagem"""
+    # Verificar tamanho mínimo
+    if img.size[0] < MIN_IMAGE_SIZE or img.size[1] < MIN_IMAGE_SIZE:
+        logging.warning(f"Imagem muito pequena: {img.size}")
+        obter_metricas().registrar_rejeicao('muito_pequena')
+        return False
+    # Verificar se é uma imagem colorida
+    if img.mode in ('L', '1'):  # Imagem em escala de cinza ou preto e branco
+        logging.warning(f"Imagem em escala de cinza ou preto e branco: {img.mode}")
+        obter_metricas().registrar_rejeicao('escala_de_cinza')
+        return False
+    return True
+
 def validar_imagem(imagem_data):
     """Valida se a imagem é adequada para o produto"""
     try:
-        img = Image.open(BytesIO(imagem_data))
-        # Verificar tamanho mínimo
-        if img.size[0] < MIN_IMAGE_SIZE or img.size[1] < MIN_IMAGE_SIZE:
-            logging.warning(f"Imagem muito pequena: {img.size}")
-            return False
-        # Verificar se é uma imagem colorida
-        if img.mode in ('L', '1'):  # Imagem em escala de cinza ou preto e branco
-            logging.warning(f"Imagem em escala de cinza ou preto e branco: {img.mode}")
-            return False
-        return True
+        with obter_metricas().cronometrar('validacao'):
+            return validar_cabecalho(Image.open(BytesIO(imagem_data)))
     except Exception as e:
         logging.error(f"Erro ao validar imagem: {str(e)}")
+        obter_metricas().registrar_rejeicao('imagem_invalida')
         return False
 
-def tentar_download(func, *args, **kwargs):
-    """Tenta executar uma função com retry"""
-    for tentativa in range(MAX_RETRIES):
-        try:
-            resultado = func(*args, **kwargs)
-            if resultado:
-                return resultado
-            if tentativa < MAX_RETRIES - 1:
-                logging.info(f"Tentativa {tentativa + 1} falhou, tentando novamente em {RETRY_DELAY} segundos...")
-                time.sleep(RETRY_DELAY)
-        except Exception as e:
-            if tentativa < MAX_RETRIES - 1:
-                logging.warning(f"Erro na tentativa {tentativa + 1}: {str(e)}")
-                time.sleep(RETRY_DELAY)
-            else:
-                logging.error(f"Todas as tentativas falharam: {str(e)}")
+def tentar_download(fonte, func, *args, **kwargs):
+    """Executa uma busca dentro do prazo do produto
+
+    As retentativas são feitas em cada requisição (cliente_http), com backoff exponencial;
+    repetir a busca inteira refaria também os sites que já responderam. O tempo e o
+    resultado da busca são registrados nas métricas da fonte.
+    """
+    metricas = obter_metricas()
+    resultado = 'erro'
+    try:
+        verificar_prazo()
+        with metricas.cronometrar(f"busca:{fonte}"):
+            imagem_data = func(*args, **kwargs)
+        resultado = 'encontrada' if imagem_data else 'sem_imagem'
+        return imagem_data
+    except PrazoEsgotado:
+        logging.warning("Prazo do produto esgotado, busca cancelada")
+    except Exception as e:
+        logging.error(f"Erro na busca: {str(e)}")
+    finally:
+        metricas.registrar_fonte(fonte, resultado)
     return None
 
+def extrair_candidatos(url_busca, consulta, base=None):
+    """Busca a página e retorna as URLs das imagens encontradas, das mais às menos prováveis
+
+    As URLs saem dos metadados e dos seletores do perfil do site (extratores.extrair_candidatas),
+    ordenadas pela pontuação da marcação. Com base (busca em um site), a varredura de
+    reserva só aceita imagens do site; sem base (Google), valem as URLs absolutas.
+    """
+    response = cliente_http.get(url_busca)
+    response.raise_for_status()
+    return extrair_candidatas(response.text, url_busca, consulta, base)
+
+def buscar_candidatos(fonte, url_busca, consulta, base=None):
+    """URLs candidatas da busca, consultando o cache de buscas antes de buscar a página"""
+    return obter_cache().buscar_com_cache(fonte, consulta, lambda: extrair_candidatos(url_busca, consulta, base))
+
+def baixar_melhor_valida(urls):
+    """Sonda as candidatas e baixa inteira só a melhor que passar na validação"""
+    return baixar_melhor(urls, validar_cabecalho, validar_imagem)
+
 def buscar_imagem_site_oficial(nome_produto, marca):
     """Busca imagem no site oficial da marca"""
-    if marca not in MARCAS_SITES:
+    site = obter_indice().site(marca)
+    if not site:
         return None
     
-    site = MARCAS_SITES[marca]
     try:
         # Fazer busca no site
         url = f"{site}/busca?q={quote(nome_produto)}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Procurar por imagens
-        for img in soup.find_all('img'):
-            img_url = img.get('src')
-            if img_url and (img_url.endswith('.jpg') or img_url.endswith('.png')):
-                if not img_url.startswith('http'):
-                    img_url = f"{site}{img_url}"
-                
-                try:
-                    img_response = requests.get(img_url, headers=headers, timeout=10)
-                    if img_response.status_code == 200:
-                        imagem_data = img_response.content
-                        if validar_imagem(imagem_data):
-                            return imagem_data
-                except:
-                    continue
-        
-        return None
+        return baixar_melhor_valida(buscar_candidatos(site, url, nome_produto, base=site))
     except Exception as e:
         logging.error(f"Erro ao buscar no site oficial: {str(e)}")
         return None
@@ -160,28 +140,14 @@ def buscar_imagem_pet_shops(nome_produto):
     for site in PET_SHOPS:
         try:
             url = f"{site}/busca?q={quote(nome_produto)}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Procurar por imagens
-            for img in soup.find_all('img'):
-                img_url = img.get('src')
-                if img_url and (img_url.endswith('.jpg') or img_url.endswith('.png')):
-                    if not img_url.startswith('http'):
-                        img_url = f"{site}{img_url}"
-                    
-                    try:
-                        img_response = requests.get(img_url, headers=headers, timeout=10)
-                        if img_response.status_code == 200:
-                            imagem_data = img_response.content
-                            if validar_imagem(imagem_data):
-                                return imagem_data
-                    except:
-                        continue
+            imagem_data = baixar_melhor_valida(buscar_candidatos(site, url, nome_produto, base=site))
+            if imagem_data:
+                return imagem_data
+        except PrazoEsgotado:
+            raise
+        except CircuitoAberto as e:
+            logging.info(f"Pulando {site}: {str(e)}")
+            continue
         except Exception as e:
             logging.error(f"Erro ao buscar em {site}: {str(e)}")
             continue
@@ -191,60 +157,64 @@ def buscar_imagem_google(nome_produto):
     """Busca imagem no Google"""
     try:
         url = f"https://www.google.com/search?q={quote(nome_produto)}&tbm=isch"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Procurar por imagens
-        for img in soup.find_all('img'):
-            img_url = img.get('src')
-            if img_url and img_url.startswith('http'):
-                try:
-                    img_response = requests.get(img_url, headers=headers, timeout=10)
-                    if img_response.status_code == 200:
-                        imagem_data = img_response.content
-                        if validar_imagem(imagem_data):
-                            return imagem_data
-                except:
-                    continue
-        
-        return None
+        return baixar_melhor_valida(buscar_candidatos('google', url, nome_produto))
     except Exception as e:
         logging.error(f"Erro ao buscar no Google: {str(e)}")
         return None
 
-def salvar_imagem(imagem_data, slug):
-    """Salva a imagem no diretório de produtos"""
+def deduplicar_imagem(caminho_arquivo):
+    """Troca a imagem gravada por um hardlink se já houver uma quase idêntica"""
     try:
-        img = Image.open(BytesIO(imagem_data))
-        
-        # Converter para RGB se necessário
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Redimensionar mantendo proporção
-        img.thumbnail((800, 800), Image.Resampling.LANCZOS)
-        
-        # Criar nova imagem com fundo branco
-        new_img = Image.new('RGB', (800, 800), 'white')
-        
-        # Colar imagem centralizada
-        x = (800 - img.width) // 2
-        y = (800 - img.height) // 2
-        new_img.paste(img, (x, y))
-        
-        # Salvar imagem
-        caminho_arquivo = os.path.join('public/images/produtos', f"{slug}.jpg")
-        new_img.save(caminho_arquivo, 'JPEG', quality=95, optimize=True)
-        return True
+        canonico = obter_deduplicador().deduplicar(caminho_arquivo)
+        if canonico:
+            logging.info(f"{os.path.basename(caminho_arquivo)} idêntica a {os.path.basename(canonico)}, gravada como hardlink")
     except Exception as e:
-        logging.error(f"Erro ao salvar imagem: {str(e)}")
-        return False
+        logging.error(f"Erro ao deduplicar {caminho_arquivo}: {str(e)}")
+
+def salvar_imagem(imagem_data, slug, estagio):
+    """Agenda a gravação da imagem no diretório de produtos; retorna um Future
+
+    Assim que a imagem é gravada, ela passa pela deduplicação.
+    """
+    # Guardar a imagem original para poder reprocessá-la sem nova busca
+    obter_cache().registrar_escolha(slug, imagem_data)
+    caminho_arquivo = os.path.join('public/images/produtos', f"{slug}.jpg")
+    futuro = estagio.enviar(imagem_data, caminho_arquivo)
+    futuro.add_done_callback(lambda f: f.exception() is None and deduplicar_imagem(caminho_arquivo))
+    return futuro
+
+def reprocessar_do_cache():
+    """Gera novamente as imagens finais a partir das originais guardadas no cache"""
+    os.makedirs('public/images/produtos', exist_ok=True)
+    itens = (
+        (imagem_data, os.path.join('public/images/produtos', f"{slug}.jpg"))
+        for slug, imagem_data in obter_cache().escolhas()
+    )
+    reprocessadas = 0
+    with EstagioTranscodificacao() as estagio:
+        for caminho, erro in estagio.processar_lote(itens):
+            if erro:
+                logging.error(f"Erro ao reprocessar {caminho}: {str(erro)}")
+            else:
+                reprocessadas += 1
+    logging.info(f"Imagens reprocessadas a partir do cache: {reprocessadas}")
+    # As imagens regravadas deixam de ser hardlinks; a deduplicação é refeita
+    deduplicador = obter_deduplicador()
+    registrar_relatorio(deduplicador.varrer())
+    deduplicador.salvar()
+
+def mesclar_resultados(df=None):
+    """Junta o registro de resultados ao catálogo e grava o CSV final de forma atômica"""
+    if df is None:
+        df = carregar_tabela(CATALOGO_CSV)
+    mesclar_em_arquivo(df, RESULTADOS_PATH, SAIDA_CSV, 'Produto', ['Imagem'])
 
-def main():
+def main(completo=False):
+    estagio = EstagioTranscodificacao()
+    metricas = obter_metricas()
+    metricas.iniciar_exportacao()
+    incremental = None
+    catalogo_lido = False
     try:
         logging.info("Iniciando o script...")
         
@@ -252,16 +222,10 @@ def main():
         os.makedirs('public/images/produtos', exist_ok=True)
         logging.info("Diretório de imagens verificado/criado")
         
-        # Remover todas as imagens existentes
-        for arquivo in os.listdir('public/images/produtos'):
-            if arquivo.endswith('.jpg'):
-                os.remove(os.path.join('public/images/produtos', arquivo))
-        logging.info("Imagens antigas removidas")
-        
         # Ler o arquivo CSV
         try:
             logging.info("Tentando ler o arquivo CSV...")
-            df = pd.read_csv('racoes_atualizadas_com_imagens.csv')
+            df = carregar_tabela(CATALOGO_CSV)
             logging.info(f"Carregados {len(df)} produtos do arquivo CSV")
         except Exception as e:
             logging.error(f"Erro ao ler arquivo CSV: {str(e)}")
@@ -272,59 +236,61 @@ def main():
         produtos_processados = 0
         produtos_com_erro = 0
         produtos_sem_imagem = 0
+        salvamentos = []
+        registro = RegistroResultados(RESULTADOS_PATH, novo=True)
+        # Marca de cada produto: a da planilha (com o nome canônico) ou a encontrada no nome
+        marcas = obter_indice().rotular(df['Produto'], df['Marca'] if 'Marca' in df else None)
+        # Só os produtos novos, alterados ou sem imagem desde a última execução (exceto com --completo)
+        incremental = CatalogoIncremental(INSTANTANEO_PATH, 'public/images/produtos', completo)
         
-        for index, row in df.iterrows():
+        for posicao, (nome_produto, marca) in enumerate(zip(df['Produto'], marcas), 1):
             try:
-                nome_produto = row['Produto']
-                marca = row['Marca'] if 'Marca' in row else ''
-                logging.info(f"\nProcessando produto {index + 1}/{len(df)}")
+                slug = slugify(nome_produto)
+                if not incremental.pendente(slug, slug, nome_produto, marca):
+                    # A imagem da execução anterior continua valendo
+                    registro.registrar(Produto=nome_produto, Imagem=f"{slug}.jpg")
+                    continue
+                
+                logging.info(f"\nProcessando produto {posicao}/{len(df)}")
                 logging.info(f"Nome do produto: {nome_produto}")
                 logging.info(f"Marca: {marca}")
-                
-                slug = slugify(nome_produto)
                 logging.info(f"Slug gerado: {slug}")
                 
-                # Tentar baixar do site oficial
-                if marca:
-                    logging.info(f"Tentando baixar do site oficial da marca {marca}...")
-                    imagem_data = tentar_download(buscar_imagem_site_oficial, nome_produto, marca)
-                else:
-                    logging.warning("Marca não encontrada, pulando busca no site oficial")
-                    imagem_data = None
+                with prazo(PRAZO_POR_PRODUTO):
+                    # Tentar baixar do site oficial
+                    if obter_indice().site(marca):
+                        logging.info(f"Tentando baixar do site oficial da marca {marca}...")
+                        imagem_data = tentar_download('site_oficial', buscar_imagem_site_oficial, nome_produto, marca)
+                    else:
+                        logging.warning("Marca sem site oficial conhecido, pulando busca no site oficial")
+                        imagem_data = None
                 
-                # Se não encontrou, tentar pet shops
-                if not imagem_data:
-                    logging.info("Tentando baixar de sites de pet shops...")
-                    imagem_data = tentar_download(buscar_imagem_pet_shops, nome_produto)
+                    # Se não encontrou, tentar pet shops
+                    if not imagem_data:
+                        logging.info("Tentando baixar de sites de pet shops...")
+                        imagem_data = tentar_download('pet_shops', buscar_imagem_pet_shops, nome_produto)
                 
-                # Se ainda não encontrou, tentar Google
-                if not imagem_data:
-                    logging.info("Tentando baixar do Google...")
-                    imagem_data = tentar_download(buscar_imagem_google, nome_produto)
+                    # Se ainda não encontrou, tentar Google
+                    if not imagem_data:
+                        logging.info("Tentando baixar do Google...")
+                        imagem_data = tentar_download('google', buscar_imagem_google, nome_produto)
                 
-                # Se encontrou imagem, salvar
+                # Se encontrou imagem, salvar (a transcodificação segue no pool de processos)
                 if imagem_data:
-                    if salvar_imagem(imagem_data, slug):
-                        logging.info(f"✅ Imagem salva com sucesso para {nome_produto}")
-                        produtos_processados += 1
-                    else:
-                        logging.error(f"❌ Erro ao salvar imagem para {nome_produto}")
-                        produtos_com_erro += 1
+                    salvamentos.append((salvar_imagem(imagem_data, slug, estagio), nome_produto, slug))
                 else:
                     # Se não encontrou imagem, gerar imagem de erro
                     logging.warning(f"Nenhuma imagem encontrada para {nome_produto}, gerando imagem de erro...")
                     if criar_imagem_erro(nome_produto, slug):
                         logging.warning(f"⚠️ Gerada imagem de erro para {nome_produto}")
+                        incremental.concluir(slug)
                         produtos_sem_imagem += 1
                     else:
                         logging.error(f"❌ Erro ao gerar imagem de erro para {nome_produto}")
                         produtos_com_erro += 1
                 
-                # Atualizar CSV
-                df.at[index, 'Imagem'] = f"{slug}.jpg"
-                if index % 10 == 0:
-                    logging.info("Salvando CSV intermediário...")
-                    df.to_csv("racoes_com_imagens_final.csv", index=False)
+                # Registrar o resultado (gravado no disco na hora; o CSV é montado no fim)
+                registro.registrar(Produto=nome_produto, Imagem=f"{slug}.jpg")
                 
                 # Aguardar entre downloads
                 time.sleep(DOWNLOAD_DELAY)
@@ -334,20 +300,62 @@ def main():
                 logging.error(f"Traceback completo: {traceback.format_exc()}")
                 produtos_com_erro += 1
         
+        # Aguardar as imagens ainda em transcodificação
+        for futuro, nome_produto, slug in salvamentos:
+            try:
+                futuro.result()
+                logging.info(f"✅ Imagem salva com sucesso para {nome_produto}")
+                incremental.concluir(slug)
+                produtos_processados += 1
+            except Exception as e:
+                logging.error(f"❌ Erro ao salvar imagem para {nome_produto}: {str(e)}")
+                produtos_com_erro += 1
+        
+        catalogo_lido = True
+        
         # Salvar CSV final
+        registro.fechar()
         logging.info("Salvando CSV final...")
-        df.to_csv("racoes_com_imagens_final.csv", index=False)
+        mesclar_resultados(df)
         
         # Relatório final
         logging.info("\n=== Relatório Final ===")
         logging.info(f"Total de produtos: {len(df)}")
+        logging.info(f"Catálogo em relação à execução anterior: {incremental.resumo()}")
         logging.info(f"Produtos processados com sucesso: {produtos_processados}")
         logging.info(f"Produtos sem imagem: {produtos_sem_imagem}")
         logging.info(f"Produtos com erro: {produtos_com_erro}")
+        registrar_relatorio(obter_deduplicador().relatorio())
 
     except Exception as e:
         logging.error(f"Erro fatal no script: {str(e)}")
         logging.error(f"Traceback completo: {traceback.format_exc()}")
+    finally:
+        estagio.fechar()
+        if incremental is not None:
+            # Imagens de produtos excluídos só são removidas se o catálogo foi percorrido até o fim
+            removidas = incremental.finalizar(catalogo_lido)
+            logging.info(f"Imagens de produtos excluídos removidas: {len(removidas)}")
+        obter_deduplicador().salvar()
+        cliente_http.fechar_cliente()
+        metricas.finalizar()
+        logging.info(f"Métricas gravadas em {metricas.caminho_json} e {metricas.caminho_prom}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Configurar logging (em fila, com rotação; LOG_NIVEL=DEBUG para mais detalhes)
+    # Só aqui: os processos do pool de transcodificação (spawn) importam o módulo de novo
+    configurar_log('download_racoes.log')
+    parser = argparse.ArgumentParser(description="Baixa as imagens das rações")
+    parser.add_argument('--reprocessar', action='store_true',
+                        help="apenas gera novamente as imagens a partir do cache, sem buscar na web")
+    parser.add_argument('--mesclar', action='store_true',
+                        help="apenas monta o CSV final a partir do registro de resultados (ex.: após uma interrupção)")
+    parser.add_argument('--completo', action='store_true',
+                        help="processa todas as rações, e não só as novas, alteradas ou sem imagem")
+    args = parser.parse_args()
+    if args.reprocessar:
+        reprocessar_do_cache()
+    elif args.mesclar:
+        mesclar_resultados()
+    else:
+        main(completo=args.completo) 
\ No newline at end of file
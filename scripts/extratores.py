@@ -0,0 +1,223 @@
+"""Extração das imagens de produto de uma página HTML, com perfis de seletores por site
+
+Valem primeiro as imagens dos produtos no JSON-LD (Product/ItemList) e as apontadas pelos
+seletores do perfil do site (ou, sem acerto, pelos genéricos); sem nenhuma delas, a página
+inteira é varrida atrás de <img>. O og:image, que nas páginas de busca costuma ser o logo
+ou um banner da loja, só entra no fim da lista, como reserva das outras. Candidatas com
+pontuação negativa são descartadas. Com o lxml (parser em C) os seletores rodam em XPath
+compilado; sem ele, o BeautifulSoup aplica os mesmos seletores em CSS.
+"""
+import json
+from collections import namedtuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from candidatos import candidata_da_img, ordenar, ordenar_candidatas
+from disjuntor import host_da_url
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# Bônus somado à pontuação de candidatos.pontuar, por origem da candidata
+BONUS_JSON_LD = 4
+BONUS_PERFIL = 3
+BONUS_GENERICO = 2
+
+# O mesmo seletor em XPath (lxml e navegador) e em CSS (BeautifulSoup)
+Seletor = namedtuple('Seletor', 'xpath css')
+
+def _classe(nome):
+    """Condição: o atributo class contém o trecho (como nas classes geradas do VTEX)"""
+    return f"contains(@class, '{nome}')", f'[class*="{nome}"]'
+
+def _atributo(nome, valor):
+    return f"@{nome}='{valor}'", f'[{nome}="{valor}"]'
+
+def _img(condicao):
+    """<img> que atende à condição"""
+    xpath, css = condicao
+    return Seletor(f"//img[{xpath}]", f"img{css}")
+
+def _img_dentro(condicao):
+    """<img> dentro de um elemento que atende à condição"""
+    xpath, css = condicao
+    return Seletor(f"//*[{xpath}]//img", f"{css} img")
+
+# Imagens dos cards de produto nos resultados de busca de cada site (host sem www)
+PERFIS_SITES = {
+    'petz.com.br': [
+        _img_dentro(_classe('card-product')),
+        _img(_classe('image-product')),
+    ],
+    'petlove.com.br': [
+        _img_dentro(_atributo('data-testid', 'product-card')),
+        _img_dentro(_classe('product-card')),
+    ],
+    'cobasi.com.br': [
+        _img(_classe('product-summary-2-x-imageNormal')),
+        _img_dentro(_classe('ProductCard')),
+    ],
+    'peticao.com.br': [
+        _img(_classe('product-image-photo')),
+        _img_dentro(_classe('product-item')),
+    ],
+    'magazineluiza.com.br': [
+        _img_dentro(_atributo('data-testid', 'product-card-container')),
+        _img(_atributo('data-testid', 'image')),
+    ],
+    # Sites das marcas (marcas.MARCAS_SITES), em WordPress/WooCommerce
+    'goldenpet.com.br': [
+        _img_dentro(_classe('woocommerce-product-gallery__image')),
+        _img(_classe('wp-post-image')),
+    ],
+    'specialdog.com.br': [
+        _img_dentro(_classe('woocommerce-product-gallery__image')),
+        _img_dentro(_classe('produto')),
+    ],
+    'magnuspet.com.br': [
+        _img_dentro(_classe('woocommerce-product-gallery__image')),
+        _img_dentro(_classe('produto')),
+    ],
+}
+
+# Seletores genéricos, para os sites sem perfil ou quando o perfil não encontra nada
+SELETORES_GENERICOS = [
+    _img(_classe('product-image')),
+    _img(_classe('showcase-product-image')),
+    _img(_classe('product-img')),
+    _img_dentro(_classe('product-image')),
+    _img_dentro(_classe('showcase-image')),
+]
+
+XPATH_JSON_LD = "//script[@type='application/ld+json']/text()"
+XPATH_OG_IMAGE = ("//meta[@property='og:image' or @property='og:image:secure_url' "
+                  "or @name='og:image' or @name='twitter:image']/@content")
+XPATH_OG_TITULO = "//meta[@property='og:title' or @name='og:title']/@content"
+META_OG_IMAGE = ('og:image', 'og:image:secure_url', 'twitter:image')
+
+def seletores_do_site(host):
+    """Seletores XPath do perfil do site (host sem www), seguidos dos genéricos"""
+    return [seletor.xpath for seletor in PERFIS_SITES.get(host, []) + SELETORES_GENERICOS]
+
+if lxml is not None:
+    # Compilados uma vez: cada página só executa as expressões prontas
+    _COMPILADOS = {
+        seletor: etree.XPath(seletor.xpath)
+        for seletor in [*SELETORES_GENERICOS, *(s for seletores in PERFIS_SITES.values() for s in seletores)]
+    }
+    _JSON_LD = etree.XPath(XPATH_JSON_LD)
+    _OG_IMAGE = etree.XPath(XPATH_OG_IMAGE)
+    _OG_TITULO = etree.XPath(XPATH_OG_TITULO)
+
+def _tipos(objeto):
+    tipo = objeto.get('@type', ())
+    return {tipo} if isinstance(tipo, str) else set(tipo)
+
+def _urls_de_imagem(valor):
+    """URLs do campo image do schema.org: texto, lista ou ImageObject"""
+    if isinstance(valor, str):
+        yield valor
+    elif isinstance(valor, list):
+        for item in valor:
+            yield from _urls_de_imagem(item)
+    elif isinstance(valor, dict):
+        url = valor.get('contentUrl') or valor.get('url')
+        if isinstance(url, str):
+            yield url
+
+def _produtos_json_ld(dado):
+    """Objetos Product em qualquer ponto do JSON-LD (@graph, ItemList, listas)"""
+    if isinstance(dado, list):
+        for item in dado:
+            yield from _produtos_json_ld(item)
+    elif isinstance(dado, dict):
+        if _tipos(dado) & {'Product', 'ProductGroup'}:
+            yield dado
+            return
+        for chave in ('@graph', 'itemListElement', 'item', 'mainEntity'):
+            if chave in dado:
+                yield from _produtos_json_ld(dado[chave])
+
+def candidatas_json_ld(textos, url_pagina):
+    """Candidatas (url, largura, altura, alt, bônus) das imagens dos produtos no JSON-LD"""
+    for texto in textos:
+        try:
+            dado = json.loads(texto, strict=False)
+        except ValueError:
+            continue
+        for produto in _produtos_json_ld(dado):
+            nome = produto.get('name') if isinstance(produto.get('name'), str) else None
+            for url in _urls_de_imagem(produto.get('image')):
+                yield urljoin(url_pagina, url.strip()), None, None, nome, BONUS_JSON_LD
+
+def _candidatas_imgs(imgs, url_pagina, bonus):
+    for img in imgs:
+        candidata = candidata_da_img(img)
+        if candidata is not None:
+            url, largura, altura, alt = candidata
+            yield urljoin(url_pagina, url), largura, altura, alt, bonus
+
+def _ordenar_pagina(url_pagina, nome_produto, base, textos_json_ld, selecionar, todas_imgs, og_imagens, titulo):
+    """Monta a lista final com o que cada parser leu da página (ver extrair_candidatas)
+
+    selecionar(seletor) retorna as <img> do seletor; todas_imgs(), as <img> da página.
+    """
+    candidatas = list(candidatas_json_ld(textos_json_ld, url_pagina))
+    for seletor in PERFIS_SITES.get(host_da_url(url_pagina), []):
+        candidatas += _candidatas_imgs(selecionar(seletor), url_pagina, BONUS_PERFIL)
+    if not any(bonus == BONUS_PERFIL for *_, bonus in candidatas):
+        for seletor in SELETORES_GENERICOS:
+            candidatas += _candidatas_imgs(selecionar(seletor), url_pagina, BONUS_GENERICO)
+    if candidatas:
+        urls = ordenar(candidatas, nome_produto)
+    else:
+        urls = ordenar_candidatas(todas_imgs(), nome_produto, base)
+    if not urls:
+        # Só o og:image não basta: a lista vazia deixa o chamador tentar outro meio (ex.: navegador)
+        return []
+    reservas = ordenar([(urljoin(url_pagina, url.strip()), None, None, titulo, 0) for url in og_imagens], nome_produto)
+    return urls + [url for url in reservas if url not in urls]
+
+def _extrair_lxml(html, url_pagina, nome_produto, base):
+    try:
+        doc = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        # Ex.: texto com declaração de encoding, que o lxml só aceita em bytes
+        return _extrair_bs4(html, url_pagina, nome_produto, base)
+    return _ordenar_pagina(
+        url_pagina, nome_produto, base, _JSON_LD(doc),
+        lambda seletor: _COMPILADOS[seletor](doc), lambda: doc.iter('img'),
+        _OG_IMAGE(doc), next(iter(_OG_TITULO(doc)), None)
+    )
+
+def _extrair_bs4(html, url_pagina, nome_produto, base):
+    soup = BeautifulSoup(html, 'html.parser')
+    textos = [script.string or '' for script in soup.find_all('script', type='application/ld+json')]
+    og_imagens = [
+        meta['content'] for meta in soup.find_all('meta')
+        if (meta.get('property') in META_OG_IMAGE or meta.get('name') in META_OG_IMAGE) and meta.get('content')
+    ]
+    titulo = soup.find('meta', property='og:title') or soup.find('meta', attrs={'name': 'og:title'})
+    return _ordenar_pagina(
+        url_pagina, nome_produto, base, textos,
+        lambda seletor: soup.select(seletor.css), lambda: soup.find_all('img'),
+        og_imagens, titulo.get('content') if titulo else None
+    )
+
+def extrair_candidatas(html, url_pagina, nome_produto, base=None):
+    """URLs das imagens de produto da página, da mais à menos provável
+
+    JSON-LD e os seletores do perfil do site (ou os genéricos) vêm pontuados com um bônus
+    pela origem; sem nenhum deles, vale a varredura de todas as <img>, com as regras de
+    base de candidatos.ordenar_candidatas. O og:image vem por último, e só se houver
+    outras candidatas. Retorna [] se nada for encontrado.
+    """
+    if not html:
+        return []
+    if lxml is not None:
+        return _extrair_lxml(html, url_pagina, nome_produto, base)
+    return _extrair_bs4(html, url_pagina, nome_produto, base)
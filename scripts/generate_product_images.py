@@ -1,13 +1,16 @@
 import os
-import pandas as pd
-import requests
-from PIL import Image, ImageDraw, ImageFont
-from io import BytesIO
 from slugify import slugify
 import time
 from urllib.parse import quote_plus
 import random
 
+import cliente_http
+from cache_catalogo import carregar_tabela
+from codificador import MemoriaQualidade, salvar_no_limite
+from marcas import obter_indice
+from placeholder import renderizar
+from transcodificacao import ajustar_ao_quadro, transcodificar
+
 # Configurações
 INPUT_CSV = 'racoes_atualizadas_com_imagens.csv'
 OUTPUT_CSV = 'racoes_com_imagens_final.csv'
@@ -15,84 +18,54 @@ IMAGE_DIR = 'public/images/produtos'
 MIN_SIZE = (500, 500)
 TARGET_SIZE = (800, 800)
 MAX_SIZE_KB = 500
+DOWNLOAD_DELAY = float(os.environ.get('DOWNLOAD_DELAY', 2))  # pausa média entre produtos, em segundos
+QUALITY_MEMORY = MemoriaQualidade()  # qualidade escolhida para cada slug nas execuções anteriores
 
 # Criar diretório se não existir
 os.makedirs(IMAGE_DIR, exist_ok=True)
 
 def generate_error_image(product_name):
     """Gera uma imagem de erro com o nome do produto"""
-    img = Image.new('RGB', TARGET_SIZE, 'white')
-    draw = ImageDraw.Draw(img)
-    
-    # Tenta carregar uma fonte, se não conseguir usa a padrão
-    try:
-        font = ImageFont.truetype("arial.ttf", 40)
-    except:
-        font = ImageFont.load_default()
-    
-    text = f"Não foi possível encontrar\n{product_name}"
-    text_bbox = draw.textbbox((0, 0), text, font=font)
-    text_width = text_bbox[2] - text_bbox[0]
-    text_height = text_bbox[3] - text_bbox[1]
-    
-    x = (TARGET_SIZE[0] - text_width) // 2
-    y = (TARGET_SIZE[1] - text_height) // 2
-    
-    draw.text((x, y), text, fill='black', font=font)
-    return img
+    return renderizar(product_name, "Não foi possível encontrar", tamanho=TARGET_SIZE)
 
 def download_image(url, product_name):
     """Tenta baixar uma imagem da URL"""
     try:
-        response = requests.get(url, timeout=10)
+        response = cliente_http.get(url)
         if response.status_code == 200:
-            img = Image.open(BytesIO(response.content))
-            return img
+            return transcodificar(response.content, TARGET_SIZE)
     except:
         pass
     return None
 
 def process_image(img):
     """Processa a imagem para atender aos requisitos"""
-    # Redimensiona mantendo proporção
-    img.thumbnail(TARGET_SIZE, Image.Resampling.LANCZOS)
-    
-    # Cria nova imagem com fundo branco
-    new_img = Image.new('RGB', TARGET_SIZE, 'white')
-    
-    # Cola a imagem original centralizada
-    x = (TARGET_SIZE[0] - img.width) // 2
-    y = (TARGET_SIZE[1] - img.height) // 2
-    new_img.paste(img, (x, y))
-    
-    return new_img
+    # Redimensiona mantendo proporção e centraliza em fundo branco
+    return ajustar_ao_quadro(img, TARGET_SIZE)
 
-def save_image(img, path):
+def save_image(img, path, slug=None):
     """Salva a imagem otimizando o tamanho"""
-    quality = 95
-    while True:
-        img.save(path, 'JPEG', quality=quality)
-        size_kb = os.path.getsize(path) / 1024
-        if size_kb <= MAX_SIZE_KB or quality <= 10:
-            break
-        quality -= 5
+    # Busca binária da qualidade em memória; o arquivo é gravado uma única vez
+    return salvar_no_limite(img, path, MAX_SIZE_KB * 1024, slug, QUALITY_MEMORY)
 
 def search_image(product_name, brand):
     """Busca imagem do produto em diferentes fontes"""
     # Lista de sites para buscar
     sites = [
-        f"https://www.{brand.lower()}.com.br",
         f"https://www.petlove.com.br",
         f"https://www.cobasi.com.br",
         f"https://www.petz.com.br"
     ]
+    if brand:
+        # Site oficial da marca, se conhecido; senão, o domínio .com.br com o nome dela
+        sites.insert(0, obter_indice().site(brand) or f"https://www.{slugify(brand, separator='')}.com.br")
     
     # Tenta cada site
     for site in sites:
         try:
             # Busca no site
             search_url = f"{site}/search?q={quote_plus(product_name)}"
-            response = requests.get(search_url, timeout=10)
+            response = cliente_http.get(search_url)
             if response.status_code == 200:
                 # Aqui você implementaria a lógica para extrair a URL da imagem
                 # do HTML da página. Por simplicidade, vamos pular esta parte
@@ -103,7 +76,7 @@ def search_image(product_name, brand):
     # Se não encontrou, tenta Google Images
     try:
         search_url = f"https://www.google.com/search?q={quote_plus(product_name + ' embalagem site oficial')}&tbm=isch"
-        response = requests.get(search_url, timeout=10)
+        response = cliente_http.get(search_url)
         if response.status_code == 200:
             # Aqui você implementaria a lógica para extrair a URL da imagem
             # do HTML da página. Por simplicidade, vamos pular esta parte
@@ -115,15 +88,17 @@ def search_image(product_name, brand):
 
 def main():
     # Lê o CSV
-    df = pd.read_csv(INPUT_CSV)
+    df = carregar_tabela(INPUT_CSV)
     
     # Adiciona coluna para o caminho da imagem
     df['image_path'] = ''
     
+    # Marca de cada produto: a da planilha (com o nome canônico) ou a encontrada no nome
+    brands = obter_indice().rotular(df['Produto'], df.get('Marca'))
+    
     # Processa cada produto
-    for index, row in df.iterrows():
+    for (index, row), brand in zip(df.iterrows(), brands):
         product_name = row['Produto']
-        brand = row['Marca']
         slug = slugify(product_name)
         
         print(f"Processando: {product_name}")
@@ -140,16 +115,18 @@ def main():
         
         # Processa e salva a imagem
         img = process_image(img)
-        save_image(img, image_path)
+        save_image(img, image_path, slug)
         
         # Atualiza o caminho no DataFrame
         df.at[index, 'image_path'] = f"/images/produtos/{slug}.jpg"
         
         # Aguarda um pouco para não sobrecarregar os servidores
-        time.sleep(random.uniform(1, 3))
+        time.sleep(random.uniform(0.5, 1.5) * DOWNLOAD_DELAY)
     
     # Salva o CSV atualizado
     df.to_csv(OUTPUT_CSV, index=False)
+    QUALITY_MEMORY.salvar()
+    cliente_http.fechar_cliente()
     print(f"Processo concluído. Resultados salvos em {OUTPUT_CSV}")
 
 if __name__ == "__main__":
@@ -1,26 +1,41 @@
-import pandas as pd
 import os
+import argparse
+from io import BytesIO
+from PIL import Image
 from slugify import slugify
-from PIL import Image, ImageDraw, ImageFont
-import requests
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from io import BytesIO
-import time
-import random
 from urllib.parse import quote_plus
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import TimeoutException
+
+import cliente_http
+from busca_paralela import primeira_valida
+from cache_catalogo import carregar_tabela
+from cache_imagens import obter_cache
+from extratores import extrair_candidatas, seletores_do_site
+from marcas import obter_indice
+from metricas import obter_metricas
+from placeholder import renderizar_lote, salvar_placeholder
+from pool_chrome import PoolChrome, caminho_chromedriver
+from registro_resultados import RegistroResultados, gravar_atomico, mesclar_em_arquivo
+from retentativas import verificar_prazo
+from transcodificacao import EstagioTranscodificacao
 
 # Configurações
 csv_path = "racoes_atualizadas_com_imagens.csv"
+saida_csv = "racoes_com_imagens_final.csv"
+resultados_path = "gerar_imagens_erro_resultados.jsonl"  # registro append-only, mesclado em saida_csv no fim
 output_dir = "public/images/produtos"
 os.makedirs(output_dir, exist_ok=True)
 
+# Texto das imagens de erro
+TITULO_ERRO = "Não foi possível encontrar:"
+TAMANHO_FONTE_ERRO = 32
+
 # Sites para buscar
 SITES_BUSCA = [
     "petlove.com.br",
@@ -29,6 +44,14 @@ SITES_BUSCA = [
     "magazineluiza.com.br"
 ]
 
+# Candidatas de cada site tentadas, em ordem de pontuação
+CANDIDATAS_POR_SITE = 6
+
+# Navegadores trabalhando em paralelo e tempo máximo de espera pelos elementos
+NUM_NAVEGADORES = int(os.environ.get('NUM_NAVEGADORES', 4))
+TIMEOUT_GOOGLE = 10
+TIMEOUT_SITES = 5
+
 def configurar_chrome():
     try:
         # Configurar opções do Chrome
@@ -38,14 +61,12 @@ def configurar_chrome():
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_argument('--disable-gpu')
         
-        # Instalar e configurar o ChromeDriver
-        driver_path = ChromeDriverManager().install()
-        service = Service(driver_path)
+        # ChromeDriver resolvido uma vez e reaproveitado entre execuções
+        service = Service(caminho_chromedriver())
         driver = webdriver.Chrome(service=service, options=chrome_options)
         
-        # Configurar timeouts
+        # Configurar timeouts (sem espera implícita: cada busca usa WebDriverWait explícito)
         driver.set_page_load_timeout(30)
-        driver.implicitly_wait(10)
         
         return driver
         
@@ -53,35 +74,55 @@ def configurar_chrome():
         print(f"Erro ao instalar/configurar ChromeDriver: {str(e)}")
         return None
 
+def imagem_decodificavel(imagem_data):
+    """Decodifica a imagem inteira: bytes truncados ou corrompidos não passam"""
+    try:
+        with Image.open(BytesIO(imagem_data)) as img:
+            img.load()
+        return True
+    except Exception as e:
+        print(f"Imagem inválida: {str(e)}")
+        obter_metricas().registrar_rejeicao('imagem_invalida')
+        return False
+
 def baixar_imagem(url):
-    """Baixa e processa uma imagem da URL"""
+    """Baixa uma imagem da URL; retorna os bytes se ela puder ser decodificada por inteiro"""
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            img = Image.open(BytesIO(response.content))
-            
-            # Converter para RGB se necessário
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Redimensionar mantendo proporção
-            img.thumbnail((800, 800), Image.Resampling.LANCZOS)
-            
-            # Criar nova imagem com fundo branco
-            new_img = Image.new('RGB', (800, 800), 'white')
-            
-            # Colar imagem centralizada
-            x = (800 - img.width) // 2
-            y = (800 - img.height) // 2
-            new_img.paste(img, (x, y))
-            
-            return new_img
+        imagem_data = cliente_http.baixar_com_cache(url, validar_cabecalho=lambda img: True)
+        if imagem_data and imagem_decodificavel(imagem_data):
+            return imagem_data
     except Exception as e:
         print(f"Erro ao baixar imagem: {str(e)}")
     return None
 
+def candidatos_google(driver, termo):
+    """Abre a busca no Google Images e retorna as URLs das 5 primeiras imagens
+
+    Se as imagens não aparecerem a tempo, TimeoutException é repassada e nada vai para o cache.
+    """
+    url = f"https://www.google.com/search?q={quote_plus(termo)}&tbm=isch"
+    with obter_metricas().cronometrar('navegador', 'google.com'):
+        driver.get(url)
+        
+        # Aguardar as imagens aparecerem
+        elementos_img = WebDriverWait(driver, TIMEOUT_GOOGLE).until(
+            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "img.rg_i"))
+        )
+    
+    # Filtrar URLs de imagens válidas
+    urls_imagens = []
+    for img in elementos_img[:5]:  # Tentar as 5 primeiras imagens
+        try:
+            url_img = img.get_attribute('src')
+            if url_img and url_img.startswith('http'):
+                urls_imagens.append(url_img)
+        except:
+            continue
+    return urls_imagens
+
 def buscar_imagem_google(driver, produto, marca):
     """Busca imagem no Google Images"""
+    resultado = 'sem_imagem'
     try:
         # Termos de busca específicos
         termos_busca = [
@@ -91,176 +132,200 @@ def buscar_imagem_google(driver, produto, marca):
         ]
         
         for termo in termos_busca:
-            url = f"https://www.google.com/search?q={quote_plus(termo)}&tbm=isch"
-            driver.get(url)
-            time.sleep(2)  # Aguardar carregamento
-            
-            # Encontrar imagens
-            elementos_img = WebDriverWait(driver, 10).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "img.rg_i"))
-            )
-            
-            # Filtrar URLs de imagens válidas
-            urls_imagens = []
-            for img in elementos_img[:5]:  # Tentar as 5 primeiras imagens
-                try:
-                    url_img = img.get_attribute('src')
-                    if url_img and url_img.startswith('http'):
-                        urls_imagens.append(url_img)
-                except:
-                    continue
+            # O navegador só abre a busca se ela não estiver no cache
+            try:
+                urls_imagens = obter_cache().buscar_com_cache(
+                    'google_imagens', termo, lambda: candidatos_google(driver, termo)
+                )
+            except TimeoutException:
+                continue
             
             # Tentar baixar cada imagem
             for url_img in urls_imagens:
                 img = baixar_imagem(url_img)
                 if img:
+                    resultado = 'encontrada'
                     return img
-            
-            time.sleep(random.uniform(1, 2))  # Delay aleatório entre tentativas
         
     except Exception as e:
         print(f"Erro na busca do Google: {str(e)}")
+        resultado = 'erro'
+    finally:
+        obter_metricas().registrar_fonte('google_imagens', resultado)
     return None
 
-def buscar_imagem_sites(driver, produto, marca):
-    """Busca imagem em sites de pet shop"""
-    for site in SITES_BUSCA:
-        try:
-            url = f"https://www.{site}/busca?q={quote_plus(f'{marca} {produto}')}"
-            driver.get(url)
-            time.sleep(2)
-            
-            # Tentar diferentes seletores CSS comuns
-            seletores = [
-                "img.product-image",
-                "img.showcase-product-image",
-                "img.product-img",
-                ".product-image img",
-                ".showcase-image img"
-            ]
-            
-            for seletor in seletores:
-                try:
-                    elementos_img = WebDriverWait(driver, 5).until(
-                        EC.presence_of_all_elements_located((By.CSS_SELECTOR, seletor))
-                    )
-                    
-                    for img in elementos_img[:3]:  # Tentar as 3 primeiras imagens
-                        url_img = img.get_attribute('src')
-                        if url_img and url_img.startswith('http'):
-                            img_baixada = baixar_imagem(url_img)
-                            if img_baixada:
-                                return img_baixada
-                except:
-                    continue
-                    
-            time.sleep(random.uniform(1, 2))  # Delay aleatório entre sites
-            
-        except Exception as e:
-            print(f"Erro ao buscar em {site}: {str(e)}")
-            continue
-    
-    return None
+def candidatos_site(driver, site, consulta):
+    """Busca no site e retorna as URLs candidatas, das mais às menos prováveis
 
-def gerar_imagem_erro(produto):
-    """Gera uma imagem de erro com o nome do produto"""
-    img = Image.new("RGB", (800, 800), color=(255, 255, 255))
-    draw = ImageDraw.Draw(img)
-    
+    A página é baixada sem navegador e lida pelos extratores (JSON-LD, seletores do perfil
+    do site e, como reserva, og:image); o navegador só é aberto se ela não trouxer imagens
+    de produto (ex.: resultados montados por JavaScript, com só o og:image da loja). Se nenhum seletor aparecer a tempo no navegador,
+    TimeoutException é repassada e nada vai para o cache.
+    """
+    url = f"https://www.{site}/busca?q={quote_plus(consulta)}"
+    base = f"https://www.{site}"
     try:
-        font = ImageFont.truetype("arial.ttf", 32)
-    except IOError:
-        font = ImageFont.load_default()
+        response = cliente_http.get(url)
+        response.raise_for_status()
+        urls_imagens = extrair_candidatas(response.text, url, consulta, base)
+        if urls_imagens:
+            return urls_imagens[:CANDIDATAS_POR_SITE]
+    except Exception as e:
+        print(f"Busca sem navegador em {site} falhou: {str(e)}")
 
-    texto = f"Não foi possível encontrar:\n{produto}"
-    texto_linhas = texto.split('\n')
-    y = 400 - len(texto_linhas) * 20
-    
-    for linha in texto_linhas:
-        bbox = draw.textbbox((0, 0), linha, font=font)
-        largura_texto = bbox[2] - bbox[0]
-        x = (800 - largura_texto) // 2
-        draw.text((x, y), linha, fill=(0, 0, 0), font=font)
-        y += 40
-    
-    return img
+    with obter_metricas().cronometrar('navegador', site):
+        driver.get(url)
+        
+        # Aguardar qualquer um dos seletores do perfil do site (ou os genéricos)
+        WebDriverWait(driver, TIMEOUT_SITES).until(
+            EC.presence_of_element_located((By.XPATH, " | ".join(seletores_do_site(site))))
+        )
+    return extrair_candidatas(driver.page_source, url, consulta, base)[:CANDIDATAS_POR_SITE]
+
+def baixar_do_site(site, urls_imagens):
+    """Baixa as candidatas de um site em ordem; retorna a primeira imagem obtida
+
+    Lança BuscaCancelada se outro site já venceu, sem baixar as candidatas restantes.
+    """
+    metricas = obter_metricas()
+    for url_img in urls_imagens:
+        verificar_prazo()
+        img_baixada = baixar_imagem(url_img)
+        if img_baixada:
+            metricas.registrar_fonte(site, 'encontrada')
+            return img_baixada
+    metricas.registrar_fonte(site, 'sem_imagem')
+    return None
+
+def buscar_imagem_sites(driver, produto, marca):
+    """Busca imagem em sites de pet shop
+
+    O navegador carrega as buscas dos sites em ordem, enquanto as imagens dos sites já
+    carregados são baixadas em paralelo (busca_paralela.primeira_valida); vence o site de
+    maior prioridade com imagem dentro da janela, e os downloads restantes são cancelados.
+    """
+    metricas = obter_metricas()
+    consulta = f'{marca} {produto}'
+
+    def fontes():
+        # Executado na thread dona do navegador, só quando chega a vez de cada site
+        for site in SITES_BUSCA:
+            try:
+                urls_imagens = obter_cache().buscar_com_cache(
+                    site, consulta, lambda: candidatos_site(driver, site, consulta)
+                )
+            except TimeoutException:
+                metricas.registrar_fonte(site, 'erro')
+                continue
+            except Exception as e:
+                print(f"Erro ao buscar em {site}: {str(e)}")
+                metricas.registrar_fonte(site, 'erro')
+                continue
+            yield lambda site=site, urls_imagens=urls_imagens: baixar_do_site(site, urls_imagens)
+
+    return primeira_valida(fontes())
+
+def buscar_imagem(driver, item):
+    """Busca a imagem de um produto com um navegador do pool: primeiro nos sites, depois no Google"""
+    index, produto, marca = item
+    print(f"\nProcessando: {produto}")
+    return buscar_imagem_sites(driver, produto, marca) or buscar_imagem_google(driver, produto, marca)
+
+def mesclar_resultados(df=None):
+    """Junta o registro de resultados ao catálogo e grava o CSV final de forma atômica"""
+    if df is None:
+        df = carregar_tabela(csv_path)
+    mesclar_em_arquivo(df, resultados_path, saida_csv, 'Produto', ['Imagem'])
 
 def main():
-    driver = None
+    pool = None
+    estagio = None
+    metricas = obter_metricas()
+    metricas.iniciar_exportacao()
     try:
         # Ler CSV
-        df = pd.read_csv(csv_path)
+        df = carregar_tabela(csv_path)
         
-        # Inicializar navegador
-        driver = configurar_chrome()
-        if driver is None:
+        # Inicializar navegadores
+        pool = PoolChrome(NUM_NAVEGADORES, configurar_chrome)
+        if not pool.iniciar():
             print("❌ Não foi possível inicializar o Chrome. Gerando imagens de erro para todos os produtos.")
-            for index, row in df.iterrows():
-                produto = row['Produto']
-                slug = slugify(produto)
-                imagem_path = os.path.join(output_dir, f"{slug}.jpg")
-                
-                print(f"\nProcessando: {produto}")
-                img = gerar_imagem_erro(produto)
-                img.save(imagem_path, quality=95, optimize=True)
-                df.at[index, 'Imagem'] = f"{slug}.jpg"
-                
-                if index % 10 == 0:
-                    df.to_csv("racoes_com_imagens_final.csv", index=False)
+            slugs = df['Produto'].map(slugify)
+            itens = zip(df['Produto'], (os.path.join(output_dir, f"{slug}.jpg") for slug in slugs))
+            for imagem_path, erro in renderizar_lote(itens, TITULO_ERRO, TAMANHO_FONTE_ERRO):
+                if erro:
+                    print(f"❌ Erro ao gerar {imagem_path}: {str(erro)}")
+            df['Imagem'] = slugs + ".jpg"
             
-            df.to_csv("racoes_com_imagens_final.csv", index=False)
+            gravar_atomico(df, saida_csv)
             print("\n✅ Processo concluído com sucesso (apenas imagens de erro)!")
             return
         
-        # Processar cada produto
-        for index, row in df.iterrows():
+        # Processar os produtos com os navegadores do pool, na ordem em que terminam
+        estagio = EstagioTranscodificacao()
+        salvamentos = []
+        registro = RegistroResultados(resultados_path, novo=True)
+        # Marca de cada produto: a da planilha (com o nome canônico) ou a encontrada no nome
+        marcas = (marca or '' for marca in obter_indice().rotular(df['Produto'], df.get('Marca')))
+        itens = zip(df.index, df['Produto'], marcas)
+        for (index, produto, marca), img, erro in pool.processar(itens, buscar_imagem):
             try:
-                produto = row['Produto']
-                marca = row['Marca']
+                if erro:
+                    print(f"❌ Erro ao processar produto {produto}: {str(erro)}")
+                    continue
                 slug = slugify(produto)
                 imagem_path = os.path.join(output_dir, f"{slug}.jpg")
                 
-                print(f"\nProcessando: {produto}")
-                
-                # Primeiro tentar sites específicos
-                img = buscar_imagem_sites(driver, produto, marca)
-                
-                # Se não encontrou, tentar Google Images
-                if not img:
-                    img = buscar_imagem_google(driver, produto, marca)
-                
-                # Se ainda não encontrou, gerar imagem de erro
+                # Se não encontrou, gerar imagem de erro
                 if not img:
                     print(f"❌ Não foi possível encontrar imagem para: {produto}")
-                    img = gerar_imagem_erro(produto)
+                    salvar_placeholder(produto, imagem_path, TITULO_ERRO, TAMANHO_FONTE_ERRO)
                 else:
                     print(f"✅ Imagem encontrada para: {produto}")
+                    # Salvar imagem (a transcodificação segue no pool de processos)
+                    salvamentos.append((estagio.enviar(img, imagem_path), produto, imagem_path))
                 
-                # Salvar imagem
-                img.save(imagem_path, quality=95, optimize=True)
-                
-                # Atualizar CSV
-                df.at[index, 'Imagem'] = f"{slug}.jpg"
-                
-                # Salvar progresso parcial
-                if index % 10 == 0:
-                    df.to_csv("racoes_com_imagens_final.csv", index=False)
+                # Registrar o resultado (gravado no disco na hora; o CSV é montado no fim)
+                registro.registrar(Produto=produto, Imagem=f"{slug}.jpg")
                     
             except Exception as e:
                 print(f"❌ Erro ao processar produto {produto}: {str(e)}")
                 continue
+        
+        # Aguardar as imagens ainda em transcodificação; se falhar, o CSV aponta para a imagem de erro
+        for futuro, produto, imagem_path in salvamentos:
+            try:
+                futuro.result()
+            except Exception as e:
+                print(f"❌ Erro ao salvar imagem de {produto}: {str(e)} - Gerando imagem de erro")
+                try:
+                    salvar_placeholder(produto, imagem_path, TITULO_ERRO, TAMANHO_FONTE_ERRO)
+                except Exception as e:
+                    print(f"❌ Erro ao gerar {imagem_path}: {str(e)}")
+        
+        # Montar o CSV final a partir do registro
+        registro.fechar()
+        mesclar_resultados(df)
     
     except Exception as e:
         print(f"❌ Erro fatal: {str(e)}")
     
     finally:
-        # Fechar navegador
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+        if estagio:
+            estagio.fechar()
+        # Fechar navegadores
+        if pool:
+            pool.fechar()
+        cliente_http.fechar_cliente()
+        metricas.finalizar()
+        print(f"📊 Métricas gravadas em {metricas.caminho_json} e {metricas.caminho_prom}")
         print("\n✅ Processo finalizado!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Busca as imagens dos produtos no navegador e gera as imagens de erro")
+    parser.add_argument('--mesclar', action='store_true',
+                        help="apenas monta o CSV final a partir do registro de resultados (ex.: após uma interrupção)")
+    if parser.parse_args().mesclar:
+        mesclar_resultados()
+    else:
+        main() 
\ No newline at end of file
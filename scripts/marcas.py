@@ -0,0 +1,183 @@
+"""Índice de marcas compartilhado: identifica a marca de um produto pelo nome (Aho-Corasick)
+
+Todas as marcas e seus apelidos (ex.: PRO PLAN e PROPLAN) entram em um único autômato,
+montado uma vez; cada nome é percorrido uma só vez, qualquer que seja o número de marcas.
+Nomes e marcas são comparados sem acentos, sem diferença de maiúsculas e com a pontuação
+trocada por espaço; só valem ocorrências de palavras inteiras e, entre as marcas
+encontradas, vale a mais longa (ROYAL CANIN antes de ROYAL).
+"""
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import deque
+
+# Configurações
+# Arquivo opcional com mais marcas: {"MARCA": {"site": "https://...", "apelidos": ["..."]}}
+MARCAS_PATH = os.environ.get('MARCAS_PATH', 'marcas.json')
+
+# Sites oficiais das marcas (nome canônico -> site)
+MARCAS_SITES = {
+    'ROYAL CANIN': 'https://www.royalcanin.com/br',
+    'PEDIGREE': 'https://www.pedigree.com.br',
+    'WHISKAS': 'https://www.whiskas.com.br',
+    'HILLS': 'https://www.hillspet.com.br',
+    'PREMIER': 'https://www.premierpet.com.br',
+    'GOLDEN': 'https://www.goldenpet.com.br',
+    'SPECIAL DOG': 'https://www.specialdog.com.br',
+    'MAGNUS': 'https://www.magnuspet.com.br',
+    'FARMINA': 'https://www.farmina.com.br',
+    'NUTRIENCE': 'https://www.nutrience.com.br',
+    'PROPLAN': 'https://www.purina.com.br/proplan',
+    'FORTICEE': 'https://www.forticee.com.br',
+    'VITAMINADOG': 'https://www.vitaminadog.com.br',
+    'VITAMINACAT': 'https://www.vitaminacat.com.br'
+}
+
+# Outras grafias usadas nos nomes dos produtos (nome canônico -> apelidos)
+APELIDOS = {
+    'ROYAL CANIN': ['ROYALCANIN'],
+    'HILLS': ["HILL'S", 'HILLS SCIENCE DIET'],
+    'SPECIAL DOG': ['SPECIALDOG'],
+    'FARMINA': ['FARMINHA', 'FARMINA N&D'],
+    'PROPLAN': ['PRO PLAN', 'PURINA PRO PLAN'],
+    'VITAMINADOG': ['VITAMINA DOG'],
+    'VITAMINACAT': ['VITAMINA CAT'],
+}
+
+_NAO_ALFANUMERICO = re.compile(r'[^0-9A-Z]+')
+
+def normalizar(texto):
+    """Maiúsculas sem acentos, com a pontuação trocada por espaço e espaços simples nas bordas
+
+    "Ração Hill's Pro-Plan" -> " RACAO HILL S PRO PLAN "; os espaços das bordas fazem as
+    marcas casarem só com palavras inteiras.
+    """
+    sem_acentos = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii')
+    return f" {_NAO_ALFANUMERICO.sub(' ', sem_acentos.upper()).strip()} "
+
+class IndiceMarcas:
+    """Autômato de Aho-Corasick com as marcas e apelidos normalizados
+
+    marcas: nome canônico -> apelidos. sites: nome canônico -> site oficial.
+    """
+
+    def __init__(self, marcas, sites=None):
+        self.sites = dict(sites or {})
+        self._transicoes = [{}]  # por estado: caractere -> próximo estado
+        self._falha = [0]
+        self._saida = [None]  # por estado: (tamanho, marca) do padrão mais longo que termina nele
+        self._canonicas = {}  # grafia normalizada -> nome canônico
+        for marca, apelidos in marcas.items():
+            for grafia in [marca, *apelidos]:
+                padrao = normalizar(grafia)
+                if padrao.strip():
+                    self._canonicas.setdefault(padrao, marca)
+                    self._inserir(padrao, marca)
+        self._ligar_falhas()
+
+    def _inserir(self, padrao, marca):
+        estado = 0
+        for caractere in padrao:
+            proximo = self._transicoes[estado].get(caractere)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes[estado][caractere] = proximo
+                self._transicoes.append({})
+                self._falha.append(0)
+                self._saida.append(None)
+            estado = proximo
+        if self._saida[estado] is None:
+            self._saida[estado] = (len(padrao), marca)
+
+    def _ligar_falhas(self):
+        """Liga cada estado ao maior sufixo que também é prefixo de algum padrão (busca em largura)"""
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                self._falha[proximo] = self._transicoes[falha].get(caractere, 0)
+                # O padrão mais longo terminando aqui pode ser o do estado de falha
+                saida, saida_falha = self._saida[proximo], self._saida[self._falha[proximo]]
+                if saida is None or (saida_falha is not None and saida_falha[0] > saida[0]):
+                    self._saida[proximo] = saida_falha
+
+    def encontrar(self, texto):
+        """Nome canônico da marca mais longa presente no texto (a primeira, em empate), ou None"""
+        transicoes, falhas, saidas = self._transicoes, self._falha, self._saida
+        estado = 0
+        melhor = None
+        for caractere in normalizar(texto):
+            while estado and caractere not in transicoes[estado]:
+                estado = falhas[estado]
+            estado = transicoes[estado].get(caractere, 0)
+            saida = saidas[estado]
+            if saida is not None and (melhor is None or saida[0] > melhor[0]):
+                melhor = saida
+        return melhor[1] if melhor else None
+
+    def canonica(self, marca):
+        """Nome canônico de uma marca informada (ex.: a coluna Marca da planilha), ou None"""
+        if not marca or not isinstance(marca, str):
+            return None
+        return self._canonicas.get(normalizar(marca)) or self.encontrar(marca)
+
+    def marca_do_produto(self, nome, marca=None):
+        """Marca do produto: a informada (com o nome canônico, se conhecida) ou a encontrada no nome
+
+        Uma marca informada que o índice não conhece é mantida como veio, se o nome
+        também não tiver uma marca conhecida. Retorna None se não houver nenhuma.
+        """
+        informada = marca.strip() if isinstance(marca, str) and marca.strip() else None
+        return self.canonica(informada) or self.encontrar(nome) or informada
+
+    def rotular(self, nomes, marcas=None):
+        """Marca de cada produto do catálogo (None se não identificada), em uma passada"""
+        if marcas is None:
+            return [self.encontrar(nome) for nome in nomes]
+        return [self.marca_do_produto(nome, marca) for nome, marca in zip(nomes, marcas)]
+
+    def site(self, marca):
+        """Site oficial da marca, ou None"""
+        return self.sites.get(marca)
+
+def carregar_marcas(caminho=MARCAS_PATH):
+    """Marcas (nome -> apelidos) e sites embutidos, acrescidos dos do arquivo, se existir"""
+    marcas = {marca: [] for marca in MARCAS_SITES}
+    for marca, apelidos in APELIDOS.items():
+        marcas.setdefault(marca, []).extend(apelidos)
+    sites = dict(MARCAS_SITES)
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            extras = json.load(f)
+    except FileNotFoundError:
+        return marcas, sites
+    except (OSError, ValueError) as e:
+        logging.warning(f"Arquivo de marcas {caminho} ignorado: {str(e)}")
+        return marcas, sites
+    for marca, dados in extras.items():
+        marca = marca.upper()
+        dados = dados if isinstance(dados, dict) else {'apelidos': dados or []}
+        marcas.setdefault(marca, []).extend(dados.get('apelidos', []))
+        if dados.get('site'):
+            sites[marca] = dados['site']
+    return marcas, sites
+
+_indice = None
+_lock = threading.Lock()
+
+def obter_indice():
+    """Retorna o índice de marcas compartilhado, montado na primeira chamada"""
+    global _indice
+    if _indice is None:
+        with _lock:
+            if _indice is None:
+                marcas, sites = carregar_marcas()
+                _indice = IndiceMarcas(marcas, sites)
+    return _indice
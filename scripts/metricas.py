@@ -0,0 +1,215 @@
+"""Métricas da execução: latência por estágio e por host, bytes, acertos das fontes e motivos de rejeição
+
+Exportadas como relatório JSON e como arquivo texto do Prometheus (textfile collector),
+periodicamente durante a execução e no fim.
+"""
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Configurações
+METRICAS_DIR = os.environ.get('METRICAS_DIR', '.cache/metricas')
+INTERVALO_EXPORTACAO = float(os.environ.get('METRICAS_INTERVALO', 60))  # segundos entre exportações
+PREFIXO = 'rottava'
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Histograma:
+    """Contagem de observações por faixa de latência (limites cumulativos no estilo Prometheus)"""
+    __slots__ = ('contagens', 'soma', 'total', 'maximo')
+
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_SEGUNDOS) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(LIMITES_SEGUNDOS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+        self.maximo = max(self.maximo, valor)
+
+    def cumulativas(self):
+        acumulado = 0
+        for contagem in self.contagens:
+            acumulado += contagem
+            yield acumulado
+
+    def percentil(self, fracao):
+        """Estimativa do percentil: o limite da primeira faixa que alcança a fração"""
+        alvo = fracao * self.total
+        for limite, acumulado in zip(LIMITES_SEGUNDOS + (self.maximo,), self.cumulativas()):
+            if acumulado >= alvo:
+                return round(min(limite, self.maximo), 4)
+        return round(self.maximo, 4)
+
+    def resumo(self):
+        return {
+            'quantidade': self.total,
+            'soma_s': round(self.soma, 4),
+            'media_s': round(self.soma / self.total, 4) if self.total else 0,
+            'p50_s': self.percentil(0.5),
+            'p90_s': self.percentil(0.9),
+            'p99_s': self.percentil(0.99),
+            'maximo_s': round(self.maximo, 4)
+        }
+
+def _rotulos_prometheus(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ''
+    escapar = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{nome}="{escapar(valor)}"' for nome, valor in pares) + '}'
+
+def _gravar(caminho, conteudo):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+class Metricas:
+    """Acumula histogramas e contadores rotulados; seguro para várias threads
+
+    Histogramas: estagio_segundos{estagio} e host_segundos{host}. Contadores:
+    bytes_total{host}, fonte_total{fonte, resultado} e rejeicoes_total{motivo}.
+    """
+
+    def __init__(self, nome=None, diretorio=METRICAS_DIR):
+        nome = nome or os.path.splitext(os.path.basename(sys.argv[0] or 'execucao'))[0]
+        self.caminho_json = os.path.join(diretorio, f"{nome}.json")
+        self.caminho_prom = os.path.join(diretorio, f"{nome}.prom")
+        self.inicio = time.time()
+        self._histogramas = {}
+        self._contadores = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def observar(self, nome, segundos, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(segundos)
+
+    def contar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    @contextmanager
+    def cronometrar(self, estagio, host=None):
+        """Mede o bloco como uma observação do estágio (e do host, se informado), mesmo com exceção"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.observar('estagio_segundos', duracao, estagio=estagio)
+            if host:
+                self.observar('host_segundos', duracao, host=host)
+
+    def registrar_bytes(self, host, quantidade):
+        self.contar('bytes_total', quantidade, host=host)
+
+    def registrar_fonte(self, fonte, resultado):
+        """Conta o resultado de uma busca na fonte ('encontrada', 'sem_imagem' ou 'erro')"""
+        self.contar('fonte_total', fonte=fonte, resultado=resultado)
+
+    def registrar_rejeicao(self, motivo):
+        self.contar('rejeicoes_total', motivo=motivo)
+
+    def relatorio(self):
+        """Resumo da execução: percentis por estágio e host, bytes, taxa de acerto das fontes e rejeições"""
+        with self._lock:
+            histogramas = {chave: h.resumo() for chave, h in self._histogramas.items()}
+            contadores = dict(self._contadores)
+
+        relatorio = {'inicio': self.inicio, 'duracao_s': round(time.time() - self.inicio, 1),
+                     'estagios': {}, 'hosts': {}, 'bytes': {}, 'fontes': {}, 'rejeicoes': {}}
+        for (nome, rotulos), resumo in sorted(histogramas.items()):
+            rotulo = dict(rotulos)
+            if nome == 'estagio_segundos':
+                relatorio['estagios'][rotulo['estagio']] = resumo
+            elif nome == 'host_segundos':
+                relatorio['hosts'][rotulo['host']] = resumo
+        for (nome, rotulos), valor in sorted(contadores.items()):
+            rotulo = dict(rotulos)
+            if nome == 'bytes_total':
+                relatorio['bytes'][rotulo['host']] = valor
+            elif nome == 'fonte_total':
+                relatorio['fontes'].setdefault(rotulo['fonte'], {})[rotulo['resultado']] = valor
+            elif nome == 'rejeicoes_total':
+                relatorio['rejeicoes'][rotulo['motivo']] = valor
+        for resultados in relatorio['fontes'].values():
+            total = sum(resultados.values())
+            resultados['taxa_acerto'] = round(resultados.get('encontrada', 0) / total, 3) if total else 0
+        return relatorio
+
+    def texto_prometheus(self):
+        """Métricas no formato de exposição texto do Prometheus"""
+        with self._lock:
+            histogramas = {chave: (list(h.cumulativas()), h.soma, h.total) for chave, h in self._histogramas.items()}
+            contadores = dict(self._contadores)
+
+        linhas = []
+        tipos = set()
+        for (nome, rotulos), (cumulativas, soma, total) in sorted(histogramas.items()):
+            metrica = f"{PREFIXO}_{nome}"
+            if metrica not in tipos:
+                tipos.add(metrica)
+                linhas.append(f"# TYPE {metrica} histogram")
+            for limite, acumulado in zip(LIMITES_SEGUNDOS + ('+Inf',), cumulativas):
+                linhas.append(f"{metrica}_bucket{_rotulos_prometheus(rotulos, [('le', limite)])} {acumulado}")
+            linhas.append(f"{metrica}_sum{_rotulos_prometheus(rotulos)} {soma}")
+            linhas.append(f"{metrica}_count{_rotulos_prometheus(rotulos)} {total}")
+        for (nome, rotulos), valor in sorted(contadores.items()):
+            metrica = f"{PREFIXO}_{nome}"
+            if metrica not in tipos:
+                tipos.add(metrica)
+                linhas.append(f"# TYPE {metrica} counter")
+            linhas.append(f"{metrica}{_rotulos_prometheus(rotulos)} {valor}")
+        return '\n'.join(linhas) + '\n'
+
+    def exportar(self):
+        """Grava o relatório JSON e o arquivo do Prometheus de forma atômica"""
+        os.makedirs(os.path.dirname(self.caminho_json) or '.', exist_ok=True)
+        _gravar(self.caminho_json, json.dumps(self.relatorio(), ensure_ascii=False, indent=2))
+        _gravar(self.caminho_prom, self.texto_prometheus())
+
+    def iniciar_exportacao(self, intervalo=INTERVALO_EXPORTACAO):
+        """Exporta as métricas a cada `intervalo` segundos, em uma thread de fundo"""
+        def exportar_periodicamente():
+            while not self._parar.wait(intervalo):
+                try:
+                    self.exportar()
+                except OSError:
+                    pass
+        self._parar.clear()
+        self._thread = threading.Thread(target=exportar_periodicamente, name='metricas', daemon=True)
+        self._thread.start()
+
+    def finalizar(self):
+        """Para a exportação periódica e grava a exportação final"""
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.exportar()
+
+_metricas = None
+_lock = threading.Lock()
+
+def obter_metricas():
+    """Retorna as métricas compartilhadas pelo processo"""
+    global _metricas
+    if _metricas is None:
+        with _lock:
+            if _metricas is None:
+                _metricas = Metricas()
+    return _metricas
@@ -0,0 +1,97 @@
+"""Renderização das imagens de erro (placeholder) com o nome do produto"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Configurações
+TAMANHO = (800, 800)
+COR_FUNDO = (255, 255, 255)  # Branco
+COR_TEXTO = (0, 0, 0)  # Preto
+TAMANHO_FONTE = 40
+MARGEM = 60  # espaço livre nas laterais
+ESPACO_LINHAS = 10
+QUALIDADE_JPEG = 95
+TITULO_PADRAO = "Imagem não disponível"
+COMENTARIO_PLACEHOLDER = b"placeholder"  # gravado no JPEG para identificar imagens de erro
+FONTES = [
+    "arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+]
+
+@lru_cache(maxsize=None)
+def carregar_fonte(tamanho=TAMANHO_FONTE):
+    """Carrega a fonte uma única vez por processo e tamanho"""
+    for fonte in FONTES:
+        try:
+            return ImageFont.truetype(fonte, tamanho)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+@lru_cache(maxsize=None)
+def _fundo(tamanho=TAMANHO, cor=COR_FUNDO):
+    return Image.new('RGB', tamanho, cor)
+
+def quebrar_linhas(texto, fonte, largura_max):
+    """Quebra o texto em linhas que cabem em largura_max, medindo cada palavra uma vez"""
+    espaco = fonte.getlength(' ')
+    linhas = []
+    for paragrafo in texto.split('\n'):
+        linha, largura = [], 0
+        for palavra in paragrafo.split():
+            largura_palavra = fonte.getlength(palavra)
+            nova_largura = largura + espaco + largura_palavra if linha else largura_palavra
+            if linha and nova_largura > largura_max:
+                linhas.append(' '.join(linha))
+                linha, largura = [palavra], largura_palavra
+            else:
+                linha.append(palavra)
+                largura = nova_largura
+        linhas.append(' '.join(linha))
+    return linhas
+
+def renderizar(nome_produto, titulo=TITULO_PADRAO, tamanho_fonte=TAMANHO_FONTE, tamanho=TAMANHO):
+    """Gera a imagem de erro: o título e o nome do produto centralizados no fundo branco"""
+    fonte = carregar_fonte(tamanho_fonte)
+    imagem = _fundo(tamanho).copy()
+    draw = ImageDraw.Draw(imagem)
+
+    linhas = quebrar_linhas(f"{titulo}\n{nome_produto}", fonte, tamanho[0] - 2 * MARGEM)
+    ascent, descent = fonte.getmetrics()
+    altura_linha = ascent + descent + ESPACO_LINHAS
+    y = (tamanho[1] - altura_linha * len(linhas) + ESPACO_LINHAS) / 2
+    for linha in linhas:
+        x = (tamanho[0] - fonte.getlength(linha)) / 2
+        draw.text((x, y), linha, font=fonte, fill=COR_TEXTO)
+        y += altura_linha
+    return imagem
+
+def salvar_placeholder(nome_produto, caminho, titulo=TITULO_PADRAO, tamanho_fonte=TAMANHO_FONTE):
+    """Renderiza e grava a imagem de erro de um produto de forma atômica; retorna o caminho"""
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    renderizar(nome_produto, titulo, tamanho_fonte).save(
+        temporario, 'JPEG', quality=QUALIDADE_JPEG, comment=COMENTARIO_PLACEHOLDER
+    )
+    os.replace(temporario, caminho)
+    return caminho
+
+def _salvar_item(item):
+    nome_produto, caminho, titulo, tamanho_fonte = item
+    try:
+        salvar_placeholder(nome_produto, caminho, titulo, tamanho_fonte)
+        return caminho, None
+    except Exception as e:
+        return caminho, e
+
+def renderizar_lote(itens, titulo=TITULO_PADRAO, tamanho_fonte=TAMANHO_FONTE, processos=None):
+    """Renderiza em paralelo as imagens de erro de um iterável de (nome_produto, caminho)
+
+    Gera (caminho, erro) na ordem de entrada; erro é None quando a imagem foi gravada.
+    """
+    processos = processos or os.cpu_count() or 1
+    tarefas = ((nome, caminho, titulo, tamanho_fonte) for nome, caminho in itens)
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        yield from pool.map(_salvar_item, tarefas, chunksize=32)
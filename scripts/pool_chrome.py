@@ -0,0 +1,134 @@
+"""Pool de navegadores Chrome headless alimentado por uma fila de trabalho compartilhada"""
+import os
+import queue
+import threading
+
+from selenium.common.exceptions import WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+
+# Configurações
+CHROMEDRIVER_CACHE = os.environ.get('CHROMEDRIVER_CACHE', '.cache/chromedriver_path.txt')
+
+_lock_driver = threading.Lock()
+_caminho_driver = None
+
+def caminho_chromedriver():
+    """Retorna o caminho do ChromeDriver, resolvido uma única vez e guardado entre execuções
+
+    ChromeDriverManager().install() consulta a internet a cada chamada; o caminho
+    resolvido é reaproveitado enquanto o binário continuar existindo.
+    """
+    global _caminho_driver
+    with _lock_driver:
+        if _caminho_driver and os.path.exists(_caminho_driver):
+            return _caminho_driver
+        try:
+            with open(CHROMEDRIVER_CACHE, 'r', encoding='utf-8') as f:
+                caminho = f.read().strip()
+        except FileNotFoundError:
+            caminho = None
+        if not caminho or not os.path.exists(caminho):
+            caminho = ChromeDriverManager().install()
+            os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE) or '.', exist_ok=True)
+            with open(CHROMEDRIVER_CACHE, 'w', encoding='utf-8') as f:
+                f.write(caminho)
+        _caminho_driver = caminho
+        return caminho
+
+def driver_ativo(driver):
+    """Indica se o navegador ainda responde"""
+    try:
+        driver.execute_script('return 1')
+        return True
+    except WebDriverException:
+        return False
+
+def fechar_driver(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+class PoolChrome:
+    """Mantém N navegadores, cada um em sua thread, consumindo itens de uma fila comum
+
+    Um navegador que trava ou fecha é substituído automaticamente e o item em que ele
+    estava é processado de novo (até max_tentativas vezes).
+    """
+
+    def __init__(self, num_navegadores, criar_driver, max_tentativas=2):
+        self.num_navegadores = num_navegadores
+        self.criar_driver = criar_driver
+        self.max_tentativas = max_tentativas
+        self._drivers = []
+
+    def iniciar(self):
+        """Abre os navegadores; retorna quantos foram iniciados"""
+        for _ in range(self.num_navegadores):
+            driver = self.criar_driver()
+            if driver is None:
+                break
+            self._drivers.append(driver)
+        return len(self._drivers)
+
+    def _trabalhador(self, driver, funcao, entrada, saida):
+        try:
+            while True:
+                try:
+                    item = entrada.get_nowait()
+                except queue.Empty:
+                    return
+                resultado, erro = None, None
+                for _ in range(self.max_tentativas):
+                    try:
+                        resultado, erro = funcao(driver, item), None
+                    except Exception as e:
+                        resultado, erro = None, e
+                    if driver_ativo(driver):
+                        break
+                    # Navegador caiu: substituir e refazer o item
+                    fechar_driver(driver)
+                    driver = self.criar_driver()
+                    if driver is None:
+                        saida.put((item, None, erro or WebDriverException("Navegador encerrado")))
+                        return
+                saida.put((item, resultado, erro))
+        finally:
+            if driver is not None:
+                fechar_driver(driver)
+
+    def processar(self, itens, funcao):
+        """Executa funcao(driver, item) para cada item; gera (item, resultado, erro) conforme terminam"""
+        entrada = queue.Queue()
+        for item in itens:
+            entrada.put(item)
+        total = entrada.qsize()
+        saida = queue.Queue()
+
+        drivers, self._drivers = self._drivers, []
+        threads = [
+            threading.Thread(target=self._trabalhador, args=(driver, funcao, entrada, saida), daemon=True)
+            for driver in drivers
+        ]
+        for thread in threads:
+            thread.start()
+
+        recebidos = 0
+        while recebidos < total:
+            try:
+                yield saida.get(timeout=1)
+                recebidos += 1
+            except queue.Empty:
+                if not any(thread.is_alive() for thread in threads) and saida.empty():
+                    break
+        # Itens que sobraram porque todos os navegadores falharam
+        while True:
+            try:
+                yield entrada.get_nowait(), None, WebDriverException("Nenhum navegador disponível")
+            except queue.Empty:
+                break
+
+    def fechar(self):
+        for driver in self._drivers:
+            fechar_driver(driver)
+        self._drivers = []
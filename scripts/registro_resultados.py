@@ -0,0 +1,76 @@
+"""Registro append-only dos resultados por produto, mesclado no catálogo só no fim (ou sob demanda)"""
+import json
+import os
+import threading
+
+import pandas as pd
+
+class RegistroResultados:
+    """Acrescenta um registro JSON por produto concluído, gravado no disco na hora
+
+    Substitui a regravação do CSV inteiro a cada N linhas: cada produto custa uma linha
+    no registro, e uma queda perde no máximo o produto em andamento. Uma última linha
+    incompleta, deixada por uma queda no meio da escrita, é ignorada na leitura.
+    """
+
+    def __init__(self, caminho, novo=False):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._arquivo = open(caminho, 'w' if novo else 'a', encoding='utf-8')
+
+    def registrar(self, **campos):
+        """Acrescenta o resultado de um produto (ex.: Produto=..., Imagem=...)"""
+        with self._lock:
+            self._arquivo.write(json.dumps(campos, ensure_ascii=False) + '\n')
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+
+    def fechar(self):
+        with self._lock:
+            self._arquivo.close()
+
+def ler_resultados(caminho):
+    """Lê o registro como DataFrame (vazio se o arquivo não existir)"""
+    registros = []
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return pd.DataFrame(registros)
+
+def mesclar(catalogo, resultados, chave, colunas):
+    """Junta os resultados ao catálogo pela chave, de forma vetorizada
+
+    Para chaves repetidas vale o último resultado registrado; linhas sem resultado
+    mantêm o valor que já tinham no catálogo.
+    """
+    catalogo = catalogo.copy()
+    if resultados.empty:
+        return catalogo
+    ultimos = resultados.drop_duplicates(chave, keep='last').set_index(chave)
+    for coluna in colunas:
+        if coluna not in ultimos:
+            continue
+        novos = catalogo[chave].map(ultimos[coluna])
+        catalogo[coluna] = novos.fillna(catalogo[coluna]) if coluna in catalogo else novos
+    return catalogo
+
+def gravar_atomico(df, caminho):
+    """Grava o DataFrame em CSV ou JSON (pela extensão) via arquivo temporário + rename"""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    if caminho.endswith('.json'):
+        df.to_json(temporario, orient='records', force_ascii=False, indent=2)
+    else:
+        df.to_csv(temporario, index=False)
+    os.replace(temporario, caminho)
+
+def mesclar_em_arquivo(catalogo, caminho_registro, saida, chave, colunas):
+    """Mescla o registro no catálogo e grava a saída de forma atômica; retorna o DataFrame final"""
+    final = mesclar(catalogo, ler_resultados(caminho_registro), chave, colunas)
+    gravar_atomico(final, saida)
+    return final
@@ -0,0 +1,125 @@
+"""Retentativas por requisição: backoff exponencial com jitter, orçamento global e prazo por produto"""
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Configurações
+MAX_TENTATIVAS = 3  # tentativas de cada requisição, contando a primeira
+ESPERA_BASE = 0.5  # segundos; o teto da espera dobra a cada tentativa
+ESPERA_MAXIMA = 8  # segundos
+ORCAMENTO_MAXIMO = 10  # retentativas acumuladas no máximo (e disponíveis no início)
+ORCAMENTO_POR_REQUISICAO = 0.1  # cada requisição feita rende esta fração de retentativa
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+class PrazoEsgotado(Exception):
+    """O prazo do produto acabou; as requisições restantes não são feitas"""
+
+class BuscaCancelada(PrazoEsgotado):
+    """Outra fonte já forneceu a imagem; as requisições restantes desta busca não são feitas"""
+
+_prazo = contextvars.ContextVar('prazo', default=None)
+_cancelamento = contextvars.ContextVar('cancelamento', default=None)
+
+@contextmanager
+def prazo(segundos):
+    """Define um prazo para o bloco; vale também para as threads iniciadas com asyncio.to_thread"""
+    token = _prazo.set(time.monotonic() + segundos)
+    try:
+        yield
+    finally:
+        _prazo.reset(token)
+
+@contextmanager
+def cancelamento(evento):
+    """Associa ao bloco um threading.Event que, quando ativado, cancela as próximas requisições"""
+    token = _cancelamento.set(evento)
+    try:
+        yield evento
+    finally:
+        _cancelamento.reset(token)
+
+def tempo_restante():
+    """Segundos até o fim do prazo atual, ou None se não houver prazo"""
+    limite = _prazo.get()
+    return None if limite is None else limite - time.monotonic()
+
+def verificar_prazo():
+    """Lança PrazoEsgotado se o prazo atual já terminou, ou BuscaCancelada se a busca foi cancelada"""
+    evento = _cancelamento.get()
+    if evento is not None and evento.is_set():
+        raise BuscaCancelada("Busca cancelada: outra fonte já forneceu a imagem")
+    restante = tempo_restante()
+    if restante is not None and restante <= 0:
+        raise PrazoEsgotado("Prazo do produto esgotado")
+
+def espera_backoff(tentativa, base=ESPERA_BASE, maxima=ESPERA_MAXIMA):
+    """Espera antes da próxima tentativa, sorteada entre 0 e base * 2^tentativa (full jitter)"""
+    return random.uniform(0, min(maxima, base * 2 ** tentativa))
+
+def resposta_transitoria(response):
+    """Indica se o status da resposta justifica repetir a requisição"""
+    return response.status_code in STATUS_TRANSITORIOS
+
+class OrcamentoRetentativas:
+    """Limita as retentativas do processo inteiro a uma fração das requisições feitas
+
+    Quando a rede ou um host começa a falhar em massa, o orçamento acaba e as falhas
+    deixam de ser multiplicadas pelas retentativas.
+    """
+
+    def __init__(self, maximo=ORCAMENTO_MAXIMO, por_requisicao=ORCAMENTO_POR_REQUISICAO):
+        self.maximo = maximo
+        self.por_requisicao = por_requisicao
+        self._saldo = maximo
+        self._lock = threading.Lock()
+
+    def registrar_requisicao(self):
+        with self._lock:
+            self._saldo = min(self.maximo, self._saldo + self.por_requisicao)
+
+    def consumir(self):
+        """Reserva uma retentativa; retorna False se o orçamento acabou"""
+        with self._lock:
+            if self._saldo < 1:
+                return False
+            self._saldo -= 1
+            return True
+
+ORCAMENTO = OrcamentoRetentativas()
+
+def pode_repetir(tentativa, espera, max_tentativas=MAX_TENTATIVAS, orcamento=ORCAMENTO):
+    """Indica se a tentativa seguinte (número `tentativa`, a partir de 0) pode ser feita após `espera`"""
+    if tentativa >= max_tentativas:
+        return False
+    restante = tempo_restante()
+    if restante is not None and restante <= espera:
+        return False
+    return orcamento.consumir()
+
+def repetir(func, excecoes=(), repetir_resultado=None, max_tentativas=MAX_TENTATIVAS, orcamento=ORCAMENTO):
+    """Chama func() e repete as falhas transitórias com backoff exponencial
+
+    Repete quando func lança uma das `excecoes` ou quando repetir_resultado(resultado) é
+    verdadeiro, enquanto houver tentativas, orçamento e prazo. Sem novas tentativas,
+    retorna o último resultado ou relança a última exceção.
+    """
+    tentativa = 0
+    while True:
+        verificar_prazo()
+        orcamento.registrar_requisicao()
+        erro = None
+        try:
+            resultado = func()
+            if repetir_resultado is None or not repetir_resultado(resultado):
+                return resultado
+        except excecoes as e:
+            erro = e
+        espera = espera_backoff(tentativa)
+        tentativa += 1
+        if not pode_repetir(tentativa, espera, max_tentativas, orcamento):
+            if erro is not None:
+                raise erro
+            return resultado
+        time.sleep(espera)
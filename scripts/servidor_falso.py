@@ -0,0 +1,215 @@
+"""Servidor HTTP local que imita o Google Imagens, os pet shops e os CDNs de imagens, para benchmarks
+
+Recebe as URLs reescritas por cliente_http.redirecionar (/<host original>/<caminho>) e
+responde com páginas de busca e imagens geradas de forma determinística. Latência, 403,
+timeouts e imagens grandes demais são injetados por sorteio sobre a URL, então a mesma
+configuração (e semente) produz sempre as mesmas respostas.
+
+Uso: python scripts/servidor_falso.py [--porta 8765] [--latencia-ms 50] [--taxa-403 0.1] ...
+"""
+import argparse
+import hashlib
+import html
+import json
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+from slugify import slugify
+
+# Configurações
+CANDIDATOS_POR_PAGINA = 3
+TAMANHO_IMAGEM = (1000, 1000)
+TAMANHO_PEQUENA = (200, 200)
+TAMANHO_GRANDE = 16 * 1024 * 1024  # acima do MAX_BYTES_IMAGEM do cliente_http
+TAMANHO_BLOCO = 64 * 1024
+PAGINAS_BUSCA = ('/search', '/busca')
+# Imagens de layout que os pet shops colocam antes dos resultados (servidas pequenas)
+IMAGENS_LAYOUT = '<img src="/static/logo.png" width="180" height="60" alt="Logo"><img src="/static/banner-frete.jpg" width="1200" height="150" alt="Frete grátis">'
+
+class Falhas:
+    """Taxas de falha injetadas e a semente dos sorteios"""
+
+    def __init__(self, latencia_ms=0, variacao_ms=0, taxa_403=0.0, taxa_timeout=0.0,
+                 atraso_timeout=15.0, taxa_grande=0.0, taxa_pequena=0.0, semente=0):
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        self.taxa_403 = taxa_403
+        self.taxa_timeout = taxa_timeout
+        self.atraso_timeout = atraso_timeout  # segundos; acima do timeout de leitura dos clientes
+        self.taxa_grande = taxa_grande
+        self.taxa_pequena = taxa_pequena
+        self.semente = semente
+
+    def sorteio(self, tipo, caminho):
+        """Número em [0, 1) fixo para a combinação de semente, tipo de falha e URL"""
+        digest = hashlib.sha1(f"{self.semente}:{tipo}:{caminho}".encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+    def atraso(self, caminho):
+        return (self.latencia_ms + self.variacao_ms * self.sorteio('latencia', caminho)) / 1000
+
+@lru_cache(maxsize=256)
+def gerar_imagem(semente, pequena=False):
+    """JPEG colorido determinístico, com textura suave (comprime como uma foto de produto)"""
+    rng = random.Random(semente)
+    base = Image.frombytes('RGB', (64, 64), rng.randbytes(64 * 64 * 3))
+    img = base.resize(TAMANHO_PEQUENA if pequena else TAMANHO_IMAGEM, Image.Resampling.BICUBIC)
+    buffer = BytesIO()
+    img.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+def pagina_busca(host, consulta):
+    """Página de resultados: <img> com as candidatas e um <script> com as URLs (como o do Google)"""
+    slug = slugify(consulta)[:80] or 'produto'
+    if host.endswith('google.com'):
+        # Resultados do Google apontam para CDNs de outros hosts (URLs absolutas)
+        urls = [f"https://cdn{i}.imagens-produtos.com.br/{slug}-{i}.jpg" for i in range(CANDIDATOS_POR_PAGINA)]
+    else:
+        urls = [f"/imagens/{slug}-{i}.jpg" for i in range(CANDIDATOS_POR_PAGINA)]
+    imgs = '' if host.endswith('google.com') else IMAGENS_LAYOUT
+    imgs += ''.join(f'<img class="product-image" src="{html.escape(url)}" alt="{html.escape(consulta)}">' for url in urls)
+    script = f"<script>var resultados = {json.dumps(urls)};</script>"
+    return f"<html><head><title>{html.escape(consulta)}</title></head><body>{imgs}{script}</body></html>".encode('utf-8')
+
+class ManipuladorFalso(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como os servidores reais
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        servidor = self.server
+        falhas = servidor.falhas
+        caminho = self.path
+        servidor.contar('requisicoes')
+
+        time.sleep(falhas.atraso(caminho))
+        if falhas.sorteio('timeout', caminho) < falhas.taxa_timeout:
+            servidor.contar('timeouts')
+            time.sleep(falhas.atraso_timeout)
+        if falhas.sorteio('403', caminho) < falhas.taxa_403:
+            servidor.contar('status_403')
+            return self._responder(403, b'Forbidden', 'text/plain')
+
+        # /<host original>/<caminho>?<consulta>
+        partes = urlsplit(caminho)
+        host, _, resto = partes.path.lstrip('/').partition('/')
+        resto = '/' + resto
+        if resto in PAGINAS_BUSCA:
+            consulta = parse_qs(partes.query).get('q', [''])[0]
+            servidor.contar('paginas')
+            return self._responder(200, pagina_busca(host, consulta), 'text/html; charset=utf-8')
+        if resto.lower().endswith(('.jpg', '.jpeg', '.png')):
+            if falhas.sorteio('grande', caminho) < falhas.taxa_grande:
+                servidor.contar('imagens_grandes')
+                return self._responder_grande()
+            servidor.contar('imagens')
+            pequena = resto.startswith('/static/') or falhas.sorteio('pequena', caminho) < falhas.taxa_pequena
+            imagem = gerar_imagem(f"{falhas.semente}:{host}{resto}", pequena)
+            intervalo = self._intervalo(len(imagem))
+            if intervalo:
+                inicio, fim = intervalo
+                return self._responder(206, imagem[inicio:fim + 1], 'image/jpeg',
+                                       {'Content-Range': f"bytes {inicio}-{fim}/{len(imagem)}"})
+            return self._responder(200, imagem, 'image/jpeg')
+        return self._responder(404, b'Not Found', 'text/plain')
+
+    def _intervalo(self, tamanho):
+        """(início, fim) pedidos no cabeçalho Range (só a forma bytes=a-b ou bytes=a-), ou None"""
+        pedido = self.headers.get('Range', '')
+        if not pedido.startswith('bytes=') or ',' in pedido:
+            return None
+        inicio, _, fim = pedido[len('bytes='):].partition('-')
+        if not inicio.isdigit() or int(inicio) >= tamanho:
+            return None
+        return int(inicio), min(int(fim), tamanho - 1) if fim.isdigit() else tamanho - 1
+
+    def _responder(self, status, corpo, tipo, cabecalhos=None):
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(corpo)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(corpo)
+            self.server.contar('bytes', len(corpo))
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _responder_grande(self):
+        """Imagem acima do limite, enviada em blocos até o cliente desistir"""
+        bloco = gerar_imagem('grande').ljust(TAMANHO_BLOCO, b'\0')[:TAMANHO_BLOCO]
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(TAMANHO_GRANDE))
+            self.end_headers()
+            for _ in range(TAMANHO_GRANDE // TAMANHO_BLOCO):
+                self.wfile.write(bloco)
+                self.server.contar('bytes', len(bloco))
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+class ServidorFalso(ThreadingHTTPServer):
+    """Servidor com as falhas configuradas e contadores do que foi servido"""
+    daemon_threads = True
+
+    def __init__(self, endereco, falhas):
+        super().__init__(endereco, ManipuladorFalso)
+        self.falhas = falhas
+        self.contadores = {}
+        self._lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clientes que desistem no meio (timeouts, imagens grandes) fecham a conexão: não é erro do servidor
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def contar(self, nome, valor=1):
+        with self._lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+def iniciar_servidor(falhas, host='127.0.0.1', porta=0):
+    """Inicia o servidor em uma thread de fundo; retorna o servidor (com .url e .contadores)"""
+    servidor = ServidorFalso((host, porta), falhas)
+    threading.Thread(target=servidor.serve_forever, name='servidor-falso', daemon=True).start()
+    return servidor
+
+def adicionar_argumentos(parser):
+    """Argumentos de linha de comando das falhas, compartilhados com benchmark.py"""
+    parser.add_argument('--latencia-ms', type=float, default=0, help="atraso fixo de cada resposta")
+    parser.add_argument('--variacao-ms', type=float, default=0, help="atraso adicional sorteado por URL")
+    parser.add_argument('--taxa-403', type=float, default=0.0, help="fração das URLs que respondem 403")
+    parser.add_argument('--taxa-timeout', type=float, default=0.0, help="fração das URLs que demoram além do timeout")
+    parser.add_argument('--atraso-timeout', type=float, default=15.0, help="segundos de espera das URLs com timeout")
+    parser.add_argument('--taxa-grande', type=float, default=0.0, help="fração das imagens acima do limite de bytes")
+    parser.add_argument('--taxa-pequena', type=float, default=0.0, help="fração das imagens abaixo do tamanho mínimo")
+    parser.add_argument('--semente', type=int, default=0, help="semente dos sorteios")
+
+def falhas_dos_argumentos(args):
+    return Falhas(args.latencia_ms, args.variacao_ms, args.taxa_403, args.taxa_timeout,
+                  args.atraso_timeout, args.taxa_grande, args.taxa_pequena, args.semente)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso de buscas e imagens para benchmarks")
+    parser.add_argument('--porta', type=int, default=8765)
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+    servidor = ServidorFalso(('127.0.0.1', args.porta), falhas_dos_argumentos(args))
+    print(f"Servidor falso em {servidor.url} (use SERVIDOR_FALSO={servidor.url})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,5 @@
+"""Os módulos dos scripts ficam soltos em scripts/ e se importam pelo nome"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
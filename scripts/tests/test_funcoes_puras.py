@@ -0,0 +1,198 @@
+"""Testes das partes sem rede: corrida entre fontes, marcas, qualidade no limite, catálogo e WebP"""
+import asyncio
+import json
+import random
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import catalogo
+from busca_paralela import primeira_valida, primeira_valida_async
+from cliente_http import _cabecalho_webp, _ler_cabecalho
+from codificador import codificar, codificar_no_limite
+from extratores import _extrair_bs4, _extrair_lxml
+from marcas import IndiceMarcas, normalizar
+
+# busca_paralela
+
+def _fonte(resultado, demora=0.0):
+    def fonte():
+        time.sleep(demora)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+    return fonte
+
+def test_vence_a_fonte_de_maior_prioridade_dentro_da_janela():
+    fontes = [_fonte('site_oficial', 0.2), _fonte('pet_shop')]
+    assert primeira_valida(fontes, atraso=0.02, janela=1.0) == 'site_oficial'
+
+def test_janela_esgotada_fica_com_a_de_menor_prioridade():
+    fontes = [_fonte('site_oficial', 1.0), _fonte('pet_shop')]
+    inicio = time.monotonic()
+    assert primeira_valida(fontes, atraso=0.02, janela=0.1) == 'pet_shop'
+    assert time.monotonic() - inicio < 0.8
+
+def test_falhas_e_vazias_passam_para_a_proxima_fonte():
+    fontes = [_fonte(RuntimeError('fora do ar')), _fonte(None), _fonte('google')]
+    assert primeira_valida(fontes, atraso=5, janela=0.1) == 'google'
+    assert primeira_valida([_fonte(None), _fonte(RuntimeError())], atraso=5, janela=0.1) is None
+
+def test_proxima_fonte_so_e_obtida_quando_chega_a_vez():
+    obtidas = []
+
+    def fontes():
+        for nome in ('a', 'b', 'c'):
+            obtidas.append(nome)
+            yield _fonte(nome)
+
+    assert primeira_valida(fontes(), atraso=5, janela=0.1) == 'a'
+    assert obtidas == ['a']
+
+def test_versao_async_cancela_as_perdedoras():
+    canceladas = []
+
+    async def lenta():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            canceladas.append('lenta')
+            raise
+
+    async def rapida():
+        return 'rapida'
+
+    resultado = asyncio.run(primeira_valida_async([lenta, rapida], atraso=0.02, janela=0.05))
+    assert resultado == 'rapida'
+    assert canceladas == ['lenta']
+
+# marcas
+
+@pytest.fixture
+def indice():
+    marcas = {'ROYAL': [], 'ROYAL CANIN': ['ROYALCANIN'], 'PROPLAN': ['PRO PLAN'], 'GOLDEN': [], 'HILLS': ["HILL'S"]}
+    return IndiceMarcas(marcas, {'GOLDEN': 'https://www.goldenpet.com.br'})
+
+def test_marca_mais_longa_vence(indice):
+    assert indice.encontrar('Ração Royal Canin Mini Adult 1kg') == 'ROYAL CANIN'
+    assert indice.encontrar('Coleira Royal Azul') == 'ROYAL'
+
+def test_apelidos_acentos_e_pontuacao(indice):
+    assert indice.encontrar('RAÇÃO PRO-PLAN FILHOTE') == 'PROPLAN'
+    assert indice.encontrar("Hill's Science Diet") == 'HILLS'
+    assert normalizar("Ração Hill's") == ' RACAO HILL S '
+
+def test_so_palavras_inteiras(indice):
+    assert indice.encontrar('Brinquedo Goldenretriever') is None
+    assert indice.encontrar('') is None
+
+def test_marca_informada_tem_precedencia(indice):
+    assert indice.marca_do_produto('Ração Golden Adulto', 'royalcanin') == 'ROYAL CANIN'
+    assert indice.marca_do_produto('Ração Adulto', 'Marca Nova') == 'Marca Nova'
+    assert indice.site('GOLDEN') == 'https://www.goldenpet.com.br'
+
+# codificador
+
+@pytest.fixture(scope='module')
+def foto():
+    aleatorio = random.Random(7)
+    return Image.frombytes('RGB', (32, 32), aleatorio.randbytes(32 * 32 * 3)).resize((400, 400))
+
+def test_maior_qualidade_que_cabe_no_limite(foto):
+    limite = len(codificar(foto, quality=60)) + 1
+    dados, qualidade = codificar_no_limite(foto, limite)
+    assert len(dados) <= limite
+    assert len(codificar(foto, quality=qualidade + 1)) > limite
+
+def test_qualidade_inicial_chega_ao_mesmo_resultado(foto):
+    limite = len(codificar(foto, quality=60)) + 1
+    assert codificar_no_limite(foto, limite, qualidade_inicial=70)[1] == codificar_no_limite(foto, limite)[1]
+    assert codificar_no_limite(foto, limite, qualidade_inicial=20)[1] == codificar_no_limite(foto, limite)[1]
+
+def test_limite_impossivel_usa_a_qualidade_minima(foto):
+    assert codificar_no_limite(foto, 10, qualidade_min=15)[1] == 15
+
+# catalogo
+
+def _slugs(caminho):
+    return [produto.slug for produto in catalogo.ler_catalogo(caminho)]
+
+def test_array_lido_em_blocos_pequenos(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalogo, 'TAMANHO_BLOCO', 7)
+    produtos = [{'codigo': str(i), 'nome': f"Ração {i} {{x}}, [y]", 'slug': f"racao-{i}"} for i in range(20)]
+    caminho = tmp_path / 'produtos.json'
+    caminho.write_text(json.dumps(produtos, ensure_ascii=False, indent=2), encoding='utf-8')
+    assert _slugs(caminho) == [f"racao-{i}" for i in range(20)]
+
+def test_ndjson_ignora_linhas_invalidas(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalogo, 'TAMANHO_BLOCO', 10)
+    linhas = ['{"nome": "A", "slug": "a"}', '{quebrado', '', '{"nome": "B", "slug": "b", "marca": "GOLDEN"}']
+    caminho = tmp_path / 'produtos.ndjson'
+    caminho.write_text('\n'.join(linhas), encoding='utf-8')
+    produtos = list(catalogo.ler_catalogo(caminho))
+    assert [p.slug for p in produtos] == ['a', 'b']
+    assert produtos[1].marca == 'GOLDEN' and produtos[0].categoria is None
+
+def test_produtos_sem_slug_sao_ignorados(tmp_path):
+    caminho = tmp_path / 'produtos.json'
+    caminho.write_text('[{"nome": "A", "slug": "a"}, {"nome": "B"}, {"nome": "C", "slug": ""}]', encoding='utf-8')
+    assert _slugs(caminho) == ['a']
+
+def test_catalogo_vazio(tmp_path):
+    caminho = tmp_path / 'vazio.json'
+    caminho.write_text('  ', encoding='utf-8')
+    assert _slugs(caminho) == []
+
+# Cabeçalho WebP (RIFF)
+
+def _webp(**opcoes):
+    buffer = BytesIO()
+    modo = 'RGBA' if opcoes.pop('alfa', False) else 'RGB'
+    Image.new(modo, (640, 480), (200, 100, 50, 128)[:len(modo)]).save(buffer, 'WEBP', **opcoes)
+    return buffer.getvalue()
+
+@pytest.mark.parametrize('opcoes, modo', [
+    ({'quality': 80}, 'RGB'),
+    ({'lossless': True}, 'RGB'),
+    ({'lossless': True, 'alfa': True}, 'RGBA'),
+    ({'quality': 80, 'exif': b'Exif\x00\x00teste'}, 'RGB'),
+])
+def test_dimensoes_da_webp_pelos_primeiros_bytes(opcoes, modo):
+    cabecalho = _cabecalho_webp(_webp(**opcoes)[:30])
+    assert (cabecalho.format, cabecalho.size, cabecalho.mode) == ('WEBP', (640, 480), modo)
+
+def test_webp_incompleta_ou_outro_formato():
+    assert _cabecalho_webp(_webp(quality=80)[:20]) is None
+    assert _cabecalho_webp(b'RIFF\x00\x00\x00\x00WAVEfmt ' + bytes(20)) is False
+    jpeg = BytesIO()
+    Image.new('RGB', (320, 200)).save(jpeg, 'JPEG')
+    assert _ler_cabecalho(BytesIO(jpeg.getvalue()[:2048])).size == (320, 200)
+    assert _ler_cabecalho(BytesIO(_webp(quality=80)[:100])).size == (640, 480)
+
+# extratores
+
+PAGINA_BUSCA = '''<html><head>
+<meta property="og:image" content="/static/logo-loja.png">
+<meta property="og:image" content="https://cdn.loja/racao-golden-adulto-og.jpg">
+</head><body>
+<div class="card-product-item"><img src="/p/racao-golden-adulto.jpg" alt="Ração Golden Adulto" width="500" height="500"></div>
+<div class="card-product-item"><img data-src="/p/racao-golden-filhote.jpg" alt="Ração Golden Filhote"></div>
+<img src="/icones/carrinho.png" width="24" height="24">
+</body></html>'''
+
+def test_parsers_concordam_e_og_image_fica_de_reserva():
+    argumentos = (PAGINA_BUSCA, 'https://www.petz.com.br/busca?q=golden', 'Ração Golden Adulto', 'https://www.petz.com.br')
+    urls = _extrair_lxml(*argumentos)
+    assert urls == _extrair_bs4(*argumentos)
+    assert urls == [
+        'https://www.petz.com.br/p/racao-golden-adulto.jpg',
+        'https://www.petz.com.br/p/racao-golden-filhote.jpg',
+        'https://cdn.loja/racao-golden-adulto-og.jpg',
+    ]
+
+def test_so_og_image_nao_conta_como_resultado():
+    pagina = '<html><head><meta property="og:image" content="/banner-promo.jpg"></head><body></body></html>'
+    argumentos = (pagina, 'https://www.petz.com.br/busca?q=x', 'Ração Golden', 'https://www.petz.com.br')
+    assert _extrair_lxml(*argumentos) == [] == _extrair_bs4(*argumentos)
@@ -0,0 +1,100 @@
+"""Transcodificação das imagens de produto (800x800, fundo branco) em um pool de processos"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from metricas import obter_metricas
+
+# Configurações
+TAMANHO_FINAL = (800, 800)
+QUALIDADE_JPEG = 95
+
+def ajustar_ao_quadro(img, tamanho=TAMANHO_FINAL):
+    """Reduz a imagem mantendo a proporção e a centraliza em um fundo branco"""
+    img.thumbnail(tamanho, Image.Resampling.LANCZOS)
+    new_img = Image.new('RGB', tamanho, 'white')
+    x = (tamanho[0] - img.width) // 2
+    y = (tamanho[1] - img.height) // 2
+    new_img.paste(img, (x, y))
+    return new_img
+
+def transcodificar(imagem_data, tamanho=TAMANHO_FINAL):
+    """Decodifica os bytes de uma imagem e retorna a versão final em RGB"""
+    img = Image.open(BytesIO(imagem_data))
+    if img.format == 'JPEG':
+        # Decodifica direto em escala reduzida (1/2, 1/4 ou 1/8), sem ficar menor que o tamanho final
+        img.draft('RGB', tamanho)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return ajustar_ao_quadro(img, tamanho)
+
+def salvar_jpeg(img, caminho, quality=QUALIDADE_JPEG):
+    """Salva a imagem como JPEG de forma atômica (arquivo temporário + rename)"""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    img.save(temporario, 'JPEG', quality=quality, optimize=True)
+    os.replace(temporario, caminho)
+
+def transcodificar_para_arquivo(imagem_data, caminho, quality=QUALIDADE_JPEG):
+    """Transcodifica os bytes e grava o JPEG final; executado nos processos do pool"""
+    salvar_jpeg(transcodificar(imagem_data), caminho, quality)
+    return caminho
+
+class EstagioTranscodificacao:
+    """Pool de processos que transcodifica imagens usando todos os núcleos
+
+    As imagens são enviadas sem esperar a conclusão, então o download do próximo
+    produto não fica parado atrás da decodificação e da compressão do anterior.
+    """
+
+    def __init__(self, processos=None):
+        processos = processos or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=processos)
+        # Limita as imagens aguardando na fila, para a memória não crescer com o tamanho do lote
+        self.max_pendentes = 4 * processos
+
+    def enviar(self, imagem_data, caminho, quality=QUALIDADE_JPEG):
+        """Agenda uma transcodificação; retorna um Future com o caminho gravado
+
+        O tempo até a conclusão (incluindo a espera na fila do pool) é medido como
+        estágio 'transcodificacao'.
+        """
+        inicio = time.perf_counter()
+        futuro = self._pool.submit(transcodificar_para_arquivo, imagem_data, caminho, quality)
+        futuro.add_done_callback(
+            lambda f: obter_metricas().observar('estagio_segundos', time.perf_counter() - inicio, estagio='transcodificacao')
+        )
+        return futuro
+
+    def processar_lote(self, itens, quality=QUALIDADE_JPEG):
+        """Transcodifica um iterável de (imagem_data, caminho); gera (caminho, erro) na ordem de entrada
+
+        erro é None quando a imagem foi gravada.
+        """
+        pendentes = deque()
+        for imagem_data, caminho in itens:
+            pendentes.append((caminho, self.enviar(imagem_data, caminho, quality)))
+            if len(pendentes) >= self.max_pendentes:
+                yield self._concluir(*pendentes.popleft())
+        while pendentes:
+            yield self._concluir(*pendentes.popleft())
+
+    @staticmethod
+    def _concluir(caminho, futuro):
+        try:
+            futuro.result()
+            return caminho, None
+        except Exception as e:
+            return caminho, e
+
+    def fechar(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()